@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import BadgeType, StudentAchievement, EarnedBadge, DailyActivity
+from .models import BadgeType, StudentAchievement, EarnedBadge, DailyActivity, LeaderboardEntry
 
 
 @admin.register(BadgeType)
@@ -85,6 +85,15 @@ class DailyActivityAdmin(admin.ModelAdmin):
     study_time_display.short_description = 'Study Time'
 
 
+@admin.register(LeaderboardEntry)
+class LeaderboardEntryAdmin(admin.ModelAdmin):
+    list_display = ['rank', 'student', 'leaderboard_type', 'course', 'score', 'refreshed_at']
+    list_filter = ['leaderboard_type', 'course']
+    search_fields = ['student__first_name', 'student__last_name', 'student__student_number']
+    ordering = ['course', 'leaderboard_type', 'rank']
+    readonly_fields = ['course', 'leaderboard_type', 'student', 'score', 'rank', 'refreshed_at']
+
+
 # Custom admin actions
 def award_badge_to_students(modeladmin, request, queryset):
     """Custom action to award a badge to selected students"""
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from achievements.services import LeaderboardService
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized achievement leaderboards (run on a schedule, e.g. every few minutes)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, help='Only refresh the leaderboards of this course')
+        parser.add_argument(
+            '--type',
+            choices=list(LeaderboardService.SCORE_FIELDS),
+            help='Only refresh this leaderboard type'
+        )
+    
+    def handle(self, *args, **options):
+        if options['course']:
+            courses = Course.objects.filter(id=options['course'])
+            if not courses.exists():
+                raise CommandError(f"Course {options['course']} not found")
+        else:
+            courses = Course.objects.filter(is_active=True)
+        
+        if options['type']:
+            leaderboard_types = [options['type']]
+        else:
+            leaderboard_types = list(LeaderboardService.SCORE_FIELDS)
+        
+        for leaderboard_type in leaderboard_types:
+            if not options['course']:
+                count = LeaderboardService.refresh(leaderboard_type)
+                self.stdout.write(f"global {leaderboard_type}: {count} entries")
+            
+            for course in courses:
+                count = LeaderboardService.refresh(leaderboard_type, course)
+                self.stdout.write(f"{course.code} {leaderboard_type}: {count} entries")
+        
+        self.stdout.write(self.style.SUCCESS('Leaderboards refreshed'))
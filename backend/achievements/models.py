@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F
 from django.utils import timezone
 from users.models import User
 from courses.models import Course
@@ -85,14 +86,26 @@ class StudentAchievement(models.Model):
         if new_level != self.level:
             self.level = new_level
             self.xp_to_next_level = (new_level * 1000) - self.total_xp
-            self.save()
+            self.save(update_fields=['level', 'xp_to_next_level', 'updated_at'])
         return self.level
     
-    def add_xp(self, xp_amount):
-        """Add XP and recalculate level"""
-        self.total_xp += xp_amount
-        self.calculate_level()
-        self.save()
+    def add_xp(self, xp_amount, badges=0):
+        """
+        Add XP (and optionally earned badges) and recalculate level
+        
+        Done in one UPDATE with F-expressions so concurrent awards for the same
+        student cannot overwrite each other.
+        """
+        new_total = F('total_xp') + xp_amount
+        new_level = new_total / 1000 + 1
+        StudentAchievement.objects.filter(pk=self.pk).update(
+            total_xp=new_total,
+            level=new_level,
+            xp_to_next_level=new_level * 1000 - new_total,
+            badges_earned=F('badges_earned') + badges,
+            updated_at=timezone.now()
+        )
+        self.refresh_from_db(fields=['total_xp', 'level', 'xp_to_next_level', 'badges_earned', 'updated_at'])
     
     def update_streak(self):
         """Update streak based on daily activity"""
@@ -116,7 +129,7 @@ class StudentAchievement(models.Model):
             self.best_streak = self.current_streak
         
         self.last_activity_date = today
-        self.save()
+        self.save(update_fields=['current_streak', 'best_streak', 'last_activity_date', 'updated_at'])
         return self.current_streak
     
     def update_stats(self):
@@ -124,7 +137,7 @@ class StudentAchievement(models.Model):
         from ai_quiz.models import AdaptiveQuizAttempt
     
         attempts = AdaptiveQuizAttempt.objects.filter(
-            progress__student=self.student
+            student=self.student
         )
 
         if attempts.exists():
@@ -142,7 +155,11 @@ class StudentAchievement(models.Model):
                     total_duration += duration
             self.total_study_time = total_duration
 
-        self.save()
+        # Only write the derived stats so concurrent XP/badge updates are kept
+        self.save(update_fields=[
+            'total_quizzes_completed', 'perfect_scores', 'average_score',
+            'total_study_time', 'updated_at'
+        ])
 
 
 class EarnedBadge(models.Model):
@@ -189,4 +206,42 @@ class DailyActivity(models.Model):
         ordering = ['-date']
     
     def __str__(self):
-        return f"{self.student.get_full_name()} - {self.date}"
\ No newline at end of file
+        return f"{self.student.get_full_name()} - {self.date}"
+
+class LeaderboardEntry(models.Model):
+    """Materialized leaderboard position of a student (per course and leaderboard type)"""
+    LEADERBOARD_TYPES = [
+        ('xp', 'Total XP'),
+        ('badges', 'Badges Earned'),
+        ('streak', 'Current Streak'),
+    ]
+    
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='leaderboard_entries',
+        help_text="Empty for the global leaderboard"
+    )
+    leaderboard_type = models.CharField(max_length=10, choices=LEADERBOARD_TYPES)
+    student = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='leaderboard_entries',
+        limit_choices_to={'user_type': 'student'}
+    )
+    score = models.IntegerField(default=0)
+    rank = models.PositiveIntegerField()
+    refreshed_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        unique_together = ['course', 'leaderboard_type', 'student']
+        ordering = ['leaderboard_type', 'rank']
+        indexes = [
+            models.Index(fields=['course', 'leaderboard_type', 'rank']),
+        ]
+    
+    def __str__(self):
+        scope = self.course.code if self.course else 'Global'
+        return f"{scope} {self.leaderboard_type} #{self.rank} - {self.student.get_full_name()}"
@@ -1,9 +1,11 @@
+from django.conf import settings
 from django.utils import timezone
-from django.db import models
-from django.db.models import Avg, Count
+from django.db import connection, models, transaction
+from django.db.models import Avg, Count, F
 from datetime import timedelta
+import zlib
 
-from .models import StudentAchievement, BadgeType, EarnedBadge, DailyActivity
+from .models import StudentAchievement, BadgeType, EarnedBadge, DailyActivity, LeaderboardEntry
 
 
 class AchievementService:
@@ -36,12 +38,8 @@ class AchievementService:
                     badge_type=badge_type
                 )
                 
-                # Add XP reward
-                achievement.add_xp(badge_type.xp_reward)
-                
-                # Update badge count
-                achievement.badges_earned += 1
-                achievement.save()
+                # Add XP reward and update badge count
+                achievement.add_xp(badge_type.xp_reward, badges=1)
                 
                 newly_earned.append(earned_badge)
         
@@ -76,10 +74,60 @@ class AchievementService:
     @classmethod
     def get_badge_progress(cls, student, badge_type):
         """Get student's progress towards earning a specific badge"""
-        achievement, created = StudentAchievement.objects.get_or_create(student=student)
-        if created:
-            achievement.update_stats()
+        achievement = cls.ensure_student_achievement_exists(student)
+        return cls._calculate_badge_progress(achievement, badge_type)
+    
+    @classmethod
+    def get_badge_progress_bulk(cls, student, badge_types):
+        """
+        Get student's progress towards many badges at once
+        
+        The achievement record is loaded once and progress is computed in
+        memory, so the query count does not depend on the number of badges.
+        
+        Returns:
+            Dictionary of badge type id -> progress data
+        """
+        achievement = cls.ensure_student_achievement_exists(student)
+        return {
+            badge_type.id: cls._calculate_badge_progress(achievement, badge_type)
+            for badge_type in badge_types
+        }
+    
+    @classmethod
+    def get_badge_collection(cls, student, filter_type='all'):
+        """Get all active badges with earned status and progress for a student"""
+        badge_types = BadgeType.objects.filter(is_active=True)
+        if filter_type != 'all':
+            badge_types = badge_types.filter(rarity=filter_type)
+        badge_types = list(badge_types)
+        
+        earned_at_lookup = dict(
+            EarnedBadge.objects.filter(student=student).values_list('badge_type_id', 'earned_at')
+        )
+        progress_lookup = cls.get_badge_progress_bulk(student, badge_types)
+        
+        collection = []
+        for badge_type in badge_types:
+            collection.append({
+                'id': badge_type.id,
+                'name': badge_type.name,
+                'description': badge_type.description,
+                'category': badge_type.category,
+                'rarity': badge_type.rarity,
+                'icon': badge_type.icon,
+                'color': badge_type.color,
+                'xp_reward': badge_type.xp_reward,
+                'is_earned': badge_type.id in earned_at_lookup,
+                'earned_at': earned_at_lookup.get(badge_type.id),
+                'progress': progress_lookup[badge_type.id]
+            })
         
+        return collection
+    
+    @classmethod
+    def _calculate_badge_progress(cls, achievement, badge_type):
+        """Calculate badge progress from an already loaded achievement record"""
         progress_data = {
             'current_value': 0,
             'required_value': 0,
@@ -90,40 +138,31 @@ class AchievementService:
         
         # Check which criteria applies to this badge
         if badge_type.required_score is not None:
-            progress_data['criteria_type'] = 'average_score'
-            progress_data['current_value'] = achievement.average_score
-            progress_data['required_value'] = badge_type.required_score
-            progress_data['percentage'] = min(
-                (achievement.average_score / badge_type.required_score) * 100, 100
-            )
-            progress_data['is_completed'] = achievement.average_score >= badge_type.required_score
-        
+            criteria_type = 'average_score'
+            current_value = achievement.average_score
+            required_value = badge_type.required_score
         elif badge_type.required_streak is not None:
-            progress_data['criteria_type'] = 'streak'
-            progress_data['current_value'] = achievement.current_streak
-            progress_data['required_value'] = badge_type.required_streak
-            progress_data['percentage'] = min(
-                (achievement.current_streak / badge_type.required_streak) * 100, 100
-            )
-            progress_data['is_completed'] = achievement.current_streak >= badge_type.required_streak
-        
+            criteria_type = 'streak'
+            current_value = achievement.current_streak
+            required_value = badge_type.required_streak
         elif badge_type.required_quizzes is not None:
-            progress_data['criteria_type'] = 'total_quizzes'
-            progress_data['current_value'] = achievement.total_quizzes_completed
-            progress_data['required_value'] = badge_type.required_quizzes
-            progress_data['percentage'] = min(
-                (achievement.total_quizzes_completed / badge_type.required_quizzes) * 100, 100
-            )
-            progress_data['is_completed'] = achievement.total_quizzes_completed >= badge_type.required_quizzes
-        
+            criteria_type = 'total_quizzes'
+            current_value = achievement.total_quizzes_completed
+            required_value = badge_type.required_quizzes
         elif badge_type.required_perfect_scores is not None:
-            progress_data['criteria_type'] = 'perfect_scores'
-            progress_data['current_value'] = achievement.perfect_scores
-            progress_data['required_value'] = badge_type.required_perfect_scores
-            progress_data['percentage'] = min(
-                (achievement.perfect_scores / badge_type.required_perfect_scores) * 100, 100
-            )
-            progress_data['is_completed'] = achievement.perfect_scores >= badge_type.required_perfect_scores
+            criteria_type = 'perfect_scores'
+            current_value = achievement.perfect_scores
+            required_value = badge_type.required_perfect_scores
+        else:
+            return progress_data
+        
+        progress_data['criteria_type'] = criteria_type
+        progress_data['current_value'] = current_value
+        progress_data['required_value'] = required_value
+        progress_data['percentage'] = (
+            min((current_value / required_value) * 100, 100) if required_value else 100
+        )
+        progress_data['is_completed'] = current_value >= required_value
         
         return progress_data
     
@@ -157,14 +196,85 @@ class AchievementService:
     @classmethod
     def process_ai_quiz_completion(cls, student, adaptive_quiz_attempt):
         """Process achievement updates when student completes an AI quiz"""
-        from ai_quiz.models import AdaptiveQuizAttempt
+        return cls.process_ai_quiz_completions(student, [adaptive_quiz_attempt])
     
+    @classmethod
+    def process_ai_quiz_completions(cls, student, adaptive_quiz_attempts):
+        """
+        Process achievement updates for one or more AI quiz attempts of a student
+        
+        XP is still earned per attempt, but stats, streak, daily activity and
+        badge checks run once for the whole batch.
+        """
         # Update achievement stats
         achievement, created = StudentAchievement.objects.get_or_create(student=student)
         achievement.update_stats()
         achievement.update_streak()
+        
+        # Average completion time per difficulty, computed once for the batch
+        attempt_ids = [attempt.id for attempt in adaptive_quiz_attempts]
+        average_seconds = {}
+        for attempt in adaptive_quiz_attempts:
+            difficulty = attempt.progress.adaptive_quiz.difficulty
+            if difficulty not in average_seconds:
+                average_seconds[difficulty] = cls._ai_quiz_average_seconds(difficulty, attempt_ids)
+        
+        total_xp = 0
+        activity_by_date = {}
+        for attempt in adaptive_quiz_attempts:
+            difficulty = attempt.progress.adaptive_quiz.difficulty
+            attempt_xp = cls._calculate_ai_quiz_xp(attempt, average_seconds[difficulty])
+            total_xp += attempt_xp
+            
+            # Offline-captured attempts count towards the day they were taken
+            activity_date = timezone.localdate(attempt.completed_at) if attempt.completed_at else timezone.now().date()
+            activity = activity_by_date.setdefault(
+                activity_date, {'quizzes': 0, 'xp': 0, 'study_time': timedelta()}
+            )
+            activity['quizzes'] += 1
+            activity['xp'] += attempt_xp
+            if attempt.completed_at and attempt.started_at:
+                activity['study_time'] += attempt.completed_at - attempt.started_at
+        
+        achievement.add_xp(total_xp)
+        
+        # Update daily activity for AI quizzes
+        from analytics.models import ActivityYear
+        for activity_date, activity in activity_by_date.items():
+            daily_activity, created = DailyActivity.objects.get_or_create(
+                student=student,
+                date=activity_date,
+                defaults={
+                    'quizzes_completed': 0,
+                    'xp_earned': 0,
+                    'study_time': timedelta()
+                }
+            )
+            
+            # Increment in the database so concurrent submissions are all counted
+            DailyActivity.objects.filter(pk=daily_activity.pk).update(
+                quizzes_completed=F('quizzes_completed') + activity['quizzes'],
+                xp_earned=F('xp_earned') + activity['xp'],
+                study_time=F('study_time') + activity['study_time']
+            )
+            
+            # Keep the compact yearly calendar used by heatmaps and streaks in step
+            ActivityYear.record_activity(student, activity_date, quizzes=activity['quizzes'])
+        
+        # Check for new badges based on AI quiz performance
+        new_badges = cls.check_and_award_ai_quiz_badges(student)
+        
+        return {
+            'xp_earned': total_xp,
+            'total_xp': achievement.total_xp,
+            'level': achievement.level,
+            'new_badges': new_badges,
+            'streak': achievement.current_streak
+        }
     
-        # Calculate XP based on AI quiz performance and difficulty
+    @classmethod
+    def _calculate_ai_quiz_xp(cls, adaptive_quiz_attempt, average_seconds):
+        """Calculate XP based on AI quiz performance and difficulty"""
         base_xp = 50
     
         # Difficulty multipliers
@@ -181,40 +291,9 @@ class AchievementService:
         score_bonus = int(adaptive_quiz_attempt.score_percentage * 2)
     
         # Time bonus for AI quizzes
-        time_bonus = cls._calculate_ai_quiz_time_bonus(adaptive_quiz_attempt)
-    
-        total_xp = int(base_xp + difficulty_bonus + score_bonus + time_bonus)
-        achievement.add_xp(total_xp)
-    
-        # Update daily activity for AI quizzes
-        today = timezone.now().date()
-        daily_activity, created = DailyActivity.objects.get_or_create(
-            student=student,
-            date=today,
-            defaults={
-                'quizzes_completed': 0,
-                'xp_earned': 0,
-                'study_time': timedelta()
-            }
-        )
-    
-        daily_activity.quizzes_completed += 1
-        daily_activity.xp_earned += total_xp
-        if adaptive_quiz_attempt.completed_at and adaptive_quiz_attempt.started_at:
-            duration = adaptive_quiz_attempt.completed_at - adaptive_quiz_attempt.started_at
-            daily_activity.study_time += duration
-        daily_activity.save()
+        time_bonus = cls._time_bonus_from_average(adaptive_quiz_attempt, average_seconds)
     
-        # Check for new badges based on AI quiz performance
-        new_badges = cls.check_and_award_ai_quiz_badges(student)
-    
-        return {
-            'xp_earned': total_xp,
-            'total_xp': achievement.total_xp,
-            'level': achievement.level,
-            'new_badges': new_badges,
-            'streak': achievement.current_streak
-        }
+        return int(base_xp + difficulty_bonus + score_bonus + time_bonus)
 
     @classmethod
     def _calculate_ai_quiz_time_bonus(cls, adaptive_quiz_attempt):
@@ -222,35 +301,45 @@ class AchievementService:
         if not (adaptive_quiz_attempt.completed_at and adaptive_quiz_attempt.started_at):
             return 0
     
-        # Get average time for this difficulty level
+        difficulty = adaptive_quiz_attempt.progress.adaptive_quiz.difficulty
+        average_seconds = cls._ai_quiz_average_seconds(difficulty, [adaptive_quiz_attempt.id])
+        return cls._time_bonus_from_average(adaptive_quiz_attempt, average_seconds)
+    
+    @classmethod
+    def _ai_quiz_average_seconds(cls, difficulty, exclude_attempt_ids):
+        """Average completion time for a difficulty level (None if there is no history)"""
         from ai_quiz.models import AdaptiveQuizAttempt
     
-        difficulty = adaptive_quiz_attempt.progress.adaptive_quiz.difficulty
-        avg_time_attempts = AdaptiveQuizAttempt.objects.filter(
-            progress__adaptive_quiz__difficulty=difficulty,
+        durations = AdaptiveQuizAttempt.objects.filter(
+            difficulty=difficulty,
             completed_at__isnull=False,
             started_at__isnull=False
-        ).exclude(id=adaptive_quiz_attempt.id)
-    
-        if not avg_time_attempts.exists():
-            return 10
+        ).exclude(id__in=exclude_attempt_ids).values_list('started_at', 'completed_at')
     
         # Calculate average time for this difficulty
         total_seconds = 0
         count = 0
-        for attempt in avg_time_attempts:
-            duration = attempt.completed_at - attempt.started_at
-            total_seconds += duration.total_seconds()
+        for started_at, completed_at in durations:
+            total_seconds += (completed_at - started_at).total_seconds()
             count += 1
     
         if count == 0:
+            return None
+        return total_seconds / count
+    
+    @classmethod
+    def _time_bonus_from_average(cls, adaptive_quiz_attempt, average_seconds):
+        """Time bonus relative to the average completion time"""
+        if not (adaptive_quiz_attempt.completed_at and adaptive_quiz_attempt.started_at):
+            return 0
+        
+        if not average_seconds:
             return 10
     
-        avg_seconds = total_seconds / count
         attempt_duration = (adaptive_quiz_attempt.completed_at - adaptive_quiz_attempt.started_at).total_seconds()
     
         # Bonus for completing faster than average
-        time_ratio = attempt_duration / avg_seconds
+        time_ratio = attempt_duration / average_seconds
     
         if time_ratio < 0.7:
             return 30
@@ -272,7 +361,7 @@ class AchievementService:
         # Get AI quiz specific stats
         from ai_quiz.models import AdaptiveQuizAttempt
         ai_attempts = AdaptiveQuizAttempt.objects.filter(
-            progress__student=student
+            student=student
         )
     
         # Get badges not yet earned
@@ -292,12 +381,8 @@ class AchievementService:
                     badge_type=badge_type
                 )
             
-                # Add XP reward
-                achievement.add_xp(badge_type.xp_reward)
-            
-                # Update badge count
-                achievement.badges_earned += 1
-                achievement.save()
+                # Add XP reward and update badge count
+                achievement.add_xp(badge_type.xp_reward, badges=1)
             
                 newly_earned.append(earned_badge)
     
@@ -332,4 +417,147 @@ class AchievementService:
             if achievement.current_streak < badge_type.required_streak:
                 return False
     
-        return True
\ No newline at end of file
+        return True
+
+
+class LeaderboardService:
+    """Service for the materialized leaderboards"""
+    
+    SCORE_FIELDS = {
+        'xp': 'total_xp',
+        'badges': 'badges_earned',
+        'streak': 'current_streak',
+    }
+    
+    @staticmethod
+    def _lock(leaderboard_type, course=None):
+        """
+        Serialize rebuilds of one leaderboard until the current transaction ends
+        
+        Concurrent rebuilds would otherwise race between delete and bulk_create
+        (IntegrityError on course boards, duplicate rows on the global board,
+        where NULL course escapes unique_together). SQLite only has one writer
+        at a time anyway.
+        """
+        if connection.vendor != 'postgresql':
+            return
+        scope = course.id if course is not None else 0
+        key = zlib.crc32(f'leaderboard:{leaderboard_type}:{scope}'.encode('ascii'))
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [key])
+    
+    @staticmethod
+    def _is_fresh(leaderboard_type, course=None):
+        last_refresh = LeaderboardEntry.objects.filter(
+            course=course, leaderboard_type=leaderboard_type
+        ).values_list('refreshed_at', flat=True).first()
+        
+        max_age = timedelta(seconds=settings.LEADERBOARD_REFRESH_SECONDS)
+        return last_refresh is not None and timezone.now() - last_refresh <= max_age
+    
+    @classmethod
+    def refresh(cls, leaderboard_type, course=None):
+        """Rebuild the ranking for one leaderboard type (global when course is None)"""
+        with transaction.atomic():
+            cls._lock(leaderboard_type, course)
+            return cls._rebuild(leaderboard_type, course)
+    
+    @classmethod
+    def _rebuild(cls, leaderboard_type, course=None):
+        score_field = cls.SCORE_FIELDS[leaderboard_type]
+        
+        achievements = StudentAchievement.objects.all()
+        if course is not None:
+            achievements = achievements.filter(
+                student__course_enrollments__course=course,
+                student__course_enrollments__is_active=True
+            )
+        
+        # Ties are broken by student id so ranks are stable between refreshes
+        rows = achievements.order_by(f'-{score_field}', 'student_id').values_list(
+            'student_id', score_field
+        )
+        
+        refreshed_at = timezone.now()
+        entries = [
+            LeaderboardEntry(
+                course=course,
+                leaderboard_type=leaderboard_type,
+                student_id=student_id,
+                score=score,
+                rank=rank,
+                refreshed_at=refreshed_at
+            )
+            for rank, (student_id, score) in enumerate(rows, 1)
+        ]
+        
+        LeaderboardEntry.objects.filter(
+            course=course, leaderboard_type=leaderboard_type
+        ).delete()
+        LeaderboardEntry.objects.bulk_create(entries, batch_size=1000)
+        
+        return len(entries)
+    
+    @classmethod
+    def ensure_fresh(cls, leaderboard_type, course=None):
+        """Refresh the leaderboard if it was never built or is older than the refresh interval"""
+        if cls._is_fresh(leaderboard_type, course):
+            return
+        
+        with transaction.atomic():
+            cls._lock(leaderboard_type, course)
+            # Requests that waited on the lock find the board already rebuilt
+            if not cls._is_fresh(leaderboard_type, course):
+                cls._rebuild(leaderboard_type, course)
+    
+    @classmethod
+    def _entries(cls, leaderboard_type, course=None):
+        return LeaderboardEntry.objects.filter(
+            course=course, leaderboard_type=leaderboard_type
+        ).select_related('student', 'student__achievements').order_by('rank')
+    
+    @classmethod
+    def get_page(cls, leaderboard_type, course=None, page=1, page_size=10):
+        """Get one page of the ranking by rank range (no OFFSET scan)"""
+        first_rank = (page - 1) * page_size + 1
+        return list(cls._entries(leaderboard_type, course).filter(
+            rank__gte=first_rank,
+            rank__lt=first_rank + page_size
+        ))
+    
+    @classmethod
+    def get_total(cls, leaderboard_type, course=None):
+        return LeaderboardEntry.objects.filter(
+            course=course, leaderboard_type=leaderboard_type
+        ).count()
+    
+    @classmethod
+    def get_student_neighbourhood(cls, student, leaderboard_type, course=None, radius=2):
+        """Get a student's own entry and the entries ranked directly around it"""
+        entry = LeaderboardEntry.objects.filter(
+            course=course, leaderboard_type=leaderboard_type, student=student
+        ).first()
+        
+        if entry is None:
+            return None, []
+        
+        neighbours = list(cls._entries(leaderboard_type, course).filter(
+            rank__gte=max(entry.rank - radius, 1),
+            rank__lte=entry.rank + radius
+        ))
+        return entry, neighbours
+    
+    @classmethod
+    def entry_data(cls, entry):
+        """Serialize a leaderboard entry for the API"""
+        achievement = entry.student.achievements
+        return {
+            'rank': entry.rank,
+            'student_name': entry.student.get_full_name(),
+            'student_number': entry.student.student_number,
+            'level': achievement.level,
+            'total_xp': achievement.total_xp,
+            'badges_earned': achievement.badges_earned,
+            'current_streak': achievement.current_streak,
+            'average_score': round(achievement.average_score, 1)
+        }
@@ -1,4 +1,7 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
+from django.db import connection, connections
+from unittest import skipUnless
+import threading
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
@@ -6,7 +9,8 @@ from django.utils import timezone
 from users.models import User
 from courses.models import Course, Topic, CourseEnrollment
 from .models import BadgeType, EarnedBadge, StudentAchievement
-from .services import AchievementService
+from .services import AchievementService, LeaderboardService
+from .models import LeaderboardEntry
 
 class AchievementIntegrationTest(APITestCase):
     """Test Cases 8 & 9 - Achievement system functionality"""
@@ -61,4 +65,165 @@ class AchievementIntegrationTest(APITestCase):
             xp_reward=200,
             required_quizzes=5,
             required_score=80.0
-        )
\ No newline at end of file
+        )
+
+class LeaderboardTest(APITestCase):
+    """Materialized leaderboard paging and rank lookups"""
+    
+    def setUp(self):
+        self.lecturer = User.objects.create_user(
+            username='boardlecturer',
+            email='boardlecturer@test.com',
+            password='testpass123',
+            user_type='lecturer'
+        )
+        self.course = Course.objects.create(
+            name='Board Course',
+            code='BOARD101',
+            description='Leaderboard course',
+            lecturer=self.lecturer
+        )
+        
+        self.students = []
+        for i in range(12):
+            student = User.objects.create_user(
+                username=f'boardstudent{i}',
+                email=f'boardstudent{i}@test.com',
+                password='testpass123',
+                user_type='student',
+                student_number=f'BRD{i:03d}'
+            )
+            StudentAchievement.objects.update_or_create(
+                student=student,
+                defaults={'total_xp': i * 100}
+            )
+            CourseEnrollment.objects.create(student=student, course=self.course, is_active=True)
+            self.students.append(student)
+    
+    def test_leaderboard_pages_through_full_ranking(self):
+        self.client.force_authenticate(user=self.students[0])
+        
+        response = self.client.get('/api/achievements/leaderboard/', {'type': 'xp', 'page': 2, 'page_size': 5})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_entries'], 12)
+        self.assertEqual([row['rank'] for row in response.data['leaderboard']], [6, 7, 8, 9, 10])
+        self.assertEqual(response.data['leaderboard'][0]['total_xp'], 600)
+    
+    def test_my_rank_outside_top_ten(self):
+        self.client.force_authenticate(user=self.students[0])
+        
+        response = self.client.get('/api/achievements/leaderboard/me/', {
+            'type': 'xp', 'course_id': self.course.id, 'radius': 1
+        })
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['rank'], 12)
+        self.assertEqual([row['rank'] for row in response.data['neighbours']], [11, 12])
+    
+    def test_invalid_leaderboard_type(self):
+        self.client.force_authenticate(user=self.students[0])
+        
+        response = self.client.get('/api/achievements/leaderboard/', {'type': 'unknown'})
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Concurrent refreshes need PostgreSQL')
+class LeaderboardConcurrentRefreshTest(TransactionTestCase):
+    """Stale boards requested in parallel are rebuilt once, without errors or duplicates"""
+    
+    def setUp(self):
+        lecturer = User.objects.create_user(username='racelecturer', email='racelecturer@test.com', user_type='lecturer')
+        self.course = Course.objects.create(name='Race Course', code='RACE101', description='', lecturer=lecturer)
+        for i in range(20):
+            student = User.objects.create_user(
+                username=f'racestudent{i}', email=f'racestudent{i}@test.com',
+                user_type='student', student_number=f'RACE{i:03d}'
+            )
+            StudentAchievement.objects.update_or_create(student=student, defaults={'total_xp': i * 10})
+            CourseEnrollment.objects.create(student=student, course=self.course, is_active=True)
+    
+    def test_parallel_refreshes(self):
+        workers = 8
+        barrier = threading.Barrier(workers)
+        errors = []
+        
+        def request_boards():
+            try:
+                barrier.wait()
+                LeaderboardService.ensure_fresh('xp')
+                LeaderboardService.ensure_fresh('xp', self.course)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+        
+        threads = [threading.Thread(target=request_boards) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            LeaderboardEntry.objects.filter(course=None, leaderboard_type='xp').count(),
+            StudentAchievement.objects.count()
+        )
+        self.assertEqual(LeaderboardEntry.objects.filter(course=self.course, leaderboard_type='xp').count(), 20)
+
+
+class BadgeProgressTest(APITestCase):
+    """Badge collection and progress are computed in a fixed number of queries"""
+    
+    def setUp(self):
+        self.student = User.objects.create_user(
+            username='badgestudent',
+            email='badgestudent@test.com',
+            password='testpass123',
+            user_type='student',
+            student_number='BDG001'
+        )
+        StudentAchievement.objects.update_or_create(
+            student=self.student,
+            defaults={'total_quizzes_completed': 3, 'current_streak': 2}
+        )
+        self.client.force_authenticate(user=self.student)
+    
+    def _create_badges(self, count, offset=0):
+        for i in range(offset, offset + count):
+            BadgeType.objects.create(
+                name=f'Quiz Badge {i}',
+                description='Complete quizzes',
+                category='completion',
+                icon='star',
+                required_quizzes=i + 1
+            )
+    
+    def test_badge_collection_query_count_is_constant(self):
+        self._create_badges(3)
+        AchievementService.get_badge_collection(self.student)
+        with self.assertNumQueries(3):
+            AchievementService.get_badge_collection(self.student)
+        
+        self._create_badges(10, offset=3)
+        with self.assertNumQueries(3):
+            collection = AchievementService.get_badge_collection(self.student)
+        
+        by_name = {badge['name']: badge for badge in collection}
+        self.assertEqual(len(collection), 13)
+        self.assertTrue(by_name['Quiz Badge 2']['progress']['is_completed'])
+        self.assertEqual(by_name['Quiz Badge 5']['progress']['percentage'], 50)
+    
+    def test_badge_progress_endpoint(self):
+        self._create_badges(4)
+        badge = BadgeType.objects.get(name='Quiz Badge 3')
+        
+        response = self.client.get('/api/achievements/badge-progress/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['progress']), 4)
+        
+        response = self.client.get(f'/api/achievements/badge-progress/{badge.id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['progress']['current_value'], 3)
+        self.assertFalse(response.data['progress']['is_completed'])
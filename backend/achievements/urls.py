@@ -8,6 +8,8 @@ urlpatterns = [
     # Badge Management
     path('badges/', views.badge_collection, name='badge_collection'),
     path('badges/available/', views.available_badges, name='available_badges'),
+    path('badge-progress/', views.badge_progress, name='badge_progress'),
+    path('badge-progress/<int:badge_id>/', views.badge_progress, name='badge_progress_detail'),
     
     # Achievement History and Stats
     path('history/', views.achievement_history, name='achievement_history'),
@@ -18,4 +20,5 @@ urlpatterns = [
     
     # Leaderboards
     path('leaderboard/', views.leaderboard, name='achievement_leaderboard'),
+    path('leaderboard/me/', views.my_leaderboard_rank, name='my_leaderboard_rank'),
 ]
\ No newline at end of file
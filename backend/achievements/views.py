@@ -2,7 +2,7 @@ from rest_framework import status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.utils import timezone
-from django.db.models import Q, Count
+from django.db.models import Q, Count, Sum
 from datetime import timedelta
 
 from .models import StudentAchievement, BadgeType, EarnedBadge, DailyActivity
@@ -10,8 +10,9 @@ from .serializers import (
     StudentAchievementSerializer, BadgeTypeSerializer, EarnedBadgeSerializer,
     AchievementDashboardSerializer, BadgeCollectionSerializer
 )
-from .services import AchievementService
+from .services import AchievementService, LeaderboardService
 from users.models import User
+from analytics.services import TimeBucketService
 
 
 class IsStudentPermission(permissions.BasePermission):
@@ -84,56 +85,17 @@ def badge_collection(request):
     student = request.user
     filter_type = request.query_params.get('filter', 'all')  # all, earned, gold, legendary
     
-    # Get all badge types
-    if filter_type == 'all':
-        badge_types = BadgeType.objects.filter(is_active=True)
-    else:
-        badge_types = BadgeType.objects.filter(
-            is_active=True,
-            rarity=filter_type
-        )
-    
-    # Get earned badges
-    earned_badges = EarnedBadge.objects.filter(
-        student=student
-    ).values_list('badge_type_id', flat=True)
-    
-    badge_collection_data = []
-    
-    for badge_type in badge_types:
-        is_earned = badge_type.id in earned_badges
-        earned_badge = None
-        
-        if is_earned:
-            earned_badge = EarnedBadge.objects.filter(
-                student=student, 
-                badge_type=badge_type
-            ).first()
-        
-        badge_data = {
-            'id': badge_type.id,
-            'name': badge_type.name,
-            'description': badge_type.description,
-            'category': badge_type.category,
-            'rarity': badge_type.rarity,
-            'icon': badge_type.icon,
-            'color': badge_type.color,
-            'xp_reward': badge_type.xp_reward,
-            'is_earned': is_earned,
-            'earned_at': earned_badge.earned_at if earned_badge else None,
-            'progress': AchievementService.get_badge_progress(student, badge_type)
-        }
-        
-        badge_collection_data.append(badge_data)
+    badge_collection_data = AchievementService.get_badge_collection(student, filter_type)
     
     # Count badges by rarity
+    rarities = [badge['rarity'] for badge in badge_collection_data]
     rarity_counts = {
-        'total': badge_types.count(),
+        'total': len(badge_collection_data),
         'earned': len([b for b in badge_collection_data if b['is_earned']]),
-        'common': badge_types.filter(rarity='common').count(),
-        'earned_rarity': badge_types.filter(rarity='earned').count(),
-        'gold': badge_types.filter(rarity='gold').count(),
-        'legendary': badge_types.filter(rarity='legendary').count()
+        'common': rarities.count('common'),
+        'earned_rarity': rarities.count('earned'),
+        'gold': rarities.count('gold'),
+        'legendary': rarities.count('legendary')
     }
     
     return Response({
@@ -143,6 +105,31 @@ def badge_collection(request):
     })
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, IsStudentPermission])
+def badge_progress(request, badge_id=None):
+    """Get the student's progress towards every active badge (or a single badge)"""
+    badge_types = BadgeType.objects.filter(is_active=True)
+    if badge_id is not None:
+        badge_types = badge_types.filter(id=badge_id)
+    badge_types = list(badge_types)
+    
+    if badge_id is not None and not badge_types:
+        return Response({'error': 'Badge not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    progress_lookup = AchievementService.get_badge_progress_bulk(request.user, badge_types)
+    
+    if badge_id is not None:
+        return Response({'badge_id': badge_id, 'progress': progress_lookup[badge_id]})
+    
+    return Response({
+        'progress': [
+            {'badge_id': badge_type.id, 'name': badge_type.name, 'progress': progress_lookup[badge_type.id]}
+            for badge_type in badge_types
+        ]
+    })
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated, IsStudentPermission])
 def achievement_history(request):
@@ -240,50 +227,85 @@ def check_achievements(request):
     })
 
 
-@api_view(['GET'])
-@permission_classes([permissions.IsAuthenticated, IsStudentPermission])
-def leaderboard(request):
-    """Get achievement leaderboard"""
+def _leaderboard_scope(request):
+    """Resolve leaderboard type and optional course from query params"""
     leaderboard_type = request.query_params.get('type', 'xp')  # xp, badges, streak
     course_id = request.query_params.get('course_id')
     
-    # Get students based on course filter
+    if leaderboard_type not in LeaderboardService.SCORE_FIELDS:
+        return None, None, Response(
+            {'error': f'Invalid leaderboard type: {leaderboard_type}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    course = None
     if course_id:
-        from courses.models import CourseEnrollment
-        student_ids = CourseEnrollment.objects.filter(
-            course_id=course_id,
-            is_active=True
-        ).values_list('student_id', flat=True)
-        achievements = StudentAchievement.objects.filter(student_id__in=student_ids)
-    else:
-        achievements = StudentAchievement.objects.all()
-    
-    # Order by leaderboard type
-    if leaderboard_type == 'xp':
-        achievements = achievements.order_by('-total_xp')[:10]
-    elif leaderboard_type == 'badges':
-        achievements = achievements.order_by('-badges_earned')[:10]
-    elif leaderboard_type == 'streak':
-        achievements = achievements.order_by('-current_streak')[:10]
-    
-    leaderboard_data = []
-    for i, achievement in enumerate(achievements, 1):
-        student_data = {
-            'rank': i,
-            'student_name': achievement.student.get_full_name(),
-            'student_number': achievement.student.student_number,
-            'level': achievement.level,
-            'total_xp': achievement.total_xp,
-            'badges_earned': achievement.badges_earned,
-            'current_streak': achievement.current_streak,
-            'average_score': round(achievement.average_score, 1)
-        }
-        leaderboard_data.append(student_data)
+        from courses.models import Course
+        course = Course.objects.filter(id=course_id).first()
+        if course is None:
+            return None, None, Response(
+                {'error': 'Course not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+    
+    LeaderboardService.ensure_fresh(leaderboard_type, course)
+    return leaderboard_type, course, None
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, IsStudentPermission])
+def leaderboard(request):
+    """Get a page of the achievement leaderboard"""
+    leaderboard_type, course, error_response = _leaderboard_scope(request)
+    if error_response:
+        return error_response
+    
+    try:
+        page = max(int(request.query_params.get('page', 1)), 1)
+        page_size = min(max(int(request.query_params.get('page_size', 10)), 1), 100)
+    except ValueError:
+        return Response(
+            {'error': 'page and page_size must be integers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    entries = LeaderboardService.get_page(leaderboard_type, course, page, page_size)
+    
+    return Response({
+        'leaderboard': [LeaderboardService.entry_data(entry) for entry in entries],
+        'type': leaderboard_type,
+        'course_filtered': course is not None,
+        'page': page,
+        'page_size': page_size,
+        'total_entries': LeaderboardService.get_total(leaderboard_type, course)
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, IsStudentPermission])
+def my_leaderboard_rank(request):
+    """Get the current student's rank and the students ranked around them"""
+    leaderboard_type, course, error_response = _leaderboard_scope(request)
+    if error_response:
+        return error_response
+    
+    try:
+        radius = min(max(int(request.query_params.get('radius', 2)), 0), 25)
+    except ValueError:
+        return Response({'error': 'radius must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    entry, neighbours = LeaderboardService.get_student_neighbourhood(
+        request.user, leaderboard_type, course, radius
+    )
     
     return Response({
-        'leaderboard': leaderboard_data,
+        'rank': entry.rank if entry else None,
+        'score': entry.score if entry else None,
+        'total_entries': LeaderboardService.get_total(leaderboard_type, course),
+        'neighbours': [LeaderboardService.entry_data(neighbour) for neighbour in neighbours],
         'type': leaderboard_type,
-        'course_filtered': bool(course_id)
+        'course_filtered': course is not None,
+        'refreshed_at': entry.refreshed_at if entry else None
     })
 
 
@@ -318,24 +340,26 @@ def achievement_stats(request):
         count = earned_badges.filter(badge_type__rarity=rarity_key).count()
         badge_stats['by_rarity'][rarity_key] = count
     
-    # Activity stats for last 7 days
-    week_ago = timezone.now().date() - timedelta(days=7)
-    weekly_activities = DailyActivity.objects.filter(
-        student=student,
-        date__gte=week_ago
-    ).order_by('date')
+    # Activity stats for last 7 days, one row per day (gap-filled)
+    today = timezone.now().date()
+    daily_series = TimeBucketService.series(
+        DailyActivity.objects.filter(student=student), 'date', today - timedelta(days=7), today,
+        quizzes=Sum('quizzes_completed'),
+        xp=Sum('xp_earned'),
+        active=Count('id')
+    )
     
     weekly_stats = {
-        'total_quizzes': sum(a.quizzes_completed for a in weekly_activities),
-        'total_xp': sum(a.xp_earned for a in weekly_activities),
-        'avg_daily_quizzes': sum(a.quizzes_completed for a in weekly_activities) / 7,
-        'active_days': weekly_activities.count(),
+        'total_quizzes': sum(day['quizzes'] for day in daily_series),
+        'total_xp': sum(day['xp'] for day in daily_series),
+        'avg_daily_quizzes': sum(day['quizzes'] for day in daily_series) / 7,
+        'active_days': sum(day['active'] for day in daily_series),
         'daily_breakdown': [
             {
-                'date': activity.date.isoformat(),
-                'quizzes': activity.quizzes_completed,
-                'xp': activity.xp_earned
-            } for activity in weekly_activities
+                'date': day['bucket'].isoformat(),
+                'quizzes': day['quizzes'],
+                'xp': day['xp']
+            } for day in daily_series
         ]
     }
     
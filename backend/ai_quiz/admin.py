@@ -3,7 +3,11 @@ from django.utils.html import format_html
 from django.utils import timezone
 from django.db.models import Count, Avg, Sum
 from django.contrib import messages
-from .models import LectureSlide, AdaptiveQuiz, StudentAdaptiveProgress, AdaptiveQuizAttempt
+from .models import (
+    LectureSlide, AdaptiveQuiz, AdaptiveQuizVersion, StudentAdaptiveProgress, AdaptiveQuizAttempt,
+    QuizAttemptSession, AttemptAnswerArchive
+)
+from .services import StudentCatalogCache
 
 
 @admin.register(LectureSlide)
@@ -65,7 +69,7 @@ class AdaptiveQuizAdmin(admin.ModelAdmin):
     
     fieldsets = (
         ('Quiz Information', {
-            'fields': ('lecture_slide', 'difficulty', 'is_active')
+            'fields': ('lecture_slide', 'difficulty', 'time_limit', 'is_active')
         }),
         ('Moderation', {
             'fields': ('status', 'reviewed_by', 'review_notes', 'reviewed_at')
@@ -91,29 +95,61 @@ class AdaptiveQuizAdmin(admin.ModelAdmin):
         return obj.get_question_count()
     question_count.short_description = 'Questions'
     
+    def _refresh_after_bulk_update(self, slide_ids):
+        """queryset.update() skips signals, so refresh ladders and catalog caches here"""
+        for slide_id in slide_ids:
+            AdaptiveQuiz.rebuild_difficulty_ladder(slide_id)
+        
+        course_ids = LectureSlide.objects.filter(id__in=slide_ids).values_list('topic__course_id', flat=True)
+        for course_id in set(course_ids):
+            StudentCatalogCache.bump_course(course_id)
+    
     def publish_quizzes(self, request, queryset):
         """Publish selected quizzes"""
+        slide_ids = set(queryset.values_list('lecture_slide_id', flat=True))
         updated = queryset.update(
             status='published',
             reviewed_by=request.user,
             reviewed_at=timezone.now()
         )
+        self._refresh_after_bulk_update(slide_ids)
         self.message_user(request, f'Published {updated} quizzes.')
     publish_quizzes.short_description = 'Publish selected quizzes'
     
     def mark_under_review(self, request, queryset):
         """Mark selected quizzes as under review"""
+        slide_ids = set(queryset.values_list('lecture_slide_id', flat=True))
         updated = queryset.update(status='under_review')
+        self._refresh_after_bulk_update(slide_ids)
         self.message_user(request, f'Marked {updated} quizzes as under review.')
     mark_under_review.short_description = 'Mark as under review'
     
     def mark_as_draft(self, request, queryset):
         """Mark selected quizzes as draft"""
+        slide_ids = set(queryset.values_list('lecture_slide_id', flat=True))
         updated = queryset.update(status='draft')
+        self._refresh_after_bulk_update(slide_ids)
         self.message_user(request, f'Marked {updated} quizzes as draft.')
     mark_as_draft.short_description = 'Mark as draft'
 
 
+@admin.register(AdaptiveQuizVersion)
+class AdaptiveQuizVersionAdmin(admin.ModelAdmin):
+    """Read-only admin for immutable quiz versions"""
+    
+    list_display = ('adaptive_quiz', 'version_number', 'etag', 'created_by', 'created_at')
+    list_filter = ('adaptive_quiz__difficulty',)
+    search_fields = ('adaptive_quiz__lecture_slide__title',)
+    readonly_fields = ('adaptive_quiz', 'version_number', 'questions_data', 'etag', 'created_by', 'created_at')
+    exclude = ('student_payload',)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(StudentAdaptiveProgress)
 class StudentAdaptiveProgressAdmin(admin.ModelAdmin):
     """Admin interface for student adaptive progress"""
@@ -167,8 +203,8 @@ class AdaptiveQuizAttemptAdmin(admin.ModelAdmin):
     )
     
     list_filter = (
-        'progress__adaptive_quiz__difficulty', 'score_percentage',
-        'completed_at', 'progress__adaptive_quiz__lecture_slide__topic__course'
+        'difficulty', 'score_percentage',
+        'completed_at', 'course'
     )
     
     search_fields = (
@@ -195,4 +231,27 @@ class AdaptiveQuizAttemptAdmin(admin.ModelAdmin):
     
     def difficulty(self, obj):
         return obj.progress.adaptive_quiz.difficulty.title()
-    difficulty.short_description = 'Difficulty'
\ No newline at end of file
+    difficulty.short_description = 'Difficulty'
+
+
+@admin.register(QuizAttemptSession)
+class QuizAttemptSessionAdmin(admin.ModelAdmin):
+    """Admin interface for in-progress quiz sessions"""
+    
+    list_display = ('student', 'adaptive_quiz', 'status', 'started_at', 'expires_at', 'last_saved_at', 'submitted_at', 'auto_submitted')
+    list_filter = ('status', 'auto_submitted', 'adaptive_quiz__difficulty')
+    search_fields = ('student__username', 'student__student_number', 'adaptive_quiz__lecture_slide__title')
+    readonly_fields = (
+        'student', 'adaptive_quiz', 'quiz_version', 'answers', 'attempt', 'started_at',
+        'expires_at', 'last_saved_at', 'submitted_at', 'auto_submitted'
+    )
+    ordering = ('-started_at',)
+
+
+@admin.register(AttemptAnswerArchive)
+class AttemptAnswerArchiveAdmin(admin.ModelAdmin):
+    """Admin interface for archived attempt answers"""
+    
+    list_display = ('month', 'attempt_count', 'raw_bytes', 'compressed_bytes', 'created_at')
+    readonly_fields = ('month', 'attempt_count', 'archive_file', 'raw_bytes', 'compressed_bytes', 'created_at')
+    ordering = ('-month',)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AiQuizConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ai_quiz'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,114 @@
+import base64
+import gzip
+import json
+from datetime import date, datetime, time
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from ai_quiz.models import AdaptiveQuizAttempt, AttemptAnswerArchive
+from .partition_quiz_attempts import add_months
+
+
+class Command(BaseCommand):
+    help = (
+        'Move the answers of attempts started before a date (closed semesters) into compressed '
+        'monthly archive files; scores, times and keys stay in the attempts table'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--before', required=True, help='Archive attempts started before this date (YYYY-MM-DD)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be archived')
+    
+    def handle(self, *args, **options):
+        try:
+            before = date.fromisoformat(options['before'])
+        except ValueError:
+            raise CommandError('--before must be a date in YYYY-MM-DD format')
+        
+        cutoff = timezone.make_aware(datetime.combine(before, time.min))
+        pending = AdaptiveQuizAttempt.objects.filter(
+            started_at__lt=cutoff, answers_archive__isnull=True
+        ).exclude(answers_encoded__isnull=True, answers_data__isnull=True)
+        
+        months = sorted(
+            value.date() if isinstance(value, datetime) else value
+            for value in pending.annotate(month=TruncMonth('started_at')).values_list('month', flat=True).distinct()
+        )
+        
+        total = 0
+        for month in months:
+            attempts = pending.filter(
+                started_at__gte=timezone.make_aware(datetime.combine(month, time.min)),
+                started_at__lt=min(timezone.make_aware(datetime.combine(add_months(month, 1), time.min)), cutoff)
+            )
+            if options['dry_run']:
+                count = attempts.count()
+                self.stdout.write(f'{month:%Y-%m}: {count} attempts')
+                total += count
+                continue
+            
+            archive, count = self._archive_month(month, attempts)
+            total += count
+            self.stdout.write(
+                f'{month:%Y-%m}: {count} attempts archived '
+                f'({archive.raw_bytes} bytes -> {archive.compressed_bytes} bytes)'
+            )
+        
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(f'{verb} the answers of {total} attempts'))
+    
+    def _archive_month(self, month, attempts):
+        # Files are not transactional: the new file gets its own name, the old one is
+        # only removed once the rows pointing at the new file have committed
+        written = []
+        try:
+            with transaction.atomic():
+                return self._write_month(month, attempts, written)
+        except Exception:
+            for storage, name in written:
+                storage.delete(name)
+            raise
+    
+    def _write_month(self, month, attempts, written):
+        rows = list(attempts.select_for_update().values_list('id', 'answers_encoded', 'answers_data'))
+        lines = [
+            json.dumps({
+                'id': attempt_id,
+                'encoded': base64.b64encode(bytes(encoded)).decode('ascii') if encoded is not None else None,
+                'legacy': legacy if encoded is None else None
+            })
+            for attempt_id, encoded, legacy in rows
+        ]
+        
+        # A month archived before (e.g. late imports) gets its file rewritten with both sets
+        archive = AttemptAnswerArchive.objects.select_for_update().filter(month=month).first()
+        old_name = None
+        if archive is None:
+            archive = AttemptAnswerArchive(month=month)
+        else:
+            with archive.archive_file.open('rb') as existing:
+                lines = gzip.decompress(existing.read()).decode('utf-8').splitlines() + lines
+            old_name = archive.archive_file.name
+        
+        raw = ('\n'.join(lines) + '\n').encode('utf-8')
+        compressed = gzip.compress(raw)
+        archive.attempt_count = len(lines)
+        archive.raw_bytes = len(raw)
+        archive.compressed_bytes = len(compressed)
+        storage = archive.archive_file.storage
+        archive.archive_file.save(
+            f'attempt_answers_{month:%Y%m}_{timezone.now():%Y%m%d%H%M%S}.jsonl.gz', ContentFile(compressed), save=False
+        )
+        written.append((storage, archive.archive_file.name))
+        archive.save()
+        
+        AdaptiveQuizAttempt.objects.filter(id__in=[row[0] for row in rows]).update(
+            answers_archive=archive, answers_encoded=None, answers_data=None
+        )
+        if old_name:
+            transaction.on_commit(lambda: storage.delete(old_name))
+        return archive, len(rows)
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery
+
+from ai_quiz.models import AdaptiveQuizAttempt, StudentAdaptiveProgress
+
+
+class Command(BaseCommand):
+    help = 'Fill the denormalized student/course/quiz/difficulty columns of older quiz attempts'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+    
+    def handle(self, *args, **options):
+        progress = StudentAdaptiveProgress.objects.filter(pk=OuterRef('progress_id'))
+        pending = AdaptiveQuizAttempt.objects.filter(adaptive_quiz__isnull=True).order_by('id')
+        
+        total = 0
+        while True:
+            ids = list(pending.values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            
+            # One UPDATE ... SET col = (SELECT ...) per batch, no rows through Python
+            updated = AdaptiveQuizAttempt.objects.filter(id__in=ids).update(
+                student_id=Subquery(progress.values('student_id')[:1]),
+                adaptive_quiz_id=Subquery(progress.values('adaptive_quiz_id')[:1]),
+                difficulty=Subquery(progress.values('adaptive_quiz__difficulty')[:1]),
+                course_id=Subquery(progress.values('adaptive_quiz__lecture_slide__topic__course_id')[:1])
+            )
+            total += updated
+            self.stdout.write(f'Backfilled {total} attempts')
+        
+        self.stdout.write(self.style.SUCCESS(f'Done: {total} attempts backfilled'))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery
+
+from ai_quiz.models import AdaptiveQuiz, AdaptiveQuizAttempt, AdaptiveQuizVersion
+from ai_quiz.services import QuizGradingService
+
+
+class Command(BaseCommand):
+    help = 'Create a version for every quiz without one, fill missing answer keys and link unversioned attempts'
+    
+    def handle(self, *args, **options):
+        created = 0
+        for quiz in AdaptiveQuiz.objects.filter(current_version__isnull=True).select_related('lecture_slide'):
+            quiz.ensure_current_version()
+            created += 1
+        
+        # Versions created before answer keys existed; update() because
+        # versions refuse to be re-saved
+        keyed = 0
+        for version in AdaptiveQuizVersion.objects.filter(answer_key='', question_count=0).only('id', 'questions_data'):
+            answer_key = QuizGradingService.build_answer_key(version.get_questions())
+            if answer_key:
+                AdaptiveQuizVersion.objects.filter(id=version.id).update(
+                    answer_key=answer_key,
+                    question_count=len(answer_key)
+                )
+                keyed += 1
+        
+        # The questions an old attempt saw were never recorded, so the best
+        # available reference is the version snapshotted from the current data
+        linked = AdaptiveQuizAttempt.objects.filter(quiz_version__isnull=True).update(
+            quiz_version=Subquery(
+                AdaptiveQuiz.objects.filter(
+                    student_progress=OuterRef('progress')
+                ).values('current_version')[:1]
+            )
+        )
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created} quiz versions, added {keyed} answer keys, linked {linked} attempts'
+        ))
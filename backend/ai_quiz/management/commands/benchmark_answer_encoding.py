@@ -0,0 +1,170 @@
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ai_quiz.models import LectureSlide, AdaptiveQuiz, StudentAdaptiveProgress, AdaptiveQuizAttempt
+from ai_quiz.services import QuizGradingService
+from courses.models import Course, Topic
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare table/TOAST size and full-scan time of JSON vs compact attempt answers '
+        '(PostgreSQL; synthetic data, rolled back afterwards)'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=200000)
+        parser.add_argument('--questions', type=int, default=10)
+        parser.add_argument('--students', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+    
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Relation and TOAST sizes need PostgreSQL')
+        
+        with transaction.atomic():
+            attempt_ids = self._generate(options)
+            
+            # One fresh table per encoding (no dead tuples), same rows apart from the answers column
+            tables = {
+                'JSON': self._copy('bench_answers_json', attempt_ids, exclude='answers_encoded'),
+                'encoded': self._copy('bench_answers_encoded', attempt_ids, exclude='answers_data'),
+            }
+            
+            results = {}
+            for name, (table, column) in tables.items():
+                sizes = self._sizes(table)
+                seconds, counts = self._scan(table, column, name, options)
+                results[name] = (sizes, seconds, counts)
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                self.stdout.write(
+                    f'table {sizes[0] / 1024 / 1024:.1f} MiB, TOAST {sizes[1] / 1024 / 1024:.1f} MiB, '
+                    f'total with indexes {sizes[2] / 1024 / 1024:.1f} MiB'
+                )
+                self.stdout.write(f'full scan + choice distribution: {seconds * 1000:.0f} ms median')
+            
+            if results['JSON'][2] != results['encoded'][2]:
+                raise CommandError('JSON and encoded scans disagree')
+            
+            json_total, encoded_total = results['JSON'][0][2], results['encoded'][0][2]
+            self.stdout.write(
+                f'encoded: {json_total / encoded_total:.1f}x smaller, '
+                f'{results["JSON"][1] / results["encoded"][1]:.1f}x faster to scan'
+            )
+            
+            # Leave the database as it was
+            transaction.set_rollback(True)
+    
+    def _generate(self, options):
+        rng = random.Random(options['seed'])
+        question_count = options['questions']
+        choices = QuizGradingService.VALID_CHOICES
+        now = timezone.now()
+        
+        lecturer = User.objects.create(
+            username='bench_lecturer', email='bench_lecturer@example.com', user_type='lecturer'
+        )
+        students = User.objects.bulk_create([
+            User(username=f'bench_student_{i}', email=f'bench_student_{i}@example.com',
+                 user_type='student', student_number=f'BENCH{i:06d}')
+            for i in range(options['students'])
+        ])
+        course = Course.objects.create(name='Bench course', code='BENCH000', description='', lecturer=lecturer)
+        topic = Topic.objects.create(course=course, name='Bench topic')
+        slide = LectureSlide.objects.create(topic=topic, title='Bench slide', uploaded_by=lecturer)
+        quiz = AdaptiveQuiz.objects.create(lecture_slide=slide, difficulty='easy', questions_data={'questions': []})
+        progress_rows = StudentAdaptiveProgress.objects.bulk_create([
+            StudentAdaptiveProgress(student=student, adaptive_quiz=quiz) for student in students
+        ])
+        
+        attempts = []
+        for _ in range(options['attempts']):
+            progress = rng.choice(progress_rows)
+            # ~5% of questions left unanswered
+            answers = {
+                f'question_{i}': rng.choice(choices)
+                for i in range(question_count) if rng.random() > 0.05
+            }
+            attempts.append(AdaptiveQuizAttempt(
+                progress=progress,
+                student_id=progress.student_id,
+                adaptive_quiz=quiz,
+                course=course,
+                difficulty=quiz.difficulty,
+                answers_data=answers,
+                answers_encoded=QuizGradingService.encode_answers(answers, question_count),
+                score_percentage=rng.random() * 100,
+                started_at=now
+            ))
+        AdaptiveQuizAttempt.objects.bulk_create(attempts, batch_size=5000)
+        
+        self.stdout.write(f"{options['attempts']} attempts x {question_count} questions")
+        return [attempt.id for attempt in attempts]
+    
+    def _copy(self, table, attempt_ids, exclude):
+        """Copy the generated attempts into a temporary table without the ``exclude`` column"""
+        qn = connection.ops.quote_name
+        columns = [
+            field.column for field in AdaptiveQuizAttempt._meta.concrete_fields if field.column != exclude
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {qn(table)} AS SELECT {", ".join(map(qn, columns))} '
+                f'FROM {qn(AdaptiveQuizAttempt._meta.db_table)} WHERE id = ANY(%s)',
+                [attempt_ids]
+            )
+            cursor.execute(f'CREATE INDEX ON {qn(table)} (id)')
+            cursor.execute(f'ANALYZE {qn(table)}')
+        answers_column = 'answers_data' if exclude == 'answers_encoded' else 'answers_encoded'
+        return table, answers_column
+    
+    def _sizes(self, table):
+        """(heap, TOAST, total including indexes) in bytes"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_relation_size(c.oid), '
+                'coalesce(pg_total_relation_size(nullif(c.reltoastrelid, 0)), 0), '
+                'pg_total_relation_size(c.oid) '
+                'FROM pg_class c WHERE c.oid = %s::regclass',
+                [table]
+            )
+            return cursor.fetchone()
+    
+    def _scan(self, table, column, name, options):
+        """Read every answer and build the per-question choice distribution (quiz_statistics' work)"""
+        question_count = options['questions']
+        choices = QuizGradingService.VALID_CHOICES
+        qn = connection.ops.quote_name
+        
+        timings = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT {qn(column)} FROM {qn(table)}')
+                rows = [row[0] for row in cursor.fetchall()]
+            
+            if name == 'JSON':
+                counts = [dict.fromkeys(choices, 0) for _ in range(question_count)]
+                for answers in rows:
+                    if isinstance(answers, str):
+                        answers = json.loads(answers)
+                    for key, answer in answers.items():
+                        counts[int(key.removeprefix('question_'))][answer] += 1
+            else:
+                matrix = QuizGradingService.answers_matrix(rows, question_count)
+                per_choice = {choice: (matrix == ord(choice)).sum(axis=0) for choice in choices}
+                counts = [
+                    {choice: int(per_choice[choice][i]) for choice in choices}
+                    for i in range(question_count)
+                ]
+            timings.append(time.perf_counter() - start)
+        
+        return statistics.median(timings), counts
@@ -0,0 +1,125 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ai_quiz.models import LectureSlide, AdaptiveQuiz, StudentAdaptiveProgress, AdaptiveQuizAttempt
+from courses.models import Course, Topic
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare EXPLAIN plans and timings of attempt queries through the progress join chain '
+        'vs the denormalized course/student keys (synthetic data, rolled back afterwards)'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=20)
+        parser.add_argument('--students', type=int, default=500)
+        parser.add_argument('--attempts', type=int, default=100000)
+        parser.add_argument('--days', type=int, default=180, help='Spread attempts over this many days')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+    
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            course, student = self._generate(options)
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE ai_quiz_adaptivequizattempt')
+            
+            since = timezone.now() - timedelta(days=28)
+            attempts = AdaptiveQuizAttempt.objects.all()
+            cases = [
+                (
+                    'course, last 4 weeks',
+                    attempts.filter(progress__adaptive_quiz__lecture_slide__topic__course=course, started_at__gte=since),
+                    attempts.filter(course=course, started_at__gte=since),
+                ),
+                (
+                    'student, latest 10',
+                    attempts.filter(progress__student=student).order_by('-started_at')[:10],
+                    attempts.filter(student=student).order_by('-started_at')[:10],
+                ),
+            ]
+            
+            for label, before, after in cases:
+                self.stdout.write(self.style.MIGRATE_HEADING(label))
+                for name, queryset in (('before (join chain)', before), ('after (denormalized)', after)):
+                    self.stdout.write(f'{name}: {self._time(queryset, options["repeat"]):.2f} ms median')
+                    self.stdout.write(self._explain(queryset))
+            
+            # Leave the database as it was
+            transaction.set_rollback(True)
+    
+    def _generate(self, options):
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        
+        lecturer = User.objects.create(
+            username='bench_lecturer', email='bench_lecturer@example.com', user_type='lecturer'
+        )
+        students = User.objects.bulk_create([
+            User(username=f'bench_student_{i}', email=f'bench_student_{i}@example.com',
+                 user_type='student', student_number=f'BENCH{i:06d}')
+            for i in range(options['students'])
+        ])
+        
+        quizzes = []
+        for c in range(options['courses']):
+            course = Course.objects.create(
+                name=f'Bench course {c}', code=f'BENCH{c:03d}', description='', lecturer=lecturer
+            )
+            topic = Topic.objects.create(course=course, name='Bench topic')
+            slide = LectureSlide.objects.create(topic=topic, title='Bench slide', uploaded_by=lecturer)
+            for difficulty in ('easy', 'medium', 'hard'):
+                quiz = AdaptiveQuiz(lecture_slide=slide, difficulty=difficulty, questions_data={'questions': []})
+                quiz.course_id = course.id
+                quizzes.append(quiz)
+        AdaptiveQuiz.objects.bulk_create(quizzes)
+        
+        progress_rows = StudentAdaptiveProgress.objects.bulk_create([
+            StudentAdaptiveProgress(student=student, adaptive_quiz=quiz)
+            for student in students for quiz in rng.sample(quizzes, min(6, len(quizzes)))
+        ])
+        quiz_lookup = {quiz.id: quiz for quiz in quizzes}
+        
+        attempts = []
+        for _ in range(options['attempts']):
+            progress = rng.choice(progress_rows)
+            quiz = quiz_lookup[progress.adaptive_quiz_id]
+            started_at = now - timedelta(seconds=rng.randint(0, options['days'] * 86400))
+            attempts.append(AdaptiveQuizAttempt(
+                progress=progress,
+                student_id=progress.student_id,
+                adaptive_quiz_id=quiz.id,
+                course_id=quiz.course_id,
+                difficulty=quiz.difficulty,
+                score_percentage=rng.choice((0.0, 50.0, 100.0)),
+                started_at=started_at,
+                completed_at=started_at + timedelta(minutes=5)
+            ))
+        AdaptiveQuizAttempt.objects.bulk_create(attempts, batch_size=5000)
+        
+        self.stdout.write(
+            f"{options['attempts']} attempts, {options['students']} students, {options['courses']} courses"
+        )
+        return Course.objects.get(id=quizzes[0].course_id), students[0]
+    
+    def _time(self, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(queryset.values_list('id', flat=True))
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+    
+    def _explain(self, queryset):
+        if connection.vendor == 'postgresql':
+            return queryset.explain(analyze=True)
+        return queryset.explain()
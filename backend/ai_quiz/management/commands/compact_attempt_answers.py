@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from ai_quiz.models import AdaptiveQuizAttempt
+from ai_quiz.services import QuizGradingService
+
+
+class Command(BaseCommand):
+    help = 'Move legacy JSON attempt answers into the compact one-byte-per-question encoding'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be converted')
+    
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        legacy_attempts = AdaptiveQuizAttempt.objects.filter(
+            answers_encoded__isnull=True,
+            answers_data__isnull=False
+        ).select_related('quiz_version').only(
+            'id', 'answers_data', 'quiz_version__question_count'
+        ).order_by('id')
+        
+        converted = skipped = 0
+        last_id = 0
+        while True:
+            batch = list(legacy_attempts.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            
+            to_update = []
+            for attempt in batch:
+                answers = attempt.answers_data
+                # Leave anything the encoding can't represent (malformed keys,
+                # non A-D values) in JSON so nothing is lost
+                if not QuizGradingService.is_encodable(answers):
+                    skipped += 1
+                    continue
+                
+                question_count = attempt.quiz_version.question_count if attempt.quiz_version else 0
+                highest_index = max((int(key.removeprefix('question_')) for key in answers), default=-1)
+                attempt.set_answers(answers, max(question_count, highest_index + 1))
+                to_update.append(attempt)
+            
+            if not options['dry_run']:
+                AdaptiveQuizAttempt.objects.bulk_update(to_update, ['answers_encoded', 'answers_data'])
+            converted += len(to_update)
+        
+        verb = 'Would convert' if options['dry_run'] else 'Converted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {converted} attempts; {skipped} left in JSON because they cannot be encoded'
+        ))
@@ -0,0 +1,23 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ai_quiz.services import QuizAutosaveBuffer
+
+
+class Command(BaseCommand):
+    help = 'Write buffered quiz autosaves to the database in batches (once, or continuously with --loop)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--loop', action='store_true', help='Keep flushing every QUIZ_AUTOSAVE_FLUSH_SECONDS')
+    
+    def handle(self, *args, **options):
+        while True:
+            written = QuizAutosaveBuffer.flush(batch_size=options['batch_size'])
+            self.stdout.write(f'Flushed {written} quiz sessions')
+            
+            if not options['loop']:
+                break
+            time.sleep(settings.QUIZ_AUTOSAVE_FLUSH_SECONDS)
@@ -0,0 +1,134 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ai_quiz.models import AdaptiveQuizAttempt
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+class Command(BaseCommand):
+    help = (
+        'Range-partition the quiz attempts table by started_at month (PostgreSQL). '
+        'Run once with --convert, then regularly to create upcoming monthly partitions'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3, help='Future months to create partitions for')
+        parser.add_argument(
+            '--convert', action='store_true',
+            help='One-time conversion of the existing table into a partitioned table (locks the table while copying)'
+        )
+    
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Declarative partitioning needs PostgreSQL')
+        
+        self.table = AdaptiveQuizAttempt._meta.db_table
+        
+        with transaction.atomic(), connection.cursor() as cursor:
+            if options['convert']:
+                if self._is_partitioned(cursor):
+                    raise CommandError(f'{self.table} is already partitioned')
+                self._convert(cursor, options['months_ahead'])
+            else:
+                if not self._is_partitioned(cursor):
+                    raise CommandError(f'{self.table} is not partitioned yet, run with --convert first')
+                this_month = timezone.now().date().replace(day=1)
+                created = self._create_partitions(cursor, this_month, add_months(this_month, options['months_ahead']))
+                self.stdout.write(self.style.SUCCESS(f'{created} new partitions created'))
+    
+    def _is_partitioned(self, cursor):
+        cursor.execute(
+            "SELECT c.relkind = 'p' FROM pg_class c WHERE c.oid = to_regclass(%s)", [self.table]
+        )
+        row = cursor.fetchone()
+        if row is None:
+            raise CommandError(f'Table {self.table} does not exist')
+        return row[0]
+    
+    def _create_partitions(self, cursor, first_month, last_month):
+        """Create monthly partitions first_month..last_month (inclusive) and the default partition"""
+        qn = connection.ops.quote_name
+        created = 0
+        month = first_month
+        while month <= last_month:
+            name = f'{self.table}_{month:%Y%m}'
+            cursor.execute('SELECT to_regclass(%s) IS NULL', [name])
+            if cursor.fetchone()[0]:
+                cursor.execute(
+                    f'CREATE TABLE {qn(name)} PARTITION OF {qn(self.table)} '
+                    f'FOR VALUES FROM (%s) TO (%s)',
+                    [month.isoformat(), add_months(month, 1).isoformat()]
+                )
+                created += 1
+            month = add_months(month, 1)
+        
+        # Catches rows outside the pre-created range so inserts never fail
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS {qn(self.table + "_default")} PARTITION OF {qn(self.table)} DEFAULT'
+        )
+        return created
+    
+    def _convert(self, cursor, months_ahead):
+        qn = connection.ops.quote_name
+        legacy = f'{self.table}_legacy'
+        
+        cursor.execute(f'LOCK TABLE {qn(self.table)} IN ACCESS EXCLUSIVE MODE')
+        # Deferred foreign key checks still pending in this transaction would block the DROP
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        
+        # Remember secondary indexes and foreign keys, they are rebuilt on the new parent
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s "
+            "AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s))",
+            [self.table, self.table]
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype IN ('f', 'c')",
+            [self.table]
+        )
+        constraints = cursor.fetchall()
+        
+        cursor.execute(f'ALTER TABLE {qn(self.table)} RENAME TO {qn(legacy)}')
+        
+        # The partition key has to be part of the primary key. The new parent gets
+        # its own id identity (restarted past the copied ids below)
+        cursor.execute(
+            f'CREATE TABLE {qn(self.table)} (LIKE {qn(legacy)} INCLUDING DEFAULTS INCLUDING IDENTITY) '
+            f'PARTITION BY RANGE (started_at)'
+        )
+        cursor.execute(f'ALTER TABLE {qn(self.table)} ADD PRIMARY KEY (id, started_at)')
+        
+        cursor.execute(f'SELECT min(started_at) FROM {qn(legacy)}')
+        oldest = cursor.fetchone()[0]
+        this_month = timezone.now().date().replace(day=1)
+        first_month = oldest.date().replace(day=1) if oldest else this_month
+        created = self._create_partitions(cursor, min(first_month, this_month), add_months(this_month, months_ahead))
+        
+        cursor.execute(f'INSERT INTO {qn(self.table)} SELECT * FROM {qn(legacy)}')
+        moved = cursor.rowcount
+        
+        # (id, started_at) alone would not stop new attempts from reusing copied ids
+        cursor.execute(f'SELECT coalesce(max(id), 0) + 1 FROM {qn(legacy)}')
+        next_id = cursor.fetchone()[0]
+        cursor.execute(f'ALTER TABLE {qn(self.table)} ALTER COLUMN id RESTART WITH {int(next_id)}')
+        cursor.execute(f'DROP TABLE {qn(legacy)} CASCADE')
+        
+        # The definitions were read before the rename, so they already name the new
+        # parent table; unique indexes would have to include started_at
+        for name, definition in indexes:
+            cursor.execute(definition.replace('CREATE UNIQUE INDEX', 'CREATE INDEX'))
+        for name, definition in constraints:
+            cursor.execute(f'ALTER TABLE {qn(self.table)} ADD CONSTRAINT {qn(name)} {definition}')
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'{self.table} converted: {moved} attempts copied into {created} monthly partitions'
+        ))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from ai_quiz.models import StudentAdaptiveProgress
+
+
+class Command(BaseCommand):
+    help = 'Delete StudentAdaptiveProgress rows that were created by catalog reads but never attempted'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would be deleted')
+        parser.add_argument('--batch-size', type=int, default=1000)
+    
+    def handle(self, *args, **options):
+        empty_progress = StudentAdaptiveProgress.objects.filter(
+            attempts_count=0,
+            completed=False,
+            explanation_viewed=False,
+            attempts__isnull=True
+        )
+        
+        if options['dry_run']:
+            self.stdout.write(f'{empty_progress.count()} empty progress rows would be deleted')
+            return
+        
+        deleted = 0
+        while True:
+            batch_ids = list(empty_progress.values_list('id', flat=True)[:options['batch_size']])
+            if not batch_ids:
+                break
+            deleted += StudentAdaptiveProgress.objects.filter(id__in=batch_ids).delete()[0]
+        
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} empty progress rows'))
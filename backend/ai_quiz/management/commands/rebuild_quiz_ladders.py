@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from ai_quiz.models import AdaptiveQuiz
+
+
+class Command(BaseCommand):
+    help = 'Recompute the difficulty-ladder prerequisite of every adaptive quiz'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--slide', type=int, help='Only rebuild the ladder of this lecture slide')
+    
+    def handle(self, *args, **options):
+        if options['slide']:
+            slide_ids = [options['slide']]
+        else:
+            slide_ids = AdaptiveQuiz.objects.values_list('lecture_slide_id', flat=True).distinct()
+        
+        updated = 0
+        for slide_id in slide_ids:
+            updated += AdaptiveQuiz.rebuild_difficulty_ladder(slide_id)
+        
+        self.stdout.write(self.style.SUCCESS(f'Updated the prerequisite of {updated} quizzes'))
@@ -0,0 +1,156 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from achievements.models import DailyActivity, StudentAchievement
+from achievements.services import AchievementService
+from ai_quiz.models import AdaptiveQuiz, AdaptiveQuizAttempt, StudentAdaptiveProgress
+from ai_quiz.services import AdaptiveQuizService
+from courses.models import CourseEnrollment
+
+
+class Command(BaseCommand):
+    help = (
+        'Fire parallel quiz submissions at one quiz and check that progress, achievement '
+        'and daily counters add up (needs PostgreSQL; writes real attempts, use a scratch database)'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--quiz', type=int, required=True, help='Adaptive quiz to submit against')
+        parser.add_argument('--submissions', type=int, default=200)
+        parser.add_argument('--workers', type=int, default=16)
+        parser.add_argument('--students', type=int, default=5, help='Enrolled students to spread submissions over')
+    
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Concurrent submissions need a database with row-level locking (PostgreSQL)')
+        
+        try:
+            quiz = AdaptiveQuiz.objects.select_related('lecture_slide__topic__course').get(id=options['quiz'])
+        except AdaptiveQuiz.DoesNotExist:
+            raise CommandError(f"Quiz {options['quiz']} not found")
+        
+        course = quiz.lecture_slide.topic.course
+        students = [
+            enrollment.student for enrollment in CourseEnrollment.objects.filter(
+                course=course, is_active=True
+            ).select_related('student')[:options['students']]
+        ]
+        if not students:
+            raise CommandError(f'No students enrolled in {course.code}')
+        
+        quiz_version = quiz.ensure_current_version()
+        answers = {f'question_{i}': 'A' for i in range(quiz_version.question_count)}
+        today = timezone.now().date()
+        
+        def snapshot():
+            return {
+                student.id: (
+                    StudentAdaptiveProgress.objects.filter(
+                        student=student, adaptive_quiz=quiz
+                    ).values_list('attempts_count', flat=True).first() or 0,
+                    DailyActivity.objects.filter(
+                        student=student, date=today
+                    ).values_list('quizzes_completed', flat=True).first() or 0,
+                    AdaptiveQuizAttempt.objects.filter(
+                        progress__student=student, progress__adaptive_quiz=quiz
+                    ).count()
+                )
+                for student in students
+            }
+        
+        before = snapshot()
+        xp_before = StudentAchievement.objects.filter(student__in=students).aggregate(total=Sum('total_xp'))['total'] or 0
+        
+        # Sample PostgreSQL for sessions waiting on a lock while the submissions run
+        stop_sampling = threading.Event()
+        lock_samples = []
+        
+        def sample_lock_waits():
+            try:
+                with connections['default'].cursor() as cursor:
+                    while not stop_sampling.is_set():
+                        cursor.execute(
+                            "SELECT count(*) FROM pg_stat_activity "
+                            "WHERE wait_event_type = 'Lock' AND datname = current_database()"
+                        )
+                        lock_samples.append(cursor.fetchone()[0])
+                        time.sleep(0.01)
+            finally:
+                connections.close_all()
+        
+        xp_awarded = []
+        
+        def submit(index):
+            student = students[index % len(students)]
+            started = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    result = AdaptiveQuizService.process_quiz_attempt(student, quiz, answers, quiz_version)
+                    attempt = AdaptiveQuizAttempt.objects.select_related(
+                        'progress__adaptive_quiz'
+                    ).get(id=result['attempt_id'])
+                    achievement_result = AchievementService.process_ai_quiz_completion(student, attempt)
+                    xp_awarded.append(achievement_result['xp_earned'])
+                return time.perf_counter() - started
+            finally:
+                connections.close_all()
+        
+        sampler = threading.Thread(target=sample_lock_waits)
+        sampler.start()
+        wall_started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                latencies = sorted(pool.map(submit, range(options['submissions'])))
+        finally:
+            stop_sampling.set()
+            sampler.join()
+        wall_time = time.perf_counter() - wall_started
+        
+        after = snapshot()
+        xp_after = StudentAchievement.objects.filter(student__in=students).aggregate(total=Sum('total_xp'))['total'] or 0
+        
+        # Every submission must be reflected exactly once in every counter
+        problems = []
+        for index, student in enumerate(students):
+            expected = len(range(index, options['submissions'], len(students)))
+            progress_delta = after[student.id][0] - before[student.id][0]
+            daily_delta = after[student.id][1] - before[student.id][1]
+            attempts_delta = after[student.id][2] - before[student.id][2]
+            if not progress_delta == daily_delta == attempts_delta == expected:
+                problems.append(
+                    f'{student.username}: expected {expected}, progress +{progress_delta}, '
+                    f'daily +{daily_delta}, attempts +{attempts_delta}'
+                )
+        if xp_after - xp_before < sum(xp_awarded):
+            problems.append(f'XP: awarded {sum(xp_awarded)}, total only grew by {xp_after - xp_before}')
+        
+        def percentile(values, fraction):
+            return values[min(len(values) - 1, int(len(values) * fraction))] * 1000
+        
+        self.stdout.write(
+            f"{options['submissions']} submissions, {options['workers']} workers, {len(students)} students "
+            f"in {wall_time:.2f}s ({options['submissions'] / wall_time:.1f}/s)"
+        )
+        self.stdout.write(
+            f"latency ms: p50 {percentile(latencies, 0.5):.1f}  p95 {percentile(latencies, 0.95):.1f}  "
+            f"max {latencies[-1] * 1000:.1f}"
+        )
+        if lock_samples:
+            waiting = [sample for sample in lock_samples if sample]
+            self.stdout.write(
+                f"lock waits: max {max(lock_samples)} sessions waiting, "
+                f"{len(waiting) / len(lock_samples) * 100:.0f}% of samples with a waiter"
+            )
+        
+        if problems:
+            for problem in problems:
+                self.stdout.write(self.style.ERROR(problem))
+            raise CommandError('Lost updates detected')
+        
+        self.stdout.write(self.style.SUCCESS('All counters consistent'))
@@ -0,0 +1,48 @@
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ai_quiz.services import AdaptiveQuizService
+from users.models import TaskLease
+
+
+LEASE_NAME = 'ai_quiz:sweep_expired_quiz_sessions'
+
+
+class Command(BaseCommand):
+    help = (
+        'Auto-submit timed quiz sessions left open past their deadline '
+        '(once, or continuously with --loop; only one node sweeps at a time)'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--loop', action='store_true', help='Keep sweeping every QUIZ_SESSION_SWEEP_SECONDS')
+    
+    def handle(self, *args, **options):
+        holder = f'{socket.gethostname()}:{os.getpid()}'
+        # Long enough to finish a sweep, short enough for quick takeover after a crash
+        lease_seconds = settings.QUIZ_SESSION_SWEEP_SECONDS * 3
+        
+        while True:
+            if TaskLease.acquire(LEASE_NAME, holder, lease_seconds):
+                submitted = 0
+                while True:
+                    swept = AdaptiveQuizService.sweep_expired_sessions(batch_size=options['batch_size'])
+                    submitted += swept
+                    if swept < options['batch_size']:
+                        break
+                    # Renew between batches so a long backlog does not lose the lease
+                    if not TaskLease.acquire(LEASE_NAME, holder, lease_seconds):
+                        break
+                self.stdout.write(f'Auto-submitted {submitted} expired quiz sessions')
+            else:
+                self.stdout.write('Another node holds the sweeper lease; skipping')
+            
+            if not options['loop']:
+                TaskLease.release(LEASE_NAME, holder)
+                break
+            time.sleep(settings.QUIZ_SESSION_SWEEP_SECONDS)
@@ -1,5 +1,14 @@
-from django.db import models
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
 from django.utils import timezone
+from django.core.serializers.json import DjangoJSONEncoder
+import base64
+import copy
+import gzip
+import hashlib
+import json
 from django.core.exceptions import ValidationError
 from users.models import User
 
@@ -70,6 +79,15 @@ class LectureSlide(models.Model):
         return f"{self.topic.course.code} - {self.title}"
 
 
+class AdaptiveQuizQuerySet(models.QuerySet):
+    def with_version_summary(self):
+        """Join the current version's answer key and question count, without its large fields"""
+        return self.select_related('current_version').defer(
+            'current_version__questions_data',
+            'current_version__student_payload'
+        )
+
+
 class AdaptiveQuiz(models.Model):
     """Adaptive quizzes generated from lecture slides"""
     DIFFICULTY_CHOICES = [
@@ -113,6 +131,37 @@ class AdaptiveQuiz(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Timed quizzes: sessions past started_at + time_limit are auto-submitted
+    # by sweep_expired_quiz_sessions
+    time_limit = models.DurationField(
+        null=True,
+        blank=True,
+        help_text='Time allowed per attempt (empty = untimed)'
+    )
+    
+    # Difficulty ladder: the published quiz on the same slide that has to be
+    # completed first. Maintained by rebuild_difficulty_ladder().
+    prerequisite_quiz = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='unlocks_quizzes'
+    )
+    
+    # Immutable snapshot currently served to students (see AdaptiveQuizVersion)
+    current_version = models.ForeignKey(
+        'AdaptiveQuizVersion',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    
+    DIFFICULTY_LADDER = ['easy', 'medium', 'hard']
+    
+    objects = AdaptiveQuizQuerySet.as_manager()
+    
     class Meta:
         ordering = ['difficulty', '-created_at']
         unique_together = ('lecture_slide', 'difficulty')
@@ -123,6 +172,10 @@ class AdaptiveQuiz(models.Model):
     
     def get_question_count(self):
         """Get number of questions in this quiz"""
+        # Use the stored count when the current version was joined in
+        # (see with_version_summary) instead of re-parsing the JSON
+        if self.current_version_id and AdaptiveQuiz.current_version.is_cached(self):
+            return self.current_version.question_count
         questions = self.get_questions()
         return len(questions.get('questions', []))
     
@@ -131,10 +184,159 @@ class AdaptiveQuiz(models.Model):
         """Check if quiz is available to students"""
         return self.status == 'published' and self.is_active
     
+    @classmethod
+    def rebuild_difficulty_ladder(cls, lecture_slide_id):
+        """
+        Recompute prerequisite_quiz for every quiz of a lecture slide
+        
+        Each published, active quiz points to the nearest lower published,
+        active difficulty on the same slide; everything else points nowhere.
+        """
+        quizzes = list(cls.objects.filter(lecture_slide_id=lecture_slide_id))
+        
+        published = {
+            quiz.difficulty: quiz for quiz in quizzes
+            if quiz.is_available_to_students and quiz.difficulty in cls.DIFFICULTY_LADDER
+        }
+        
+        updated = 0
+        for quiz in quizzes:
+            prerequisite_id = None
+            if quiz.difficulty in published:
+                for lower in reversed(cls.DIFFICULTY_LADDER[:cls.DIFFICULTY_LADDER.index(quiz.difficulty)]):
+                    if lower in published:
+                        prerequisite_id = published[lower].id
+                        break
+            
+            if quiz.prerequisite_quiz_id != prerequisite_id:
+                # update() keeps this out of the post_save signal that calls us
+                cls.objects.filter(id=quiz.id).update(prerequisite_quiz_id=prerequisite_id)
+                updated += 1
+        
+        return updated
+    
+    def is_unlocked_for(self, progress_lookup):
+        """Check the difficulty ladder against a quiz id -> progress mapping"""
+        if self.prerequisite_quiz_id is None:
+            return True
+        prerequisite_progress = progress_lookup.get(self.prerequisite_quiz_id)
+        return bool(prerequisite_progress and prerequisite_progress.completed)
+    
+    def ensure_current_version(self, created_by=None):
+        """
+        Return the version matching the quiz's current questions, creating a
+        new immutable version if the questions changed since the last one
+        """
+        current = self.current_version
+        if current is not None and current.questions_data == self.questions_data:
+            return current
+        
+        last_number = self.versions.aggregate(models.Max('version_number'))['version_number__max'] or 0
+        try:
+            with transaction.atomic():
+                version = AdaptiveQuizVersion.objects.create(
+                    adaptive_quiz=self,
+                    version_number=last_number + 1,
+                    questions_data=copy.deepcopy(self.questions_data),
+                    created_by=created_by
+                )
+        except IntegrityError:
+            # A concurrent request (e.g. two students opening the quiz) created it first
+            latest = self.versions.order_by('-version_number').first()
+            self.current_version = latest
+            if latest.questions_data == self.questions_data:
+                return latest
+            return self.ensure_current_version(created_by)
+        
+        # update() so publishing a version doesn't re-trigger post_save handlers
+        AdaptiveQuiz.objects.filter(id=self.id).update(current_version=version)
+        self.current_version = version
+        return version
+    
     def __str__(self):
         return f"{self.lecture_slide.title} - {self.difficulty.title()} ({self.status})"
 
 
+class AdaptiveQuizVersion(models.Model):
+    """
+    Immutable snapshot of an adaptive quiz's questions
+    
+    Created on every publish or edit that changes the questions. Attempts
+    reference the version they were taken against, and the answer-stripped
+    student payload is rendered once and stored with its ETag.
+    """
+    adaptive_quiz = models.ForeignKey(
+        AdaptiveQuiz,
+        on_delete=models.CASCADE,
+        related_name='versions'
+    )
+    version_number = models.PositiveIntegerField()
+    questions_data = models.JSONField(editable=False)
+    
+    # Pre-serialized JSON served to students (no answers or explanations)
+    student_payload = models.BinaryField(editable=False)
+    etag = models.CharField(max_length=64, editable=False)
+    
+    # One character per question ("ACBDA"), used for grading without the JSON
+    answer_key = models.TextField(blank=True, editable=False)
+    question_count = models.PositiveIntegerField(default=0, editable=False)
+    
+    created_by = models.ForeignKey(
+        'users.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ('adaptive_quiz', 'version_number')
+        ordering = ['adaptive_quiz', '-version_number']
+    
+    def get_questions(self):
+        """Get the snapshot's question list"""
+        questions_data = self.questions_data if isinstance(self.questions_data, dict) else {}
+        return questions_data.get('questions', [])
+    
+    def build_student_payload(self):
+        """Render the student view of this version (answers and explanations removed)"""
+        student_questions = [
+            {
+                'question_number': i,
+                'question': question.get('question'),
+                'options': question.get('options'),
+                'difficulty': question.get('difficulty')
+            }
+            for i, question in enumerate(self.get_questions())
+        ]
+        
+        payload = {
+            'quiz_id': self.adaptive_quiz_id,
+            'version': self.version_number,
+            'title': self.adaptive_quiz.lecture_slide.title,
+            'difficulty': self.adaptive_quiz.difficulty,
+            'question_count': len(student_questions),
+            'questions': student_questions
+        }
+        return json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':')).encode('utf-8')
+    
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError('Quiz versions are immutable; create a new version instead')
+        
+        from .services import QuizGradingService
+        
+        self.answer_key = QuizGradingService.build_answer_key(self.get_questions())
+        self.question_count = len(self.answer_key)
+        self.student_payload = self.build_student_payload()
+        self.etag = hashlib.sha256(self.student_payload).hexdigest()
+        super().save(*args, **kwargs)
+    
+    def __str__(self):
+        return f"{self.adaptive_quiz} v{self.version_number}"
+
+
 class StudentAdaptiveProgress(models.Model):
     """Track student progress through adaptive quizzes"""
     student = models.ForeignKey(
@@ -177,6 +379,52 @@ class StudentAdaptiveProgress(models.Model):
         """Check if explanation should be shown after 3 failed attempts"""
         return self.attempts_count >= 3 and self.latest_score < 50
     
+    def record_attempt(self, score_percentage, attempted_at=None):
+        """
+        Count an attempt with a single UPDATE instead of read-modify-write
+        
+        Concurrent submissions for the same progress row cannot lose updates;
+        they queue on the row lock, which is held until the caller's transaction
+        commits (for submit_adaptive_quiz that includes the completion side
+        effects). Returns True if this attempt completed the quiz.
+        
+        update() sends no post_save, so the student's cached catalog is
+        invalidated here, once the change is committed.
+        """
+        from .services import StudentCatalogCache
+        
+        attempted_at = attempted_at or timezone.now()
+        rows = StudentAdaptiveProgress.objects.filter(pk=self.pk)
+        
+        rows.update(
+            attempts_count=F('attempts_count') + 1,
+            latest_score=score_percentage,
+            best_score=Greatest('best_score', Value(score_percentage, output_field=models.FloatField())),
+            last_attempt_at=attempted_at
+        )
+        
+        # Only one concurrent attempt can flip completed, so unlocking runs once
+        newly_completed = False
+        if score_percentage >= 50:
+            newly_completed = bool(rows.filter(completed=False).update(
+                completed=True,
+                completed_at=attempted_at
+            ))
+        
+        self.refresh_from_db(fields=[
+            'attempts_count', 'latest_score', 'best_score', 'completed',
+            'completed_at', 'last_attempt_at', 'unlocked_next_level'
+        ])
+        
+        if newly_completed:
+            self.check_unlock_next_level()
+            if self.unlocked_next_level:
+                rows.update(unlocked_next_level=True)
+        
+        student_id = self.student_id
+        transaction.on_commit(lambda: StudentCatalogCache.bump_student(student_id))
+        return newly_completed
+    
     def mark_completed(self, score):
         """Mark quiz as completed with given score"""
         self.latest_score = score
@@ -216,16 +464,13 @@ class StudentAdaptiveProgress(models.Model):
                     is_active=True       # FIXED: Only unlock active quizzes
                 )
                 
-                # Create or update progress for next level
-                next_progress, created = StudentAdaptiveProgress.objects.get_or_create(
+                # Only touch an existing progress row for the next level; a
+                # missing row already reads as "not started" and is created
+                # on the student's first attempt
+                StudentAdaptiveProgress.objects.filter(
                     student=self.student,
-                    adaptive_quiz=next_quiz,
-                    defaults={'unlocked_next_level': True}
-                )
-                
-                if not created:
-                    next_progress.unlocked_next_level = True
-                    next_progress.save()
+                    adaptive_quiz=next_quiz
+                ).update(unlocked_next_level=True)
                 
                 self.unlocked_next_level = True
                 
@@ -244,23 +489,223 @@ class AdaptiveQuizAttempt(models.Model):
         related_name='attempts'
     )
     
+    # Denormalized from progress -> adaptive_quiz -> lecture_slide -> topic -> course
+    # so analytics can filter attempts without the join chain. Filled on insert
+    # (see fill_denormalized_keys); rows from before are filled by backfill_attempt_keys.
+    student = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        db_index=False,
+        related_name='adaptive_quiz_attempts'
+    )
+    course = models.ForeignKey(
+        'courses.Course',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        db_index=False,
+        related_name='adaptive_quiz_attempts'
+    )
+    adaptive_quiz = models.ForeignKey(
+        AdaptiveQuiz,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='quiz_attempts'
+    )
+    difficulty = models.CharField(max_length=10, choices=AdaptiveQuiz.DIFFICULTY_CHOICES, blank=True)
+    
     # Attempt details
+    quiz_version = models.ForeignKey(
+        AdaptiveQuizVersion,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='attempts',
+        help_text='Quiz version the attempt was graded against'
+    )
+    
+    # New attempts store answers_encoded (one ASCII byte per question, see
+    # QuizGradingService); answers_data only holds legacy JSON answers
     answers_data = models.JSONField(
-        help_text='Student answers for this attempt'
+        null=True,
+        blank=True,
+        help_text='Legacy JSON answers (use get_answers())'
+    )
+    answers_encoded = models.BinaryField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text='Student answers for this attempt, one byte per question'
+    )
+    answers_archive = models.ForeignKey(
+        'AttemptAnswerArchive',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='attempts',
+        help_text='Cold archive holding the answers of this attempt (see archive_quiz_attempts)'
     )
     score_percentage = models.FloatField()
     time_taken = models.DurationField(null=True, blank=True)
     
-    # Timestamps
-    started_at = models.DateTimeField(auto_now_add=True)
-    completed_at = models.DateTimeField(auto_now=True)
+    # Timestamps (settable so offline-captured attempts keep their real times)
+    started_at = models.DateTimeField(default=timezone.now)
+    completed_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         ordering = ['-started_at']
+        indexes = [
+            # Leading columns double as the course/student foreign key indexes
+            models.Index(fields=['course', 'started_at']),
+            models.Index(fields=['student', 'started_at']),
+        ]
+    
+    def save(self, *args, **kwargs):
+        if self.adaptive_quiz_id is None:
+            self.fill_denormalized_keys()
+        super().save(*args, **kwargs)
+    
+    def fill_denormalized_keys(self):
+        """Copy student, quiz, difficulty and course from the progress chain"""
+        adaptive_quiz = self.progress.adaptive_quiz
+        self.student_id = self.progress.student_id
+        self.adaptive_quiz = adaptive_quiz
+        self.difficulty = adaptive_quiz.difficulty
+        self.course_id = adaptive_quiz.lecture_slide.topic.course_id
     
     def get_answers(self):
         """Get answers as Python dict"""
+        if self.answers_archive_id is not None:
+            return self.answers_archive.get_answers(self.id)
+        if self.answers_encoded is not None:
+            from .services import QuizGradingService
+            return QuizGradingService.decode_answers(self.answers_encoded)
         return self.answers_data if isinstance(self.answers_data, dict) else {}
     
+    def set_answers(self, answers, question_count):
+        """Store answers in the compact encoding"""
+        from .services import QuizGradingService
+        self.answers_encoded = QuizGradingService.encode_answers(answers, question_count)
+        self.answers_data = None
+    
+    def __str__(self):
+        return f"Attempt {self.id} - {self.progress.student.get_full_name()} ({self.score_percentage}%)"
+
+
+class AttemptAnswerArchive(models.Model):
+    """
+    Compressed cold-storage copy of one month of attempt answers
+    
+    Archived attempts keep their summary columns (score, times, keys) in the
+    attempts table; only the answer payload moves into a gzipped JSON-lines
+    file in the default storage.
+    """
+    month = models.DateField(unique=True, help_text='First day of the archived month')
+    attempt_count = models.PositiveIntegerField(default=0)
+    archive_file = models.FileField(upload_to='attempt_archives/')
+    raw_bytes = models.PositiveBigIntegerField(default=0)
+    compressed_bytes = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-month']
+    
+    def load(self):
+        """All archived answers of the month, keyed by attempt id"""
+        if not hasattr(self, '_answers'):
+            with self.archive_file.open('rb') as archive:
+                lines = gzip.decompress(archive.read()).decode('utf-8').splitlines()
+            
+            self._answers = {}
+            for line in lines:
+                row = json.loads(line)
+                if row['encoded'] is not None:
+                    from .services import QuizGradingService
+                    answers = QuizGradingService.decode_answers(base64.b64decode(row['encoded']))
+                else:
+                    answers = row['legacy'] if isinstance(row['legacy'], dict) else {}
+                self._answers[row['id']] = answers
+        return self._answers
+    
+    def get_answers(self, attempt_id):
+        return self.load().get(attempt_id, {})
+    
+    def __str__(self):
+        return f"Attempt answers {self.month:%Y-%m} ({self.attempt_count} attempts)"
+
+
+class QuizAttemptSession(models.Model):
+    """
+    An adaptive quiz attempt in progress
+    
+    Autosaved answers are written here, in batches when a shared cache
+    buffers them (see QuizAutosaveBuffer); finalizing grades the answers through the normal
+    attempt path with the real start and end times.
+    """
+    STATUS_CHOICES = [
+        ('in_progress', 'In Progress'),
+        ('submitted', 'Submitted'),
+    ]
+    
+    student = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='quiz_sessions',
+        limit_choices_to={'user_type': 'student'}
+    )
+    adaptive_quiz = models.ForeignKey(
+        AdaptiveQuiz,
+        on_delete=models.CASCADE,
+        related_name='sessions'
+    )
+    quiz_version = models.ForeignKey(
+        AdaptiveQuizVersion,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='sessions',
+        help_text='Quiz version the student was shown'
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='in_progress')
+    
+    # Last flushed autosave
+    answers = models.JSONField(default=dict, blank=True)
+    last_saved_at = models.DateTimeField(null=True, blank=True)
+    
+    # No database-level constraint: attempts may live in a partitioned table
+    # (see partition_quiz_attempts), which cannot be the target of a foreign key
+    attempt = models.OneToOneField(
+        AdaptiveQuizAttempt,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        db_constraint=False,
+        related_name='session'
+    )
+    
+    started_at = models.DateTimeField(default=timezone.now)
+    submitted_at = models.DateTimeField(null=True, blank=True)
+    
+    # Deadline of timed quizzes; the sweeper submits sessions left open past it
+    expires_at = models.DateTimeField(null=True, blank=True)
+    auto_submitted = models.BooleanField(default=False)
+    
+    class Meta:
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['status', 'student']),
+            models.Index(fields=['status', 'expires_at']),
+        ]
+    
+    def is_expired(self, now=None):
+        """Check if the deadline (plus grace period) has passed"""
+        if self.expires_at is None:
+            return False
+        grace = timezone.timedelta(seconds=settings.QUIZ_DEADLINE_GRACE_SECONDS)
+        return (now or timezone.now()) > self.expires_at + grace
+    
     def __str__(self):
-        return f"Attempt {self.id} - {self.progress.student.get_full_name()} ({self.score_percentage}%)"
\ No newline at end of file
+        return f"Session {self.id} - {self.student.get_full_name()} - {self.adaptive_quiz} ({self.status})"
@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from django.conf import settings
+from django.utils import timezone
 from django.core.exceptions import ValidationError
 from .models import LectureSlide, AdaptiveQuiz, StudentAdaptiveProgress, AdaptiveQuizAttempt
 
@@ -55,7 +57,7 @@ class AdaptiveQuizSerializer(serializers.ModelSerializer):
         model = AdaptiveQuiz
         fields = [
             'id', 'lecture_slide', 'lecture_slide_title', 'difficulty',
-            'questions_data', 'question_count', 'is_active', 'created_at'
+            'questions_data', 'question_count', 'time_limit', 'is_active', 'created_at'
         ]
         read_only_fields = ['id', 'created_at']
     
@@ -88,6 +90,7 @@ class AdaptiveQuizAttemptSerializer(serializers.ModelSerializer):
     student_name = serializers.CharField(source='progress.student.get_full_name', read_only=True)
     quiz_title = serializers.CharField(source='progress.adaptive_quiz.lecture_slide.title', read_only=True)
     difficulty = serializers.CharField(source='progress.adaptive_quiz.difficulty', read_only=True)
+    answers_data = serializers.SerializerMethodField()
     
     class Meta:
         model = AdaptiveQuizAttempt
@@ -97,6 +100,9 @@ class AdaptiveQuizAttemptSerializer(serializers.ModelSerializer):
             'started_at', 'completed_at'
         ]
         read_only_fields = ['id', 'started_at', 'completed_at']
+    
+    def get_answers_data(self, obj):
+        return obj.get_answers()
 
 
 class QuizQuestionSerializer(serializers.Serializer):
@@ -112,6 +118,7 @@ class AdaptiveQuizTakeSerializer(serializers.Serializer):
     """Serializer for taking an adaptive quiz"""
     adaptive_quiz_id = serializers.IntegerField()
     answers = serializers.DictField()
+    quiz_version = serializers.IntegerField(required=False, min_value=1)
     
     def validate_adaptive_quiz_id(self, value):
         """Validate quiz exists and is accessible"""
@@ -135,6 +142,43 @@ class AdaptiveQuizTakeSerializer(serializers.Serializer):
         return value
 
 
+class QuizSessionAnswersSerializer(serializers.Serializer):
+    """Serializer for autosaving or finalizing a quiz session"""
+    answers = serializers.DictField(required=False)
+    
+    validate_answers = AdaptiveQuizTakeSerializer.validate_answers
+
+
+class AdaptiveQuizBatchAttemptSerializer(AdaptiveQuizTakeSerializer):
+    """Serializer for one attempt in a batch submission"""
+    student_id = serializers.IntegerField(required=False)
+    started_at = serializers.DateTimeField(required=False)
+    completed_at = serializers.DateTimeField(required=False)
+    
+    def validate_adaptive_quiz_id(self, value):
+        """Quizzes are looked up in bulk by the view"""
+        return value
+    
+    def validate(self, data):
+        """Validate attempt timestamps"""
+        started_at = data.get('started_at')
+        completed_at = data.get('completed_at')
+        if started_at and completed_at and started_at > completed_at:
+            raise serializers.ValidationError("started_at must be before completed_at.")
+        if completed_at and completed_at > timezone.now():
+            raise serializers.ValidationError("completed_at cannot be in the future.")
+        return data
+
+
+class AdaptiveQuizBatchSubmitSerializer(serializers.Serializer):
+    """Serializer for submitting many adaptive quiz attempts at once"""
+    attempts = AdaptiveQuizBatchAttemptSerializer(
+        many=True,
+        allow_empty=False,
+        max_length=settings.ADAPTIVE_QUIZ_BATCH_MAX_ATTEMPTS
+    )
+
+
 class LectureSlideUploadSerializer(serializers.Serializer):
     """Serializer for uploading lecture slides"""
     topic_id = serializers.IntegerField()
@@ -1,12 +1,17 @@
 import json
+import logging
 import time
 import requests
+import numpy as np
 from django.conf import settings
+from django.core.cache import cache
 from typing import Dict, List, Any
 from .models import StudentAdaptiveProgress, AdaptiveQuiz, AdaptiveQuizAttempt
 from django.utils import timezone
 from django.db import transaction
 
+logger = logging.getLogger(__name__)
+
 
 class ClaudeAPIService:
     """Service for interacting with Claude API to generate quiz questions"""
@@ -205,6 +210,101 @@ Important: Return ONLY the JSON object, no additional text or formatting.
             raise ValueError(f"Invalid JSON in response: {e}")
 
 
+class QuizGradingService:
+    """
+    Grade attempts against a quiz version's compact answer key
+    
+    Keys and encoded answers are ASCII strings with one character per
+    question: 'A'-'D' for a choice, '-' for an unanswered question and
+    '?' in a key for a question without a usable correct answer.
+    """
+    VALID_CHOICES = ('A', 'B', 'C', 'D')
+    UNANSWERED = '-'
+    UNKNOWN = '?'
+    
+    @classmethod
+    def build_answer_key(cls, questions):
+        """Answer key string for a list of question dicts"""
+        key = []
+        for question in questions:
+            correct_answer = question.get('correct_answer')
+            key.append(correct_answer if correct_answer in cls.VALID_CHOICES else cls.UNKNOWN)
+        return ''.join(key)
+    
+    @classmethod
+    def encode_answers(cls, answers, question_count):
+        """Encode a {'question_<i>': 'A'} dict as one byte per question"""
+        encoded = []
+        for i in range(question_count):
+            answer = answers.get(f'question_{i}')
+            encoded.append(answer if answer in cls.VALID_CHOICES else cls.UNANSWERED)
+        return ''.join(encoded).encode('ascii')
+    
+    @classmethod
+    def decode_answers(cls, encoded):
+        """Inverse of encode_answers (unanswered questions are left out)"""
+        return {
+            f'question_{i}': answer
+            for i, answer in enumerate(bytes(encoded).decode('ascii'))
+            if answer in cls.VALID_CHOICES
+        }
+    
+    @classmethod
+    def is_encodable(cls, answers):
+        """True if a legacy answers dict survives encoding without loss"""
+        if not isinstance(answers, dict):
+            return False
+        for key, answer in answers.items():
+            index = key.removeprefix('question_')
+            if index == key or not index.isdigit() or answer not in cls.VALID_CHOICES:
+                return False
+        return True
+    
+    @classmethod
+    def grade(cls, answer_key, answers):
+        """Number of correct answers in one attempt (answers as a dict or encoded bytes)"""
+        if isinstance(answers, dict):
+            answers = cls.encode_answers(answers, len(answer_key))
+        key = answer_key.encode('ascii')
+        return sum(1 for answer, correct in zip(answers, key) if answer == correct)
+    
+    @classmethod
+    def answers_matrix(cls, encoded_answers, question_count):
+        """Stack encoded attempts into a (attempts x questions) uint8 array"""
+        if isinstance(encoded_answers, np.ndarray):
+            return encoded_answers
+        
+        filler = cls.UNANSWERED.encode('ascii')
+        rows = b''.join(
+            bytes(row[:question_count]).ljust(question_count, filler) for row in encoded_answers
+        )
+        return np.frombuffer(rows, dtype=np.uint8).reshape(-1, question_count)
+    
+    @classmethod
+    def grade_batch(cls, answer_key, encoded_answers):
+        """
+        Grade many attempts at once
+        
+        Args:
+            answer_key: Answer key string of the quiz version
+            encoded_answers: Iterable of encoded answer bytes, or a uint8
+                array of shape (attempts, questions)
+            
+        Returns:
+            Tuple of (correct counts, score percentages) as NumPy arrays
+        """
+        question_count = len(answer_key)
+        key = np.frombuffer(answer_key.encode('ascii'), dtype=np.uint8)
+        matrix = cls.answers_matrix(encoded_answers, question_count)
+        
+        correct_counts = (matrix == key).sum(axis=1)
+        if question_count:
+            percentages = correct_counts * (100.0 / question_count)
+        else:
+            percentages = np.zeros(len(correct_counts))
+        return correct_counts, percentages
+
+
 class AdaptiveQuizService:
     """Service for managing adaptive quiz logic and student progress"""
     
@@ -213,6 +313,10 @@ class AdaptiveQuizService:
         """
         Get all available quizzes for a student with access information
         
+        This is a read-only path: quizzes the student has not attempted yet
+        get an unsaved "not started" progress record instead of a new row.
+        Progress rows are only created on the first real attempt.
+        
         Args:
             student: User object (student)
             lecture_slide: LectureSlide object
@@ -220,23 +324,24 @@ class AdaptiveQuizService:
         Returns:
             List of quiz information with accessibility status
         """
-        quizzes = AdaptiveQuiz.objects.filter(
+        quizzes = list(AdaptiveQuiz.objects.with_version_summary().filter(
             lecture_slide=lecture_slide,
             is_active=True,
             status='published'
-        ).order_by('difficulty')
+        ).order_by('difficulty'))
+        
+        if not quizzes:
+            return []
+        
+        progress_lookup = AdaptiveQuizService.get_progress_lookup(student, quizzes)
         
         quiz_info_list = []
         
         for quiz in quizzes:
-            # Get or create progress record
-            progress, created = StudentAdaptiveProgress.objects.get_or_create(
-                student=student,
-                adaptive_quiz=quiz
-            )
+            progress = progress_lookup[quiz.id]
             
-            # Determine accessibility
-            accessible = AdaptiveQuizService._is_quiz_accessible(student, quiz, lecture_slide)
+            # Determine accessibility from the difficulty ladder
+            accessible = quiz.is_unlocked_for(progress_lookup)
             
             # Determine status
             if progress.completed:
@@ -258,43 +363,200 @@ class AdaptiveQuizService:
         return quiz_info_list
     
     @staticmethod
-    def _is_quiz_accessible(student, quiz, lecture_slide):
+    def get_progress_lookup(student, quizzes):
+        """
+        Map quiz id -> progress for a student in a single query
+        
+        Quizzes without a stored progress row get an unsaved
+        StudentAdaptiveProgress with default ("not started") values.
+        """
+        stored_progress = {
+            progress.adaptive_quiz_id: progress
+            for progress in StudentAdaptiveProgress.objects.filter(
+                student=student,
+                adaptive_quiz__in=quizzes
+            )
+        }
+        
+        return {
+            quiz.id: stored_progress.get(quiz.id) or StudentAdaptiveProgress(student=student, adaptive_quiz=quiz)
+            for quiz in quizzes
+        }
+    
+    @staticmethod
+    def _is_quiz_accessible(student, quiz, lecture_slide=None):
         """
         Check if a student can access a specific quiz based on progression rules
         """
-        # Easy quizzes are always accessible
-        if quiz.difficulty == 'easy':
+        if quiz.prerequisite_quiz_id is None:
             return True
         
-        # For medium and hard, check if previous difficulty is completed
-        difficulty_order = ['easy', 'medium', 'hard']
-        current_index = difficulty_order.index(quiz.difficulty)
+        return StudentAdaptiveProgress.objects.filter(
+            student=student,
+            adaptive_quiz_id=quiz.prerequisite_quiz_id,
+            completed=True
+        ).exists()
+    
+    @staticmethod
+    def build_student_catalog(student):
+        """
+        Build the student's full quiz catalog: every published quiz of the
+        enrolled courses grouped by slide, with access, progress and summary
+        statistics
+        """
+        # Get enrolled courses
+        from courses.models import CourseEnrollment
+        
+        enrolled_course_ids = CourseEnrollment.objects.filter(
+            student=student,
+            is_active=True
+        ).values_list('course_id', flat=True)
+        enrolled_course_ids = list(enrolled_course_ids)
+        
+        if not enrolled_course_ids:
+            return {
+                'message': 'No enrolled courses found',
+                'quizzes': []
+            }
+        
+        # Get all published quizzes from enrolled courses
+        available_quizzes = AdaptiveQuiz.objects.with_version_summary().filter(
+            lecture_slide__topic__course_id__in=enrolled_course_ids,
+            status='published',
+            is_active=True
+        ).select_related(
+            'lecture_slide',
+            'lecture_slide__topic',
+            'lecture_slide__topic__course'
+        ).order_by(
+            'lecture_slide__topic__course__code',
+            'lecture_slide__title',
+            'difficulty'
+        )
+        
+        # Get student's progress for all these quizzes
+        student_progress = StudentAdaptiveProgress.objects.filter(
+            student=student,
+            adaptive_quiz__in=available_quizzes
+        )
+        
+        # Create progress lookup dictionary
+        progress_lookup = {
+            progress.adaptive_quiz_id: progress 
+            for progress in student_progress
+        }
+        quizzes_by_id = {quiz.id: quiz for quiz in available_quizzes}
+        
+        # Group quizzes by slide for easier processing
+        slides_data = {}
         
-        if current_index > 0:
-            previous_difficulty = difficulty_order[current_index - 1]
+        for quiz in available_quizzes:
+            slide_id = quiz.lecture_slide.id
             
-            try:
-                previous_quiz = AdaptiveQuiz.objects.get(
-                    lecture_slide=lecture_slide,
-                    difficulty=previous_difficulty,
-                    is_active=True,
-                    status='published'  # FIXED: Only check published quizzes
-                )
-                
-                previous_progress = StudentAdaptiveProgress.objects.get(
-                    student=student,
-                    adaptive_quiz=previous_quiz
-                )
-                
-                return previous_progress.completed
-                
-            except (AdaptiveQuiz.DoesNotExist, StudentAdaptiveProgress.DoesNotExist):
-                return False
+            if slide_id not in slides_data:
+                slides_data[slide_id] = {
+                    'slide_info': {
+                        'slide_id': slide_id,
+                        'title': quiz.lecture_slide.title,
+                        'topic_name': quiz.lecture_slide.topic.name,
+                        'course_code': quiz.lecture_slide.topic.course.code,
+                        'course_name': quiz.lecture_slide.topic.course.name,
+                        'created_at': quiz.lecture_slide.created_at
+                    },
+                    'quizzes': []
+                }
+            
+            # Get progress for this specific quiz
+            progress = progress_lookup.get(quiz.id)
+            
+            # Determine accessibility from the precomputed difficulty ladder
+            accessible = quiz.is_unlocked_for(progress_lookup)
+            access_reason = "Available"
+            
+            if not accessible:
+                prerequisite = quizzes_by_id.get(quiz.prerequisite_quiz_id)
+                prerequisite_level = prerequisite.difficulty.title() if prerequisite else 'previous'
+                access_reason = f"Complete {prerequisite_level} level first"
+            
+            # Determine status
+            if not progress:
+                status = "not_started"
+            elif progress.completed:
+                status = "completed"
+            else:
+                status = "in_progress"
+            
+            quiz_data = {
+                'quiz_id': quiz.id,
+                'difficulty': quiz.difficulty,
+                'accessible': accessible,
+                'access_reason': access_reason,
+                'status': status,
+                'question_count': quiz.get_question_count(),
+                'progress': {
+                    'attempts_count': progress.attempts_count if progress else 0,
+                    'best_score': progress.best_score if progress else None,
+                    'latest_score': progress.latest_score if progress else None,
+                    'completed': progress.completed if progress else False,
+                    'last_attempt_at': progress.last_attempt_at if progress else None
+                }
+            }
+            
+            slides_data[slide_id]['quizzes'].append(quiz_data)
         
-        return True
+        # Convert to list format and add summary statistics
+        response_data = []
+        total_quizzes = 0
+        completed_quizzes = 0
+        accessible_quizzes = 0
+        
+        for slide_data in slides_data.values():
+            # Sort quizzes by difficulty (easy, medium, hard)
+            difficulty_order = {'easy': 1, 'medium': 2, 'hard': 3}
+            slide_data['quizzes'].sort(key=lambda x: difficulty_order.get(x['difficulty'], 4))
+            
+            # Calculate slide-level statistics
+            slide_total = len(slide_data['quizzes'])
+            slide_completed = sum(1 for q in slide_data['quizzes'] if q['status'] == 'completed')
+            slide_accessible = sum(1 for q in slide_data['quizzes'] if q['accessible'])
+            
+            slide_data['slide_info']['statistics'] = {
+                'total_quizzes': slide_total,
+                'completed_quizzes': slide_completed,
+                'accessible_quizzes': slide_accessible,
+                'completion_rate': (slide_completed / slide_total * 100) if slide_total > 0 else 0
+            }
+            
+            total_quizzes += slide_total
+            completed_quizzes += slide_completed
+            accessible_quizzes += slide_accessible
+            
+            response_data.append(slide_data)
+        
+        # Sort slides by course code and title
+        response_data.sort(key=lambda x: (
+            x['slide_info']['course_code'],
+            x['slide_info']['title']
+        ))
+        
+        # Overall statistics
+        summary_stats = {
+            'total_quizzes': total_quizzes,
+            'completed_quizzes': completed_quizzes,
+            'accessible_quizzes': accessible_quizzes,
+            'overall_completion_rate': (completed_quizzes / total_quizzes * 100) if total_quizzes > 0 else 0,
+            'total_slides': len(response_data),
+            'courses_count': len(set(slide['slide_info']['course_code'] for slide in response_data))
+        }
+        
+        return {
+            'summary': summary_stats,
+            'slides': response_data
+        }
     
     @staticmethod
-    def process_quiz_attempt(student, adaptive_quiz, answers):
+    def process_quiz_attempt(student, adaptive_quiz, answers, quiz_version=None,
+                             started_at=None, completed_at=None):
         """
         Process a student's adaptive quiz attempt
         
@@ -302,28 +564,25 @@ class AdaptiveQuizService:
             student: User object
             adaptive_quiz: AdaptiveQuiz object
             answers: Dictionary of student answers
+            quiz_version: AdaptiveQuizVersion the student was shown
+                (defaults to the quiz's current version)
+            started_at, completed_at: real attempt times, when known
+                (e.g. from a QuizAttemptSession); default to now
             
         Returns:
             Dictionary with attempt results
         """
-        questions_data = adaptive_quiz.get_questions()
-        questions = questions_data.get('questions', [])
-        
-        if not questions:
-            raise ValueError("Quiz has no questions")
+        from analytics.models import QuestionChoiceCounter
         
-        # Calculate score
-        correct_count = 0
-        total_questions = len(questions)
+        if quiz_version is None:
+            quiz_version = adaptive_quiz.ensure_current_version()
         
-        for i, question in enumerate(questions):
-            question_key = f"question_{i}"
-            student_answer = answers.get(question_key)
-            correct_answer = question.get('correct_answer')
-            
-            if student_answer == correct_answer:
-                correct_count += 1
+        total_questions = quiz_version.question_count
+        if not total_questions:
+            raise ValueError("Quiz has no questions")
         
+        # Calculate score from the compact answer key
+        correct_count = QuizGradingService.grade(quiz_version.answer_key, answers)
         score_percentage = (correct_count / total_questions) * 100
         
         # Get or create progress record
@@ -331,27 +590,25 @@ class AdaptiveQuizService:
             student=student,
             adaptive_quiz=adaptive_quiz
         )
+        progress.adaptive_quiz = adaptive_quiz
         
-        # Update progress
         with transaction.atomic():
-            progress.attempts_count += 1
-            progress.latest_score = score_percentage
-            
-            if score_percentage > progress.best_score:
-                progress.best_score = score_percentage
-            
-            # Check if completed (50% threshold)
-            if score_percentage >= 50 and not progress.completed:
-                progress.mark_completed(score_percentage)
-            
-            progress.save()
-            
             # Create attempt record
-            attempt = AdaptiveQuizAttempt.objects.create(
+            completed_at = completed_at or timezone.now()
+            attempt = AdaptiveQuizAttempt(
                 progress=progress,
-                answers_data=answers,
-                score_percentage=score_percentage
+                quiz_version=quiz_version,
+                score_percentage=score_percentage,
+                started_at=started_at or completed_at,
+                completed_at=completed_at,
+                time_taken=(completed_at - started_at) if started_at else None
             )
+            attempt.set_answers(answers, total_questions)
+            attempt.save()
+            
+            # Update progress counters atomically (safe under concurrent submissions)
+            progress.record_attempt(score_percentage, attempt.completed_at)
+            QuestionChoiceCounter.record_attempts([attempt])
         
         # Determine if explanations should be shown
         show_explanation = progress.should_show_explanation()
@@ -366,7 +623,567 @@ class AdaptiveQuizService:
             'completed': progress.completed,
             'show_explanation': show_explanation,
             'unlocked_next': unlocked_next,
-            'attempt_id': attempt.id
+            'attempt_id': attempt.id,
+            'quiz_version': quiz_version.version_number
         }
         
-        return result
\ No newline at end of file
+        return result
+    
+    @staticmethod
+    def process_quiz_attempts_batch(submissions):
+        """
+        Grade and store many adaptive quiz attempts in one go
+        
+        Args:
+            submissions: list of dicts with 'student', 'adaptive_quiz',
+                'answers' and optional 'quiz_version', 'started_at' and
+                'completed_at' (offline-captured attempts keep their times)
+            
+        Returns:
+            (results, attempts): one result dict per submission in input
+            order, and the created AdaptiveQuizAttempt objects
+        """
+        from analytics.models import QuestionChoiceCounter
+        
+        now = timezone.now()
+        
+        # Resolve the version each submission is graded against
+        current_versions = {}
+        for submission in submissions:
+            if submission.get('quiz_version') is None:
+                quiz = submission['adaptive_quiz']
+                if quiz.id not in current_versions:
+                    current_versions[quiz.id] = quiz.ensure_current_version()
+                submission['quiz_version'] = current_versions[quiz.id]
+            if not submission['quiz_version'].question_count:
+                raise ValueError(f"Quiz {submission['adaptive_quiz'].id} has no questions")
+        
+        with transaction.atomic():
+            # Fetch existing progress rows in one query and create the missing ones in bulk
+            pairs = {(s['student'].id, s['adaptive_quiz'].id) for s in submissions}
+            progress_lookup = {
+                (p.student_id, p.adaptive_quiz_id): p
+                for p in StudentAdaptiveProgress.objects.select_for_update().filter(
+                    student_id__in={pair[0] for pair in pairs},
+                    adaptive_quiz_id__in={pair[1] for pair in pairs}
+                ) if (p.student_id, p.adaptive_quiz_id) in pairs
+            }
+            missing = [
+                StudentAdaptiveProgress(student_id=student_id, adaptive_quiz_id=quiz_id)
+                for student_id, quiz_id in pairs if (student_id, quiz_id) not in progress_lookup
+            ]
+            if missing:
+                StudentAdaptiveProgress.objects.bulk_create(missing)
+                progress_lookup.update({
+                    (p.student_id, p.adaptive_quiz_id): p
+                    for p in StudentAdaptiveProgress.objects.filter(
+                        student_id__in={p.student_id for p in missing},
+                        adaptive_quiz_id__in={p.adaptive_quiz_id for p in missing}
+                    ) if (p.student_id, p.adaptive_quiz_id) not in progress_lookup
+                })
+            
+            # Grade in the order the attempts were taken so progress ends up as
+            # if they had been submitted one by one
+            ordered = sorted(
+                range(len(submissions)),
+                key=lambda i: submissions[i].get('completed_at') or now
+            )
+            
+            attempts = [None] * len(submissions)
+            results = [None] * len(submissions)
+            newly_completed = []
+            for index in ordered:
+                submission = submissions[index]
+                quiz = submission['adaptive_quiz']
+                quiz_version = submission['quiz_version']
+                answers = submission['answers']
+                completed_at = submission.get('completed_at') or now
+                started_at = submission.get('started_at') or completed_at
+                
+                total_questions = quiz_version.question_count
+                correct_count = QuizGradingService.grade(quiz_version.answer_key, answers)
+                score_percentage = (correct_count / total_questions) * 100
+                
+                progress = progress_lookup[(submission['student'].id, quiz.id)]
+                progress.adaptive_quiz = quiz
+                progress.attempts_count += 1
+                progress.latest_score = score_percentage
+                progress.last_attempt_at = max(progress.last_attempt_at or completed_at, completed_at)
+                if score_percentage > progress.best_score:
+                    progress.best_score = score_percentage
+                
+                # Check if completed (50% threshold); unlocking is applied after
+                # the bulk update so it is not overwritten
+                if score_percentage >= 50 and not progress.completed:
+                    progress.completed = True
+                    progress.completed_at = completed_at
+                    newly_completed.append(progress)
+                
+                attempt = AdaptiveQuizAttempt(
+                    progress=progress,
+                    quiz_version=quiz_version,
+                    score_percentage=score_percentage,
+                    started_at=started_at,
+                    completed_at=completed_at,
+                    time_taken=completed_at - started_at
+                )
+                attempt.set_answers(answers, total_questions)
+                attempt.fill_denormalized_keys()
+                attempts[index] = attempt
+                
+                results[index] = {
+                    'score': score_percentage,
+                    'correct_count': correct_count,
+                    'total_questions': total_questions,
+                    'completed': progress.completed,
+                    'show_explanation': progress.should_show_explanation(),
+                    'quiz_version': quiz_version.version_number
+                }
+            
+            StudentAdaptiveProgress.objects.bulk_update(
+                list(progress_lookup.values()),
+                ['attempts_count', 'latest_score', 'best_score', 'completed',
+                 'completed_at', 'last_attempt_at']
+            )
+            AdaptiveQuizAttempt.objects.bulk_create(attempts)
+            QuestionChoiceCounter.record_attempts(attempts)
+            
+            for progress in newly_completed:
+                progress.check_unlock_next_level()
+            unlocked_ids = [p.id for p in newly_completed if p.unlocked_next_level]
+            if unlocked_ids:
+                StudentAdaptiveProgress.objects.filter(id__in=unlocked_ids).update(unlocked_next_level=True)
+        
+        for index, attempt in enumerate(attempts):
+            results[index]['attempt_id'] = attempt.id
+            results[index]['unlocked_next'] = attempt.progress.unlocked_next_level
+        
+        # Bulk writes skip the post_save signals that invalidate cached catalogs
+        for student_id in {pair[0] for pair in pairs}:
+            StudentCatalogCache.bump_student(student_id)
+        
+        return results, attempts
+    
+    @staticmethod
+    def apply_completion_side_effects(student, attempts):
+        """
+        Update attendance, analytics and achievements for a student's completed attempts
+        
+        Runs once per student however many attempts are passed in.
+        Returns the achievement data for the response (None if processing failed).
+        """
+        from courses.models import Attendance
+        from analytics.models import DailyEngagement, CourseDailyRollup
+        from analytics.services import MetricsRecomputeService
+        from achievements.services import AchievementService
+        
+        courses = {}
+        attendance_dates = {}
+        for attempt in attempts:
+            course = attempt.progress.adaptive_quiz.lecture_slide.topic.course
+            courses[course.id] = course
+            attempt_date = timezone.localdate(attempt.completed_at)
+            attendance_dates.setdefault(attempt_date, {})[course.id] = attempt
+        
+        # Mark attendance for ANY AI quiz completion (easy level sufficient)
+        for attempt_date, course_attempts in attendance_dates.items():
+            for course_id, attempt in course_attempts.items():
+                Attendance.objects.update_or_create(
+                    student=student,
+                    course=courses[course_id],
+                    date=attempt_date,
+                    defaults={
+                        'is_present': True,
+                        'verified_by_quiz': True,
+                    }
+                )
+            
+            # Track daily engagement for analytics heatmap
+            DailyEngagement.mark_engagement(student, attempt_date)
+        
+        # Course trend rollups
+        CourseDailyRollup.record_attempts(attempts)
+        
+        # Update student engagement metrics for analytics (this student's row per course).
+        # Each guarded step gets its own savepoint: a database error would otherwise
+        # abort the caller's transaction, and with it a whole batch of students
+        for course in courses.values():
+            try:
+                with transaction.atomic():
+                    MetricsRecomputeService.recompute_course(course.id, student_ids=[student.id])
+            except Exception:
+                # Log the error but don't fail the quiz submission
+                logger.exception('Analytics update failed for student %s in course %s', student.id, course.id)
+        
+        # Process achievements for AI quiz completion
+        try:
+            with transaction.atomic():
+                achievement_result = AchievementService.process_ai_quiz_completions(student, attempts)
+        except Exception:
+            logger.exception('Achievement processing failed for student %s', student.id)
+            return None
+        
+        return {
+            'xp_earned': achievement_result.get('xp_earned', 0),
+            'total_xp': achievement_result.get('total_xp', 0),
+            'level': achievement_result.get('level', 1),
+            'new_badges': [
+                {
+                    'name': badge.badge_type.name,
+                    'icon': badge.badge_type.icon,
+                    'color': badge.badge_type.color,
+                    'xp_reward': badge.badge_type.xp_reward
+                } for badge in achievement_result.get('new_badges', [])
+            ],
+            'current_streak': achievement_result.get('streak', 0)
+        }
+    
+    @staticmethod
+    def finalize_session(session, answers=None, completed_at=None):
+        """
+        Grade an in-progress QuizAttemptSession through the normal attempt path
+        
+        Uses the given final answers, or the latest autosave. Raises ValueError
+        if the session was already submitted.
+        """
+        from .models import QuizAttemptSession
+        
+        with transaction.atomic():
+            session = QuizAttemptSession.objects.select_for_update().select_related(
+                'student', 'adaptive_quiz', 'quiz_version'
+            ).get(pk=session.pk)
+            if session.status != 'in_progress':
+                raise ValueError("Quiz session has already been submitted")
+            
+            if answers is None:
+                answers, saved_at = QuizAutosaveBuffer.get(session)
+            completed_at = completed_at or timezone.now()
+            
+            result = AdaptiveQuizService.process_quiz_attempt(
+                session.student, session.adaptive_quiz, answers, session.quiz_version,
+                started_at=session.started_at, completed_at=completed_at
+            )
+            
+            session.status = 'submitted'
+            session.answers = answers
+            session.last_saved_at = completed_at
+            session.submitted_at = completed_at
+            session.attempt_id = result['attempt_id']
+            session.save(update_fields=['status', 'answers', 'last_saved_at', 'submitted_at', 'attempt'])
+        
+        QuizAutosaveBuffer.discard(session.id)
+        return result
+    
+    @staticmethod
+    def sweep_expired_sessions(batch_size=200, now=None):
+        """
+        Auto-submit one batch of timed quiz sessions left open past their deadline
+        
+        The latest autosave is graded as of the deadline through the batch
+        attempt path. It is read from the session row, or from the shared
+        autosave buffer when one is configured, never from a per-process
+        cache (see QuizAutosaveBuffer). Sessions locked by a concurrent finalize are skipped and
+        picked up by the next sweep. Returns the number of sessions submitted.
+        """
+        from .models import QuizAttemptSession
+        
+        now = now or timezone.now()
+        grace = timezone.timedelta(seconds=settings.QUIZ_DEADLINE_GRACE_SECONDS)
+        
+        with transaction.atomic():
+            sessions = list(
+                QuizAttemptSession.objects.select_for_update(skip_locked=True, of=('self',)).filter(
+                    status='in_progress',
+                    expires_at__lte=now - grace
+                ).select_related(
+                    'student', 'quiz_version', 'adaptive_quiz__lecture_slide__topic__course'
+                ).order_by('expires_at')[:batch_size]
+            )
+            if not sessions:
+                return 0
+            
+            answers = QuizAutosaveBuffer.get_many(sessions)
+            gradable = []
+            submissions = []
+            for session in sessions:
+                session.status = 'submitted'
+                session.auto_submitted = True
+                session.submitted_at = session.expires_at
+                session.answers = answers[session.id]
+                session.last_saved_at = session.expires_at
+                
+                # A quiz without questions cannot be graded; just close the session
+                quiz_version = session.quiz_version or session.adaptive_quiz.ensure_current_version()
+                if not quiz_version.question_count:
+                    continue
+                
+                gradable.append(session)
+                submissions.append({
+                    'student': session.student,
+                    'adaptive_quiz': session.adaptive_quiz,
+                    'answers': session.answers,
+                    'quiz_version': quiz_version,
+                    'started_at': session.started_at,
+                    'completed_at': session.expires_at,
+                })
+            
+            if submissions:
+                results, attempts = AdaptiveQuizService.process_quiz_attempts_batch(submissions)
+                
+                attempts_by_student = {}
+                for session, attempt in zip(gradable, attempts):
+                    session.attempt = attempt
+                    attempts_by_student.setdefault(session.student, []).append(attempt)
+                
+                # Attendance, analytics and achievements once per student
+                for student, student_attempts in attempts_by_student.items():
+                    AdaptiveQuizService.apply_completion_side_effects(student, student_attempts)
+            
+            QuizAttemptSession.objects.bulk_update(
+                sessions,
+                ['status', 'auto_submitted', 'submitted_at', 'answers', 'last_saved_at', 'attempt']
+            )
+        
+        QuizAutosaveBuffer.discard_many([session.id for session in sessions])
+        return len(sessions)
+
+
+class QuizAutosaveBuffer:
+    """
+    Buffer for autosaved answers of in-progress quiz sessions
+    
+    With a cache shared between processes (Redis, Memcached, database or file
+    cache), autosaves only overwrite one cache entry per session (last write
+    wins) and flush() writes every changed session back in batches, so a class
+    autosaving every few seconds costs one write per flush instead of one per
+    autosave. A per-process cache (LocMemCache, the default) would hide the
+    answers from other workers, the flush command and the deadline sweeper,
+    so autosaves then go straight to the database instead.
+    """
+    PREFIX = 'ai_quiz:autosave'
+    LOCAL_BACKENDS = (
+        'django.core.cache.backends.locmem.LocMemCache',
+        'django.core.cache.backends.dummy.DummyCache',
+    )
+    
+    @classmethod
+    def _key(cls, session_id):
+        return f'{cls.PREFIX}:session:{session_id}'
+    
+    @classmethod
+    def is_buffered(cls):
+        """True if autosaves are buffered in a cache every process can see"""
+        return settings.CACHES['default']['BACKEND'] not in cls.LOCAL_BACKENDS
+    
+    @staticmethod
+    def _write(session_id, answers, saved_at):
+        """Store answers of a session still in progress, unless newer ones are stored; returns rows written"""
+        from django.db.models import Q
+        from .models import QuizAttemptSession
+        
+        return QuizAttemptSession.objects.filter(
+            Q(last_saved_at__isnull=True) | Q(last_saved_at__lt=saved_at),
+            id=session_id,
+            status='in_progress'
+        ).update(answers=answers, last_saved_at=saved_at)
+    
+    @classmethod
+    def save(cls, session_id, answers):
+        """Buffer (or store) the latest answers of a session; returns the save time"""
+        saved_at = timezone.now()
+        if not cls.is_buffered():
+            cls._write(session_id, answers, saved_at)
+            return saved_at
+        
+        cache.set(
+            cls._key(session_id),
+            {'answers': answers, 'saved_at': saved_at},
+            settings.QUIZ_AUTOSAVE_CACHE_TIMEOUT
+        )
+        return saved_at
+    
+    @classmethod
+    def get(cls, session):
+        """Latest answers of a session as (answers, saved_at), buffered or flushed"""
+        if not cls.is_buffered():
+            return session.answers, session.last_saved_at
+        entry = cache.get(cls._key(session.id))
+        if entry is not None and (session.last_saved_at is None or entry['saved_at'] > session.last_saved_at):
+            return entry['answers'], entry['saved_at']
+        return session.answers, session.last_saved_at
+    
+    @classmethod
+    def get_many(cls, sessions):
+        """Latest answers of several sessions, keyed by session id"""
+        if not cls.is_buffered():
+            return {session.id: session.answers for session in sessions}
+        entries = cache.get_many([cls._key(session.id) for session in sessions])
+        answers = {}
+        for session in sessions:
+            entry = entries.get(cls._key(session.id))
+            if entry is not None and (session.last_saved_at is None or entry['saved_at'] > session.last_saved_at):
+                answers[session.id] = entry['answers']
+            else:
+                answers[session.id] = session.answers
+        return answers
+    
+    @classmethod
+    def discard(cls, session_id):
+        if cls.is_buffered():
+            cache.delete(cls._key(session_id))
+    
+    @classmethod
+    def discard_many(cls, session_ids):
+        if cls.is_buffered():
+            cache.delete_many([cls._key(session_id) for session_id in session_ids])
+    
+    @classmethod
+    def flush(cls, batch_size=500):
+        """Write buffered answers of in-progress sessions to the database; returns rows written"""
+        from .models import QuizAttemptSession
+        
+        if not cls.is_buffered():
+            return 0
+        
+        sessions = QuizAttemptSession.objects.filter(
+            status='in_progress'
+        ).only('id', 'last_saved_at').order_by('id')
+        
+        written = 0
+        last_id = 0
+        while True:
+            batch = list(sessions.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            
+            entries = cache.get_many([cls._key(session.id) for session in batch])
+            with transaction.atomic():
+                for session in batch:
+                    entry = entries.get(cls._key(session.id))
+                    if entry is None:
+                        continue
+                    if session.last_saved_at is None or entry['saved_at'] > session.last_saved_at:
+                        # Conditional, so a session finalized since the read keeps its answers
+                        written += cls._write(session.id, entry['answers'], entry['saved_at'])
+        
+        return written
+
+
+class StudentCatalogCache:
+    """
+    Per-student cache of the quiz catalog built by
+    AdaptiveQuizService.build_student_catalog
+    
+    Entries are keyed by the student's progress/enrollment version and
+    remember the version of every course they were built from. Bumping a
+    version (see ai_quiz.signals) makes the old entry unreachable, so no
+    explicit deletes are needed.
+    """
+    PREFIX = 'ai_quiz:catalog'
+    
+    @classmethod
+    def _course_version_key(cls, course_id):
+        return f'{cls.PREFIX}:course:{course_id}:version'
+    
+    @classmethod
+    def _student_version_key(cls, student_id):
+        return f'{cls.PREFIX}:student:{student_id}:version'
+    
+    @staticmethod
+    def _new_version():
+        # Seed with the clock so an evicted counter never reuses an old value
+        return int(time.time() * 1000)
+    
+    @classmethod
+    def _bump(cls, key):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, cls._new_version(), None)
+    
+    @classmethod
+    def bump_course(cls, course_id):
+        """Invalidate every cached catalog that includes this course"""
+        if course_id is not None:
+            cls._bump(cls._course_version_key(course_id))
+    
+    @classmethod
+    def bump_student(cls, student_id):
+        """Invalidate the cached catalog of one student"""
+        if student_id is not None:
+            cls._bump(cls._student_version_key(student_id))
+    
+    @classmethod
+    def _get_version(cls, key):
+        version = cache.get(key)
+        if version is None:
+            version = cls._new_version()
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+        return version
+    
+    @classmethod
+    def get_catalog(cls, student):
+        """
+        Return (catalog, cache_hit) for a student
+        
+        A hit only reads the cache; a miss rebuilds the catalog and stores
+        it together with the course versions it was built from.
+        """
+        student_version = cls._get_version(cls._student_version_key(student.id))
+        entry_key = f'{cls.PREFIX}:student:{student.id}:entry:{student_version}'
+        
+        entry = cache.get(entry_key)
+        if entry is not None:
+            current_versions = cache.get_many(list(entry['course_versions']))
+            if current_versions == entry['course_versions']:
+                cls._record('hits')
+                return entry['catalog'], True
+        
+        cls._record('misses')
+        
+        # Read the course versions before building so a concurrent change
+        # during the build leaves us with a stale key rather than stale data
+        from courses.models import CourseEnrollment
+        course_ids = CourseEnrollment.objects.filter(
+            student=student,
+            is_active=True
+        ).values_list('course_id', flat=True)
+        course_versions = {
+            cls._course_version_key(course_id): cls._get_version(cls._course_version_key(course_id))
+            for course_id in course_ids
+        }
+        
+        catalog = AdaptiveQuizService.build_student_catalog(student)
+        cache.set(
+            entry_key,
+            {'course_versions': course_versions, 'catalog': catalog},
+            settings.STUDENT_CATALOG_CACHE_TIMEOUT
+        )
+        
+        return catalog, False
+    
+    @classmethod
+    def _record(cls, outcome):
+        key = f'{cls.PREFIX}:stats:{outcome}'
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 0, None)
+            cache.incr(key)
+    
+    @classmethod
+    def get_stats(cls):
+        """Hit/miss counters and hit ratio since the cache was last cleared"""
+        counts = cache.get_many([f'{cls.PREFIX}:stats:hits', f'{cls.PREFIX}:stats:misses'])
+        hits = counts.get(f'{cls.PREFIX}:stats:hits', 0)
+        misses = counts.get(f'{cls.PREFIX}:stats:misses', 0)
+        total = hits + misses
+        
+        return {
+            'hits': hits,
+            'misses': misses,
+            'requests': total,
+            'hit_ratio': round(hits / total, 4) if total else 0.0
+        }
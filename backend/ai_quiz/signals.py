@@ -0,0 +1,74 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from courses.models import Course, CourseEnrollment, Topic
+from .models import AdaptiveQuiz, LectureSlide, StudentAdaptiveProgress
+from .services import StudentCatalogCache
+
+
+@receiver(post_save, sender=AdaptiveQuiz)
+def update_difficulty_ladder_on_save(sender, instance, raw=False, **kwargs):
+    """Keep prerequisite quizzes in step when a quiz is published, unpublished or edited"""
+    if raw:
+        return
+    AdaptiveQuiz.rebuild_difficulty_ladder(instance.lecture_slide_id)
+
+
+@receiver(post_save, sender=AdaptiveQuiz)
+def snapshot_quiz_version(sender, instance, raw=False, **kwargs):
+    """Every save that changes the questions produces a new immutable version"""
+    if raw:
+        return
+    instance.ensure_current_version()
+
+
+@receiver(post_delete, sender=AdaptiveQuiz)
+def update_difficulty_ladder_on_delete(sender, instance, **kwargs):
+    """Re-link the remaining quizzes of a slide when a quiz is deleted"""
+    AdaptiveQuiz.rebuild_difficulty_ladder(instance.lecture_slide_id)
+
+
+# Student catalog cache invalidation
+
+def _course_id_for_slide(lecture_slide_id):
+    return LectureSlide.objects.filter(id=lecture_slide_id).values_list('topic__course_id', flat=True).first()
+
+
+@receiver(post_save, sender=AdaptiveQuiz)
+@receiver(post_delete, sender=AdaptiveQuiz)
+def invalidate_catalog_for_quiz(sender, instance, **kwargs):
+    """Publishing, editing or removing a quiz changes the catalog of its course"""
+    StudentCatalogCache.bump_course(_course_id_for_slide(instance.lecture_slide_id))
+
+
+@receiver(post_save, sender=LectureSlide)
+@receiver(post_delete, sender=LectureSlide)
+def invalidate_catalog_for_slide(sender, instance, **kwargs):
+    StudentCatalogCache.bump_course(
+        Topic.objects.filter(id=instance.topic_id).values_list('course_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+def invalidate_catalog_for_topic(sender, instance, **kwargs):
+    StudentCatalogCache.bump_course(instance.course_id)
+
+
+@receiver(post_save, sender=Course)
+def invalidate_catalog_for_course(sender, instance, **kwargs):
+    StudentCatalogCache.bump_course(instance.id)
+
+
+@receiver(post_save, sender=CourseEnrollment)
+@receiver(post_delete, sender=CourseEnrollment)
+def invalidate_catalog_for_enrollment(sender, instance, **kwargs):
+    """Enrolling, unenrolling or deactivating an enrollment changes the student's course list"""
+    StudentCatalogCache.bump_student(instance.student_id)
+
+
+@receiver(post_save, sender=StudentAdaptiveProgress)
+@receiver(post_delete, sender=StudentAdaptiveProgress)
+def invalidate_catalog_for_progress(sender, instance, **kwargs):
+    """Attempt submissions update progress, which the catalog shows"""
+    StudentCatalogCache.bump_student(instance.student_id)
@@ -1,11 +1,17 @@
-from django.test import TestCase, TransactionTestCase
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from rest_framework.test import APITestCase
+from django.db import connection
+from django.core.management import call_command
+from rest_framework.test import APITestCase, APITransactionTestCase
 from rest_framework.authtoken.models import Token
 from unittest.mock import patch
 import json
 from datetime import timedelta
+from unittest import skipUnless
+import io
+import os
+import tempfile
 
 from courses.models import Course, Topic, CourseEnrollment
 from ai_quiz.models import LectureSlide, AdaptiveQuiz, StudentAdaptiveProgress, AdaptiveQuizAttempt
@@ -657,4 +663,721 @@ class AnalyticsErrorHandlingIntegrationTest(AnalyticsIntegrationTestCase):
         # Should handle large dataset without timeout
         data = response.json()
         self.assertIsInstance(data, dict)
-        self.assertIn('course_overview', data)
\ No newline at end of file
+        self.assertIn('course_overview', data)
+
+class LazyProgressTest(AnalyticsIntegrationTestCase):
+    """Catalog reads must not create progress rows"""
+    
+    def setUp(self):
+        super().setUp()
+        for quiz in (self.easy_quiz, self.medium_quiz):
+            quiz.status = 'published'
+            quiz.save()
+    
+    def test_catalog_read_uses_virtual_progress(self):
+        from ai_quiz.services import AdaptiveQuizService
+        
+        quiz_info = AdaptiveQuizService.get_available_quizzes_for_student(self.student1, self.lecture_slide)
+        
+        self.assertEqual(StudentAdaptiveProgress.objects.count(), 0)
+        by_difficulty = {info['quiz'].difficulty: info for info in quiz_info}
+        self.assertEqual(by_difficulty['easy']['status'], 'available')
+        self.assertEqual(by_difficulty['medium']['status'], 'locked')
+        self.assertEqual(by_difficulty['easy']['progress'].attempts_count, 0)
+        
+        AdaptiveQuizService.process_quiz_attempt(self.student1, self.easy_quiz, {'question_0': 'A'})
+        
+        quiz_info = AdaptiveQuizService.get_available_quizzes_for_student(self.student1, self.lecture_slide)
+        by_difficulty = {info['quiz'].difficulty: info for info in quiz_info}
+        self.assertEqual(by_difficulty['easy']['status'], 'completed')
+        self.assertEqual(by_difficulty['medium']['status'], 'available')
+        self.assertEqual(StudentAdaptiveProgress.objects.count(), 1)
+    
+    def test_prune_empty_progress(self):
+        from io import StringIO
+        from django.core.management import call_command
+        
+        StudentAdaptiveProgress.objects.create(student=self.student2, adaptive_quiz=self.easy_quiz)
+        attempted = StudentAdaptiveProgress.objects.create(
+            student=self.student1, adaptive_quiz=self.easy_quiz, attempts_count=1
+        )
+        
+        call_command('prune_empty_progress', stdout=StringIO())
+        
+        self.assertEqual(list(StudentAdaptiveProgress.objects.values_list('id', flat=True)), [attempted.id])
+    
+    def test_difficulty_ladder_follows_publish_and_delete(self):
+        self.medium_quiz.refresh_from_db()
+        self.assertEqual(self.medium_quiz.prerequisite_quiz_id, self.easy_quiz.id)
+        
+        hard_quiz = AdaptiveQuiz.objects.create(
+            lecture_slide=self.lecture_slide,
+            difficulty='hard',
+            questions_data={'questions': []},
+            status='published'
+        )
+        hard_quiz.refresh_from_db()
+        self.assertEqual(hard_quiz.prerequisite_quiz_id, self.medium_quiz.id)
+        
+        # Unpublishing medium moves hard's prerequisite down to easy
+        self.medium_quiz.status = 'draft'
+        self.medium_quiz.save()
+        hard_quiz.refresh_from_db()
+        self.medium_quiz.refresh_from_db()
+        self.assertEqual(hard_quiz.prerequisite_quiz_id, self.easy_quiz.id)
+        self.assertIsNone(self.medium_quiz.prerequisite_quiz_id)
+        
+        self.easy_quiz.delete()
+        hard_quiz.refresh_from_db()
+        self.assertIsNone(hard_quiz.prerequisite_quiz_id)
+
+
+class StudentCatalogCacheTest(AnalyticsIntegrationTestCase):
+    """Versioned student catalog cache"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        super().setUp()
+        self.easy_quiz.status = 'published'
+        self.easy_quiz.save()
+        self.client.force_authenticate(user=self.student1)
+    
+    def _get_catalog(self):
+        response = self.client.get('/api/ai-quiz/student/available-quizzes/')
+        self.assertEqual(response.status_code, 200)
+        return response
+    
+    def test_catalog_hits_until_invalidated(self):
+        self.assertEqual(self._get_catalog()['X-Catalog-Cache'], 'MISS')
+        
+        response = self._get_catalog()
+        self.assertEqual(response['X-Catalog-Cache'], 'HIT')
+        self.assertEqual(response.data['summary']['total_quizzes'], 1)
+        
+        # Publishing a quiz invalidates every catalog of the course
+        self.medium_quiz.status = 'published'
+        self.medium_quiz.save()
+        response = self._get_catalog()
+        self.assertEqual(response['X-Catalog-Cache'], 'MISS')
+        self.assertEqual(response.data['summary']['total_quizzes'], 2)
+        
+        # Submitting an attempt invalidates only the student's catalog
+        from ai_quiz.services import AdaptiveQuizService
+        AdaptiveQuizService.process_quiz_attempt(self.student1, self.easy_quiz, {'question_0': 'A'})
+        response = self._get_catalog()
+        self.assertEqual(response['X-Catalog-Cache'], 'MISS')
+        self.assertEqual(response.data['summary']['completed_quizzes'], 1)
+        
+        from ai_quiz.services import StudentCatalogCache
+        stats = StudentCatalogCache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 3))
+    
+    def test_repeat_submission_invalidates_catalog(self):
+        # The first attempt creates the progress row; later ones only update() it
+        url = '/api/ai-quiz/student/submit-quiz/'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'adaptive_quiz_id': self.easy_quiz.id, 'answers': {'question_0': 'B'}}, format='json')
+        self._get_catalog()
+        self.assertEqual(self._get_catalog()['X-Catalog-Cache'], 'HIT')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'adaptive_quiz_id': self.easy_quiz.id, 'answers': {'question_0': 'A'}}, format='json')
+        self.assertEqual(response.status_code, 201)
+        
+        response = self._get_catalog()
+        self.assertEqual(response['X-Catalog-Cache'], 'MISS')
+        self.assertEqual(response.data['summary']['completed_quizzes'], 1)
+    
+    def test_enrollment_change_invalidates_catalog(self):
+        self._get_catalog()
+        
+        enrollment = CourseEnrollment.objects.get(student=self.student1)
+        enrollment.is_active = False
+        enrollment.save()
+        response = self._get_catalog()
+        self.assertEqual(response['X-Catalog-Cache'], 'MISS')
+        self.assertEqual(response.data['quizzes'], [])
+
+
+class QuizVersionTest(AnalyticsIntegrationTestCase):
+    """Immutable quiz versions and the pre-rendered student payload"""
+    
+    def setUp(self):
+        super().setUp()
+        self.easy_quiz.status = 'published'
+        self.easy_quiz.save()
+        self.client.force_authenticate(user=self.student1)
+    
+    def test_payload_served_with_etag_and_conditional_get(self):
+        url = f'/api/ai-quiz/student/quiz/{self.easy_quiz.id}/'
+        response = self.client.get(url)
+        
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertEqual(payload['version'], 1)
+        self.assertNotIn('correct_answer', payload['questions'][0])
+        self.assertNotIn('explanation', payload['questions'][0])
+        
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+    
+    def test_payload_served_without_loading_questions(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        url = f'/api/ai-quiz/student/quiz/{self.easy_quiz.id}/'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if 'questions_data' in query['sql']])
+        
+        # A quiz without a version yet gets one on first read
+        self.easy_quiz.versions.all().delete()
+        AdaptiveQuiz.objects.filter(id=self.easy_quiz.id).update(current_version=None)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['version'], 1)
+    
+    def test_edit_creates_new_version_and_attempts_keep_theirs(self):
+        from ai_quiz.services import AdaptiveQuizService
+        
+        first_version = self.easy_quiz.current_version
+        AdaptiveQuizService.process_quiz_attempt(self.student1, self.easy_quiz, {'question_0': 'A'})
+        
+        # Saving without changing questions reuses the version
+        self.easy_quiz.save()
+        self.assertEqual(self.easy_quiz.versions.count(), 1)
+        
+        questions = self.easy_quiz.get_questions()['questions']
+        questions[0]['correct_answer'] = 'B'
+        self.easy_quiz.questions_data = {'questions': questions}
+        self.easy_quiz.save()
+        
+        self.assertEqual(self.easy_quiz.current_version.version_number, 2)
+        attempt = AdaptiveQuizAttempt.objects.get()
+        self.assertEqual(attempt.quiz_version, first_version)
+        self.assertEqual(attempt.quiz_version.get_questions()[0]['correct_answer'], 'A')
+        
+        # A student still holding version 1 is graded against it
+        result = AdaptiveQuizService.process_quiz_attempt(
+            self.student1, self.easy_quiz, {'question_0': 'A'}, first_version
+        )
+        self.assertEqual(result['score'], 100.0)
+    
+    def test_explanations_follow_the_graded_version(self):
+        first_version = self.easy_quiz.current_version
+        questions = self.easy_quiz.get_questions()['questions']
+        questions[0]['correct_answer'] = 'B'
+        self.easy_quiz.questions_data = {'questions': questions}
+        self.easy_quiz.save()
+        
+        # Three failed attempts against version 1 unlock the explanations
+        for _ in range(3):
+            response = self.client.post('/api/ai-quiz/student/submit-quiz/', {
+                'adaptive_quiz_id': self.easy_quiz.id, 'quiz_version': first_version.version_number,
+                'answers': {'question_0': 'B'}
+            }, format='json')
+        
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['score'], 0.0)
+        explanation = response.data['explanations'][0]
+        self.assertEqual((explanation['correct_answer'], explanation['is_correct']), ('A', False))
+    
+    def test_concurrent_version_creation_reuses_winner(self):
+        from django.db.models.query import QuerySet
+        from ai_quiz.models import AdaptiveQuizVersion
+        
+        # Another request creates version 2 after this one read the latest number (1)
+        self.easy_quiz.questions_data = {'questions': []}
+        winner = AdaptiveQuizVersion.objects.create(
+            adaptive_quiz=self.easy_quiz, version_number=2, questions_data={'questions': []}
+        )
+        with patch.object(QuerySet, 'aggregate', return_value={'version_number__max': 1}):
+            version = self.easy_quiz.ensure_current_version()
+        
+        self.assertEqual(version, winner)
+        self.assertEqual(self.easy_quiz.versions.count(), 2)
+
+
+class QuizGradingServiceTest(TestCase):
+    """Compact answer keys and batch grading"""
+    
+    def test_answer_key_and_single_grade(self):
+        from ai_quiz.services import QuizGradingService
+        
+        questions = [
+            {'correct_answer': 'A'}, {'correct_answer': 'C'}, {'correct_answer': None}, {'correct_answer': 'D'}
+        ]
+        answer_key = QuizGradingService.build_answer_key(questions)
+        self.assertEqual(answer_key, 'AC?D')
+        
+        answers = {'question_0': 'A', 'question_1': 'B', 'question_3': 'D'}
+        self.assertEqual(QuizGradingService.encode_answers(answers, 4), b'AB-D')
+        self.assertEqual(QuizGradingService.grade(answer_key, answers), 2)
+    
+    def test_batch_grading_matches_single_grading(self):
+        from ai_quiz.services import QuizGradingService
+        
+        answer_key = 'ACBDA'
+        attempts = [b'ACBDA', b'AAAAA', b'-----', b'ACB']
+        
+        correct_counts, percentages = QuizGradingService.grade_batch(answer_key, attempts)
+        
+        self.assertEqual(correct_counts.tolist(), [5, 2, 0, 3])
+        self.assertEqual(percentages.tolist(), [100.0, 40.0, 0.0, 60.0])
+        self.assertEqual(
+            correct_counts.tolist(),
+            [QuizGradingService.grade(answer_key, attempt) for attempt in attempts]
+        )
+
+
+class AttemptAnswerEncodingTest(AnalyticsIntegrationTestCase):
+    """Compact attempt answers and the legacy JSON compatibility path"""
+    
+    def test_new_attempts_are_encoded(self):
+        from ai_quiz.services import AdaptiveQuizService
+        
+        result = AdaptiveQuizService.process_quiz_attempt(self.student1, self.easy_quiz, {'question_0': 'A'})
+        attempt = AdaptiveQuizAttempt.objects.get(id=result['attempt_id'])
+        
+        self.assertIsNone(attempt.answers_data)
+        self.assertEqual(bytes(attempt.answers_encoded), b'A')
+        self.assertEqual(attempt.get_answers(), {'question_0': 'A'})
+    
+    def test_compaction_keeps_unencodable_answers(self):
+        from io import StringIO
+        from django.core.management import call_command
+        
+        progress = StudentAdaptiveProgress.objects.create(student=self.student1, adaptive_quiz=self.easy_quiz)
+        legacy = AdaptiveQuizAttempt.objects.create(
+            progress=progress, answers_data={'question_0': 'A', 'question_2': 'C'}, score_percentage=100.0
+        )
+        corrupted = AdaptiveQuizAttempt.objects.create(
+            progress=progress, answers_data={'corrupted': 'answers'}, score_percentage=0.0
+        )
+        
+        call_command('compact_attempt_answers', stdout=StringIO())
+        
+        legacy.refresh_from_db()
+        corrupted.refresh_from_db()
+        self.assertEqual(bytes(legacy.answers_encoded), b'A-C')
+        self.assertEqual(legacy.get_answers(), {'question_0': 'A', 'question_2': 'C'})
+        self.assertIsNone(corrupted.answers_encoded)
+        self.assertEqual(corrupted.get_answers(), {'corrupted': 'answers'})
+
+
+class BatchSubmissionTest(AnalyticsIntegrationTestCase):
+    """Batch submission of offline-captured and proctored attempts"""
+    
+    url = '/api/ai-quiz/student/submit-quiz/batch/'
+    
+    def test_student_batch_updates_progress_and_achievements_once(self):
+        from achievements.models import DailyActivity
+        
+        self.client.force_authenticate(user=self.student1)
+        taken_at = timezone.now() - timedelta(days=1)
+        response = self.client.post(self.url, {
+            'attempts': [
+                {'adaptive_quiz_id': self.easy_quiz.id, 'answers': {'question_0': 'B'},
+                 'started_at': taken_at - timedelta(minutes=4), 'completed_at': taken_at},
+                {'adaptive_quiz_id': self.easy_quiz.id, 'answers': {'question_0': 'A'},
+                 'started_at': taken_at, 'completed_at': taken_at + timedelta(minutes=3)},
+                {'adaptive_quiz_id': self.medium_quiz.id, 'answers': {'question_0': 'A'}},
+            ]
+        }, format='json')
+        
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([r['score'] for r in response.json()['results']], [0.0, 100.0, 100.0])
+        
+        progress = StudentAdaptiveProgress.objects.get(student=self.student1, adaptive_quiz=self.easy_quiz)
+        self.assertEqual(progress.attempts_count, 2)
+        self.assertEqual(progress.latest_score, 100.0)
+        self.assertTrue(progress.completed)
+        
+        attempts = AdaptiveQuizAttempt.objects.filter(progress=progress).order_by('completed_at')
+        self.assertEqual(attempts[0].completed_at, taken_at)
+        self.assertEqual(attempts[1].time_taken, timedelta(minutes=3))
+        
+        # Offline attempts are credited to the day they were taken
+        self.assertEqual(
+            DailyActivity.objects.get(student=self.student1, date=timezone.localdate(taken_at)).quizzes_completed, 2
+        )
+        self.assertEqual(StudentAchievement.objects.filter(student=self.student1).count(), 1)
+    
+    def test_lecturer_batch_is_all_or_nothing(self):
+        self.client.force_authenticate(user=self.lecturer)
+        outsider = User.objects.create_user(
+            username='student3', email='student3@test.com', user_type='student', student_number='STU003'
+        )
+        response = self.client.post(self.url, {
+            'attempts': [
+                {'student_id': self.student2.id, 'adaptive_quiz_id': self.easy_quiz.id, 'answers': {'question_0': 'A'}},
+                {'student_id': outsider.id, 'adaptive_quiz_id': self.easy_quiz.id, 'answers': {'question_0': 'A'}},
+            ]
+        }, format='json')
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['index'], 1)
+        self.assertFalse(AdaptiveQuizAttempt.objects.exists())
+        
+        response = self.client.post(self.url, {
+            'attempts': [
+                {'student_id': self.student2.id, 'adaptive_quiz_id': self.easy_quiz.id, 'answers': {'question_0': 'A'}},
+            ]
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['results'][0]['student_id'], self.student2.id)
+
+    def test_failed_analytics_update_does_not_abort_the_batch(self):
+        def broken_recompute(*args, **kwargs):
+            # A database error, which on PostgreSQL aborts the surrounding transaction
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT * FROM missing_metrics_table')
+        
+        self.client.force_authenticate(user=self.lecturer)
+        with patch('analytics.services.MetricsRecomputeService.recompute_course', side_effect=broken_recompute), \
+                self.assertLogs('ai_quiz', 'ERROR') as logs:
+            response = self.client.post(self.url, {
+                'attempts': [
+                    {'student_id': student.id, 'adaptive_quiz_id': self.easy_quiz.id, 'answers': {'question_0': 'A'}}
+                    for student in (self.student1, self.student2)
+                ]
+            }, format='json')
+        
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual(AdaptiveQuizAttempt.objects.count(), 2)
+        self.assertEqual(StudentAchievement.objects.filter(student__in=[self.student1, self.student2]).count(), 2)
+
+
+class AtomicCounterTest(AnalyticsIntegrationTestCase):
+    """Counters are updated in the database, not read-modify-written in Python"""
+    
+    def test_stale_instances_do_not_lose_updates(self):
+        from achievements.models import DailyActivity
+        from achievements.services import AchievementService
+        from ai_quiz.services import AdaptiveQuizService
+        
+        progress = StudentAdaptiveProgress.objects.create(student=self.student1, adaptive_quiz=self.easy_quiz)
+        stale = StudentAdaptiveProgress.objects.get(pk=progress.pk)
+        
+        progress.record_attempt(40.0)
+        self.assertTrue(stale.record_attempt(80.0))
+        self.assertFalse(progress.record_attempt(60.0))
+        
+        progress.refresh_from_db()
+        self.assertEqual(progress.attempts_count, 3)
+        self.assertEqual(progress.best_score, 80.0)
+        self.assertEqual(progress.latest_score, 60.0)
+        
+        achievement = StudentAchievement.objects.create(student=self.student1)
+        stale_achievement = StudentAchievement.objects.get(pk=achievement.pk)
+        achievement.add_xp(700)
+        stale_achievement.add_xp(500, badges=1)
+        self.assertEqual((stale_achievement.total_xp, stale_achievement.level), (1200, 2))
+        self.assertEqual(stale_achievement.xp_to_next_level, 800)
+        self.assertEqual(stale_achievement.badges_earned, 1)
+        
+        for _ in range(2):
+            result = AdaptiveQuizService.process_quiz_attempt(self.student1, self.easy_quiz, {'question_0': 'A'})
+            AchievementService.process_ai_quiz_completion(
+                self.student1, AdaptiveQuizAttempt.objects.get(id=result['attempt_id'])
+            )
+        daily = DailyActivity.objects.get(student=self.student1, date=timezone.localdate())
+        self.assertEqual(daily.quizzes_completed, 2)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Concurrent submissions need PostgreSQL')
+class ConcurrentSubmissionTest(APITransactionTestCase):
+    """Parallel submissions (committed data, real connections per thread)"""
+    
+    setUp = AnalyticsIntegrationTestCase.setUp
+    
+    def test_parallel_submissions_are_all_counted(self):
+        call_command(
+            'stress_quiz_submissions', quiz=self.easy_quiz.id, submissions=40, workers=8, students=2,
+            stdout=io.StringIO()
+        )
+
+
+class QuizSessionAutosaveTest(AnalyticsIntegrationTestCase):
+    """Attempt sessions with buffered autosave and finalize"""
+    
+    def setUp(self):
+        super().setUp()
+        from django.core.cache import cache
+        cache.clear()
+        self.easy_quiz.status = 'published'
+        self.easy_quiz.save()
+        self.client.force_authenticate(user=self.student1)
+    
+    def _shared_cache(self):
+        """File-based cache: shared between processes like Redis, so autosaves are buffered"""
+        location = tempfile.mkdtemp()
+        return override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location
+        }})
+    
+    def test_autosaves_are_written_directly_without_shared_cache(self):
+        from django.core.cache import cache
+        from ai_quiz.models import QuizAttemptSession
+        
+        session_id = self.client.post(f'/api/ai-quiz/student/quiz/{self.easy_quiz.id}/session/').json()['session_id']
+        self.client.post(
+            f'/api/ai-quiz/student/quiz-session/{session_id}/autosave/', {'answers': {'question_0': 'A'}}, format='json'
+        )
+        
+        # Another worker (empty local cache) still sees the autosave
+        cache.clear()
+        self.assertEqual(QuizAttemptSession.objects.get(id=session_id).answers, {'question_0': 'A'})
+    
+    def test_flush_does_not_overwrite_finalized_session(self):
+        from ai_quiz.models import QuizAttemptSession
+        from ai_quiz.services import QuizAutosaveBuffer
+        
+        with self._shared_cache():
+            session_id = self.client.post(f'/api/ai-quiz/student/quiz/{self.easy_quiz.id}/session/').json()['session_id']
+            QuizAutosaveBuffer.save(session_id, {'question_0': 'B'})
+            QuizAttemptSession.objects.filter(id=session_id).update(status='submitted', answers={'question_0': 'A'})
+            
+            self.assertEqual(QuizAutosaveBuffer.flush(), 0)
+            self.assertEqual(QuizAttemptSession.objects.get(id=session_id).answers, {'question_0': 'A'})
+    
+    def test_autosaves_are_coalesced_until_flush(self):
+        with self._shared_cache():
+            self._check_coalesced_autosaves()
+    
+    def _check_coalesced_autosaves(self):
+        from ai_quiz.models import QuizAttemptSession
+        
+        response = self.client.post(f'/api/ai-quiz/student/quiz/{self.easy_quiz.id}/session/')
+        self.assertEqual(response.status_code, 201)
+        session_id = response.json()['session_id']
+        
+        autosave_url = f'/api/ai-quiz/student/quiz-session/{session_id}/autosave/'
+        self.client.post(autosave_url, {'answers': {'question_0': 'B'}}, format='json')
+        response = self.client.post(autosave_url, {'answers': {'question_0': 'A'}}, format='json')
+        self.assertEqual(response.status_code, 202)
+        
+        # Nothing written yet, but resuming sees the latest autosave
+        self.assertEqual(QuizAttemptSession.objects.get(id=session_id).answers, {})
+        response = self.client.post(f'/api/ai-quiz/student/quiz/{self.easy_quiz.id}/session/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['answers'], {'question_0': 'A'})
+        
+        call_command('flush_quiz_autosaves', stdout=io.StringIO())
+        self.assertEqual(QuizAttemptSession.objects.get(id=session_id).answers, {'question_0': 'A'})
+    
+    def test_finalize_grades_latest_autosave_with_real_times(self):
+        from ai_quiz.models import QuizAttemptSession
+        
+        session_id = self.client.post(f'/api/ai-quiz/student/quiz/{self.easy_quiz.id}/session/').json()['session_id']
+        QuizAttemptSession.objects.filter(id=session_id).update(started_at=timezone.now() - timedelta(minutes=2))
+        self.client.post(
+            f'/api/ai-quiz/student/quiz-session/{session_id}/autosave/', {'answers': {'question_0': 'A'}}, format='json'
+        )
+        
+        finalize_url = f'/api/ai-quiz/student/quiz-session/{session_id}/finalize/'
+        response = self.client.post(finalize_url, {}, format='json')
+        
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['score'], 100.0)
+        self.assertGreaterEqual(response.json()['time_taken_seconds'], 120)
+        attempt = AdaptiveQuizAttempt.objects.get(id=response.json()['attempt_id'])
+        self.assertEqual(attempt.session.id, session_id)
+        
+        self.assertEqual(self.client.post(finalize_url, {}, format='json').status_code, 409)
+
+
+class DeadlineSweeperTest(AnalyticsIntegrationTestCase):
+    """Timed sessions left open are auto-submitted by the sweeper"""
+    
+    def setUp(self):
+        super().setUp()
+        from django.core.cache import cache
+        cache.clear()
+        self.easy_quiz.status = 'published'
+        self.easy_quiz.time_limit = timedelta(minutes=10)
+        self.easy_quiz.save()
+        self.client.force_authenticate(user=self.student1)
+    
+    def test_expired_sessions_are_submitted_with_last_autosave(self):
+        from ai_quiz.models import QuizAttemptSession
+        
+        session_id = self.client.post(f'/api/ai-quiz/student/quiz/{self.easy_quiz.id}/session/').json()['session_id']
+        self.client.post(
+            f'/api/ai-quiz/student/quiz-session/{session_id}/autosave/', {'answers': {'question_0': 'A'}}, format='json'
+        )
+        
+        # Nothing is due yet
+        call_command('sweep_expired_quiz_sessions', stdout=io.StringIO())
+        self.assertEqual(QuizAttemptSession.objects.get(id=session_id).status, 'in_progress')
+        
+        expires_at = timezone.now() - timedelta(minutes=5)
+        QuizAttemptSession.objects.filter(id=session_id).update(
+            started_at=expires_at - timedelta(minutes=10), expires_at=expires_at
+        )
+        response = self.client.post(
+            f'/api/ai-quiz/student/quiz-session/{session_id}/autosave/', {'answers': {'question_0': 'B'}}, format='json'
+        )
+        self.assertEqual(response.status_code, 409)
+        
+        call_command('sweep_expired_quiz_sessions', stdout=io.StringIO())
+        
+        session = QuizAttemptSession.objects.select_related('attempt').get(id=session_id)
+        self.assertEqual(session.status, 'submitted')
+        self.assertTrue(session.auto_submitted)
+        self.assertEqual(session.attempt.score_percentage, 100.0)
+        self.assertEqual(session.attempt.completed_at, expires_at)
+        self.assertEqual(session.attempt.time_taken, timedelta(minutes=10))
+        self.assertEqual(
+            StudentAdaptiveProgress.objects.get(student=self.student1, adaptive_quiz=self.easy_quiz).attempts_count, 1
+        )
+    
+    def test_sweep_from_another_process_keeps_autosaved_answers(self):
+        from django.core.cache import cache
+        from ai_quiz.models import QuizAttemptSession
+        
+        session_id = self.client.post(f'/api/ai-quiz/student/quiz/{self.easy_quiz.id}/session/').json()['session_id']
+        self.client.post(
+            f'/api/ai-quiz/student/quiz-session/{session_id}/autosave/', {'answers': {'question_0': 'A'}}, format='json'
+        )
+        expires_at = timezone.now() - timedelta(minutes=5)
+        QuizAttemptSession.objects.filter(id=session_id).update(
+            started_at=expires_at - timedelta(minutes=10), expires_at=expires_at
+        )
+        
+        # The sweeper runs in its own process with an empty local cache
+        cache.clear()
+        call_command('sweep_expired_quiz_sessions', stdout=io.StringIO())
+        
+        session = QuizAttemptSession.objects.select_related('attempt').get(id=session_id)
+        self.assertEqual(session.answers, {'question_0': 'A'})
+        self.assertEqual(session.attempt.score_percentage, 100.0)
+    
+    def test_lease_allows_one_holder(self):
+        from users.models import TaskLease
+        
+        self.assertTrue(TaskLease.acquire('sweeper', 'node-a', 60))
+        self.assertFalse(TaskLease.acquire('sweeper', 'node-b', 60))
+        self.assertTrue(TaskLease.acquire('sweeper', 'node-a', 60))
+        
+        TaskLease.release('sweeper', 'node-a')
+        self.assertTrue(TaskLease.acquire('sweeper', 'node-b', 60))
+
+
+class DenormalizedAttemptKeysTest(AnalyticsIntegrationTestCase):
+    """Attempts carry their own student/course/quiz/difficulty keys"""
+    
+    def test_keys_filled_on_insert_and_by_backfill(self):
+        from ai_quiz.services import AdaptiveQuizService
+        
+        result = AdaptiveQuizService.process_quiz_attempt(self.student1, self.medium_quiz, {'question_0': 'A'})
+        attempt = AdaptiveQuizAttempt.objects.get(id=result['attempt_id'])
+        self.assertEqual(
+            (attempt.student_id, attempt.course_id, attempt.adaptive_quiz_id, attempt.difficulty),
+            (self.student1.id, self.course.id, self.medium_quiz.id, 'medium')
+        )
+        
+        # Rows written before the columns existed are filled by the backfill
+        AdaptiveQuizAttempt.objects.update(student=None, course=None, adaptive_quiz=None, difficulty='')
+        call_command('backfill_attempt_keys', stdout=io.StringIO())
+        self.assertEqual(
+            list(AdaptiveQuizAttempt.objects.filter(course=self.course, student=self.student1).values_list('difficulty', flat=True)),
+            ['medium']
+        )
+    
+    def test_benchmark_runs_and_rolls_back(self):
+        out = io.StringIO()
+        call_command(
+            'benchmark_attempt_keys', courses=2, students=5, attempts=200, repeat=1, stdout=out
+        )
+        self.assertIn('after (denormalized)', out.getvalue())
+        self.assertFalse(Course.objects.filter(code__startswith='BENCH').exists())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Declarative partitioning needs PostgreSQL')
+class PartitionConversionTest(AnalyticsIntegrationTestCase):
+    """One-time conversion of the attempts table into monthly partitions"""
+    
+    def test_convert_keeps_rows_and_continues_ids(self):
+        from ai_quiz.services import AdaptiveQuizService
+        
+        for _ in range(3):
+            AdaptiveQuizService.process_quiz_attempt(self.student1, self.easy_quiz, {'question_0': 'A'})
+        copied = set(AdaptiveQuizAttempt.objects.values_list('id', flat=True))
+        
+        call_command('partition_quiz_attempts', convert=True, stdout=io.StringIO())
+        
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [AdaptiveQuizAttempt._meta.db_table])
+            self.assertEqual(cursor.fetchone()[0], 'p')
+        self.assertEqual(set(AdaptiveQuizAttempt.objects.values_list('id', flat=True)), copied)
+        
+        result = AdaptiveQuizService.process_quiz_attempt(self.student1, self.easy_quiz, {'question_0': 'A'})
+        self.assertGreater(result['attempt_id'], max(copied))
+
+
+class AttemptArchiveTest(AnalyticsIntegrationTestCase):
+    """Old attempts keep their summary columns while answers move to cold storage"""
+    
+    def test_archive_moves_answers_and_keeps_them_readable(self):
+        from ai_quiz.services import AdaptiveQuizService
+        
+        result = AdaptiveQuizService.process_quiz_attempt(self.student1, self.medium_quiz, {'question_0': 'A'})
+        old_attempt = AdaptiveQuizAttempt.objects.get(id=result['attempt_id'])
+        old_attempt.started_at = timezone.now() - timedelta(days=200)
+        old_attempt.save()
+        result = AdaptiveQuizService.process_quiz_attempt(self.student1, self.medium_quiz, {'question_0': 'B'})
+        recent_attempt = AdaptiveQuizAttempt.objects.get(id=result['attempt_id'])
+        
+        before = (timezone.now() - timedelta(days=100)).date().isoformat()
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            call_command('archive_quiz_attempts', before=before, stdout=io.StringIO())
+            
+            old_attempt = AdaptiveQuizAttempt.objects.get(id=old_attempt.id)
+            self.assertIsNotNone(old_attempt.answers_archive_id)
+            self.assertIsNone(old_attempt.answers_encoded)
+            self.assertEqual(old_attempt.get_answers(), {'question_0': 'A'})
+            self.assertEqual(old_attempt.score_percentage, 100.0)
+            
+            recent_attempt.refresh_from_db()
+            self.assertIsNone(recent_attempt.answers_archive_id)
+            self.assertEqual(recent_attempt.get_answers(), {'question_0': 'B'})
+    
+    def test_rearchiving_a_month_keeps_old_file_until_commit(self):
+        from ai_quiz.models import AttemptAnswerArchive
+        from ai_quiz.services import AdaptiveQuizService
+        
+        started_at = timezone.now() - timedelta(days=200)
+        before = (timezone.now() - timedelta(days=100)).date().isoformat()
+        
+        def old_attempt(answer):
+            result = AdaptiveQuizService.process_quiz_attempt(self.student1, self.medium_quiz, {'question_0': answer})
+            AdaptiveQuizAttempt.objects.filter(id=result['attempt_id']).update(started_at=started_at)
+            return result['attempt_id']
+        
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            first_id = old_attempt('A')
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command('archive_quiz_attempts', before=before, stdout=io.StringIO())
+            old_name = AttemptAnswerArchive.objects.get().archive_file.name
+            
+            # A failed rewrite leaves the old file in place and no new file behind
+            second_id = old_attempt('B')
+            with patch.object(AttemptAnswerArchive, 'save', side_effect=RuntimeError('disk full')):
+                with self.assertRaises(RuntimeError):
+                    call_command('archive_quiz_attempts', before=before, stdout=io.StringIO())
+            archive = AttemptAnswerArchive.objects.get()
+            self.assertEqual(archive.archive_file.name, old_name)
+            self.assertEqual(os.listdir(os.path.dirname(archive.archive_file.path)), [os.path.basename(old_name)])
+            self.assertEqual(AdaptiveQuizAttempt.objects.get(id=first_id).get_answers(), {'question_0': 'A'})
+            
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command('archive_quiz_attempts', before=before, stdout=io.StringIO())
+            archive = AttemptAnswerArchive.objects.get()
+            self.assertNotEqual(archive.archive_file.name, old_name)
+            self.assertFalse(archive.archive_file.storage.exists(old_name))
+            self.assertEqual(AdaptiveQuizAttempt.objects.get(id=first_id).get_answers(), {'question_0': 'A'})
+            self.assertEqual(AdaptiveQuizAttempt.objects.get(id=second_id).get_answers(), {'question_0': 'B'})
@@ -19,7 +19,12 @@ urlpatterns = [
     # Student endpoints - quiz taking
     path('student/available-slides/', views.student_available_slides, name='student_available_slides'),
     path('student/quiz/<int:quiz_id>/', views.get_adaptive_quiz, name='get_adaptive_quiz'),
+    path('student/quiz/<int:quiz_id>/version/<int:version_number>/', views.get_adaptive_quiz_version, name='get_adaptive_quiz_version'),
     path('student/submit-quiz/', views.submit_adaptive_quiz, name='submit_adaptive_quiz'),
+    path('student/submit-quiz/batch/', views.submit_adaptive_quiz_batch, name='submit_adaptive_quiz_batch'),
+    path('student/quiz/<int:quiz_id>/session/', views.start_quiz_session, name='start_quiz_session'),
+    path('student/quiz-session/<int:session_id>/autosave/', views.autosave_quiz_session, name='autosave_quiz_session'),
+    path('student/quiz-session/<int:session_id>/finalize/', views.finalize_quiz_session, name='finalize_quiz_session'),
     path('student/progress/', views.student_adaptive_progress, name='student_adaptive_progress'),
     path('student/available-quizzes/', views.get_student_available_quizzes, name='student_available_quizzes'),
     path('student/quiz-summary/', views.get_student_quiz_summary, name='student_quiz_summary'),
@@ -27,4 +32,5 @@ urlpatterns = [
     # Analytics for AI Quiz
     path('slide/<int:slide_id>/stats/', views.adaptive_slide_statistics, name='adaptive_slide_statistics'),
     path('progress-analytics/', views.get_progress_analytics, name='get_progress_analytics'),
+    path('catalog/cache-stats/', views.student_catalog_cache_stats, name='student_catalog_cache_stats'),
 ]
\ No newline at end of file
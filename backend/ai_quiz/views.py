@@ -4,16 +4,22 @@ from rest_framework.response import Response
 from django.utils import timezone
 from django.db import transaction
 from django.db.models import Avg, Count, Sum, Q
+from django.http import HttpResponse
 
-from .models import LectureSlide, AdaptiveQuiz, StudentAdaptiveProgress, AdaptiveQuizAttempt
+from .models import (
+    LectureSlide, AdaptiveQuiz, AdaptiveQuizVersion, StudentAdaptiveProgress, AdaptiveQuizAttempt,
+    QuizAttemptSession
+)
 from .serializers import (
     LectureSlideSerializer, AdaptiveQuizSerializer, LectureSlideUploadSerializer,
-    GenerateQuestionsSerializer, AdaptiveQuizTakeSerializer, QuizResultSerializer,
+    GenerateQuestionsSerializer, AdaptiveQuizTakeSerializer, AdaptiveQuizBatchSubmitSerializer,
+    QuizSessionAnswersSerializer, QuizResultSerializer,
     LectureSlideQuizzesSerializer, StudentQuizAccessSerializer
 )
-from .services import ClaudeAPIService, AdaptiveQuizService
-from courses.models import Topic
+from .services import ClaudeAPIService, AdaptiveQuizService, StudentCatalogCache, QuizAutosaveBuffer
+from courses.models import Topic, CourseEnrollment
 from users.models import User
+from users.idempotency import idempotent
 
 
 class IsLecturerPermission(permissions.BasePermission):
@@ -77,6 +83,7 @@ def upload_lecture_slide(request):
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated, IsLecturerPermission])
+@idempotent
 def generate_adaptive_questions(request):
     """Generate adaptive questions using Claude API"""
     serializer = GenerateQuestionsSerializer(
@@ -173,7 +180,7 @@ def lecturer_lecture_slides(request):
     
     for slide in slides:
         # Get all quizzes for this slide
-        quizzes = AdaptiveQuiz.objects.filter(lecture_slide=slide, is_active=True)
+        quizzes = AdaptiveQuiz.objects.with_version_summary().filter(lecture_slide=slide, is_active=True)
         
         # If no quizzes exist, add slide info only
         if not quizzes.exists():
@@ -311,69 +318,92 @@ def student_available_slides(request):
     return Response(slides_data)
 
 
-@api_view(['GET'])
-@permission_classes([permissions.IsAuthenticated, IsStudentPermission])
-def get_adaptive_quiz(request, quiz_id):
-    """Get adaptive quiz questions for student"""
-    student = request.user
+def _quiz_payload_response(request, version, cache_control):
+    """Serve a version's pre-rendered student payload with conditional GET support"""
+    etag = f'"{version.etag}"'
+    if_none_match = request.headers.get('If-None-Match', '')
+    client_etags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    
+    if etag in client_etags or '*' in client_etags:
+        response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = HttpResponse(bytes(version.student_payload), content_type='application/json')
     
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def _get_accessible_quiz(student, quiz_id):
+    """Published quiz the student may take, or an error Response"""
     try:
         # Updated to check both is_active AND published status
-        adaptive_quiz = AdaptiveQuiz.objects.get(
+        # Students are served the version's pre-rendered payload, never the questions JSON
+        adaptive_quiz = AdaptiveQuiz.objects.select_related('current_version', 'lecture_slide').defer(
+            'questions_data', 'current_version__questions_data'
+        ).get(
             id=quiz_id, 
             is_active=True,
             status='published'  # Only allow published quizzes
         )
-        
-        # Check if student can access this quiz
-        available_quizzes = AdaptiveQuizService.get_available_quizzes_for_student(
-            student, adaptive_quiz.lecture_slide
-        )
-        
-        # Find this quiz in available quizzes
-        quiz_accessible = False
-        for quiz_info in available_quizzes:
-            if quiz_info['quiz'].id == adaptive_quiz.id:
-                quiz_accessible = quiz_info['accessible']
-                break
-        
-        if not quiz_accessible:
-            return Response(
-                {'error': 'Quiz not accessible. Complete previous difficulty level first.'},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        
-        # Get questions (hide correct answers and explanations)
-        questions_data = adaptive_quiz.get_questions()
-        questions = questions_data.get('questions', [])
-        
-        # Remove correct answers and explanations for student view
-        student_questions = []
-        for i, question in enumerate(questions):
-            student_question = {
-                'question_number': i,
-                'question': question.get('question'),
-                'options': question.get('options'),
-                'difficulty': question.get('difficulty')
-            }
-            student_questions.append(student_question)
-        
-        return Response({
-            'quiz_id': adaptive_quiz.id,
-            'title': adaptive_quiz.lecture_slide.title,
-            'difficulty': adaptive_quiz.difficulty,
-            'question_count': len(student_questions),
-            'questions': student_questions
-        })
-        
     except AdaptiveQuiz.DoesNotExist:
-        return Response(
+        return None, Response(
             {'error': 'Quiz not found or not available'},
             status=status.HTTP_404_NOT_FOUND
         )
+    
+    # Check if student can access this quiz
+    if not AdaptiveQuizService._is_quiz_accessible(student, adaptive_quiz):
+        return None, Response(
+            {'error': 'Quiz not accessible. Complete previous difficulty level first.'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    return adaptive_quiz, None
+
+
+def _served_version(adaptive_quiz):
+    """Current version of the quiz; edits and publishing keep it up to date"""
+    if adaptive_quiz.current_version_id is None:
+        return adaptive_quiz.ensure_current_version()
+    return adaptive_quiz.current_version
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, IsStudentPermission])
+def get_adaptive_quiz(request, quiz_id):
+    """
+    Get adaptive quiz questions for student
+    
+    Serves the current version's pre-rendered payload; clients revalidate
+    with If-None-Match and get 304 until a new version is published.
+    """
+    adaptive_quiz, error_response = _get_accessible_quiz(request.user, quiz_id)
+    if error_response is not None:
+        return error_response
+    
+    return _quiz_payload_response(request, _served_version(adaptive_quiz), 'private, no-cache')
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, IsStudentPermission])
+def get_adaptive_quiz_version(request, quiz_id, version_number):
+    """Get one immutable quiz version; safe to cache indefinitely"""
+    adaptive_quiz, error_response = _get_accessible_quiz(request.user, quiz_id)
+    if error_response is not None:
+        return error_response
+    
+    try:
+        version = adaptive_quiz.versions.get(version_number=version_number)
+    except AdaptiveQuizVersion.DoesNotExist:
+        return Response({'error': 'Quiz version not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    return _quiz_payload_response(request, version, 'private, max-age=31536000, immutable')
+
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated, IsStudentPermission])
+@idempotent
 def submit_adaptive_quiz(request):
     """Submit adaptive quiz attempt - now integrated with attendance, analytics, and achievements"""
     student = request.user
@@ -386,72 +416,32 @@ def submit_adaptive_quiz(request):
         try:
             adaptive_quiz = AdaptiveQuiz.objects.get(id=quiz_id, is_active=True)
             
+            # Grade against the version the student was shown, if they tell us
+            quiz_version = None
+            version_number = serializer.validated_data.get('quiz_version')
+            if version_number is not None:
+                quiz_version = adaptive_quiz.versions.filter(version_number=version_number).first()
+                if quiz_version is None:
+                    return Response(
+                        {'error': 'Quiz version not found'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+            
             with transaction.atomic():
                 # Process the attempt
                 result = AdaptiveQuizService.process_quiz_attempt(
-                    student, adaptive_quiz, answers
+                    student, adaptive_quiz, answers, quiz_version
                 )
                 
                 # Get the created attempt for further processing
-                latest_attempt = AdaptiveQuizAttempt.objects.filter(
-                    progress__student=student,
-                    progress__adaptive_quiz=adaptive_quiz
-                ).order_by('-started_at').first()
+                latest_attempt = AdaptiveQuizAttempt.objects.select_related(
+                    'progress__adaptive_quiz__lecture_slide__topic__course'
+                ).get(id=result['attempt_id'])
                 
-                # Mark attendance for ANY AI quiz completion (easy level sufficient)
-                from courses.models import Attendance
-                course = adaptive_quiz.lecture_slide.topic.course
-                attendance, created = Attendance.objects.update_or_create(
-                    student=student,
-                    course=course,
-                    date=timezone.now().date(),
-                    defaults={
-                        'is_present': True,
-                        'verified_by_quiz': True,
-                    }
+                # Attendance, analytics and achievements for the completion
+                result['achievement_data'] = AdaptiveQuizService.apply_completion_side_effects(
+                    student, [latest_attempt]
                 )
-                
-                # Update student engagement metrics for analytics
-                from analytics.models import StudentEngagementMetrics
-                try:
-                    metrics, created = StudentEngagementMetrics.objects.get_or_create(
-                        student=student,
-                        course=course
-                    )
-                    metrics.calculate_ai_quiz_metrics()  # Will need to implement this method
-                except Exception as e:
-                    # Log the error but don't fail the quiz submission
-                    print(f"Analytics update failed: {e}")
-                
-                # Track daily engagement for analytics heatmap
-                from analytics.models import DailyEngagement
-                DailyEngagement.mark_engagement(student)
-                
-                # Process achievements for AI quiz completion
-                from achievements.services import AchievementService
-                try:
-                    achievement_result = AchievementService.process_ai_quiz_completion(
-                        student, latest_attempt
-                    )
-                    
-                    # Add achievement data to response
-                    result['achievement_data'] = {
-                        'xp_earned': achievement_result.get('xp_earned', 0),
-                        'total_xp': achievement_result.get('total_xp', 0),
-                        'level': achievement_result.get('level', 1),
-                        'new_badges': [
-                            {
-                                'name': badge.badge_type.name,
-                                'icon': badge.badge_type.icon,
-                                'color': badge.badge_type.color,
-                                'xp_reward': badge.badge_type.xp_reward
-                            } for badge in achievement_result.get('new_badges', [])
-                        ],
-                        'current_streak': achievement_result.get('streak', 0)
-                    }
-                except Exception as e:
-                    print(f"Achievement processing failed: {e}")
-                    result['achievement_data'] = None
             
             # Prepare response data
             response_data = {
@@ -467,7 +457,11 @@ def submit_adaptive_quiz(request):
             
             # Include explanations if student should see them
             if result['show_explanation']:
-                questions = adaptive_quiz.get_questions().get('questions', [])
+                # Explain the questions the attempt was graded against
+                if quiz_version is not None:
+                    questions = quiz_version.get_questions()
+                else:
+                    questions = adaptive_quiz.get_questions().get('questions', [])
                 explanations = []
                 
                 for i, question in enumerate(questions):
@@ -497,6 +491,275 @@ def submit_adaptive_quiz(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@idempotent
+def submit_adaptive_quiz_batch(request):
+    """
+    Submit many adaptive quiz attempts at once
+    
+    Students submit their own (e.g. offline-captured) attempts; lecturers can
+    submit attempts from a proctoring device by giving a student_id per attempt.
+    The batch is all-or-nothing: any invalid attempt rejects the whole request.
+    """
+    user = request.user
+    if not (user.is_student or user.is_lecturer):
+        return Response(
+            {'error': 'Only students and lecturers can submit quiz attempts'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    serializer = AdaptiveQuizBatchSubmitSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    items = serializer.validated_data['attempts']
+    
+    # Look everything up in bulk before grading anything
+    quizzes = AdaptiveQuiz.objects.select_related(
+        'lecture_slide__topic__course'
+    ).filter(is_active=True).in_bulk({item['adaptive_quiz_id'] for item in items})
+    
+    requested_versions = {
+        (item['adaptive_quiz_id'], item['quiz_version'])
+        for item in items if item.get('quiz_version') is not None
+    }
+    versions = {}
+    if requested_versions:
+        for version in AdaptiveQuizVersion.objects.filter(
+            adaptive_quiz_id__in={quiz_id for quiz_id, number in requested_versions},
+            version_number__in={number for quiz_id, number in requested_versions}
+        ):
+            versions[(version.adaptive_quiz_id, version.version_number)] = version
+    
+    if user.is_student:
+        students = {user.id: user}
+    else:
+        students = User.objects.filter(user_type='student').in_bulk(
+            {item['student_id'] for item in items if item.get('student_id') is not None}
+        )
+    enrolled = set(CourseEnrollment.objects.filter(
+        student_id__in=students.keys(),
+        course_id__in={quiz.lecture_slide.topic.course_id for quiz in quizzes.values()},
+        is_active=True
+    ).values_list('student_id', 'course_id'))
+    
+    errors = []
+    submissions = []
+    for index, item in enumerate(items):
+        quiz = quizzes.get(item['adaptive_quiz_id'])
+        if quiz is None:
+            errors.append({'index': index, 'error': 'Quiz not found or inactive'})
+            continue
+        
+        course = quiz.lecture_slide.topic.course
+        if user.is_student:
+            if item.get('student_id') not in (None, user.id):
+                errors.append({'index': index, 'error': 'Students can only submit their own attempts'})
+                continue
+            student = user
+        else:
+            student = students.get(item.get('student_id'))
+            if student is None:
+                errors.append({'index': index, 'error': 'student_id must reference a student'})
+                continue
+            if course.lecturer_id != user.id:
+                errors.append({'index': index, 'error': 'You do not teach this course'})
+                continue
+            if (student.id, course.id) not in enrolled:
+                errors.append({'index': index, 'error': 'Student is not enrolled in this course'})
+                continue
+        
+        quiz_version = None
+        if item.get('quiz_version') is not None:
+            quiz_version = versions.get((quiz.id, item['quiz_version']))
+            if quiz_version is None:
+                errors.append({'index': index, 'error': 'Quiz version not found'})
+                continue
+        
+        submissions.append({
+            'student': student,
+            'adaptive_quiz': quiz,
+            'answers': item['answers'],
+            'quiz_version': quiz_version,
+            'started_at': item.get('started_at'),
+            'completed_at': item.get('completed_at'),
+        })
+    
+    if errors:
+        return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        with transaction.atomic():
+            results, attempts = AdaptiveQuizService.process_quiz_attempts_batch(submissions)
+            
+            # Downstream updates run once per student, not once per attempt
+            attempts_by_student = {}
+            for submission, attempt in zip(submissions, attempts):
+                attempts_by_student.setdefault(submission['student'], []).append(attempt)
+            
+            achievement_data = {
+                student.id: AdaptiveQuizService.apply_completion_side_effects(student, student_attempts)
+                for student, student_attempts in attempts_by_student.items()
+            }
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    for submission, result in zip(submissions, results):
+        result['student_id'] = submission['student'].id
+        result['adaptive_quiz_id'] = submission['adaptive_quiz'].id
+    
+    return Response({
+        'submitted': len(results),
+        'results': results,
+        'achievement_data': achievement_data,
+        'attendance_marked': True
+    }, status=status.HTTP_201_CREATED)
+
+
+def _session_data(session):
+    """Client view of a quiz session, with the latest (possibly buffered) answers"""
+    answers, saved_at = QuizAutosaveBuffer.get(session)
+    return {
+        'session_id': session.id,
+        'adaptive_quiz_id': session.adaptive_quiz_id,
+        'quiz_version': session.quiz_version.version_number if session.quiz_version else None,
+        'status': session.status,
+        'answers': answers,
+        'started_at': session.started_at,
+        'expires_at': session.expires_at,
+        'last_saved_at': saved_at,
+    }
+
+
+def _get_student_session(student, session_id):
+    """In-progress session of the student, or an error Response"""
+    try:
+        session = QuizAttemptSession.objects.select_related('quiz_version').get(
+            id=session_id,
+            student=student
+        )
+    except QuizAttemptSession.DoesNotExist:
+        return None, Response(
+            {'error': 'Quiz session not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    if session.status != 'in_progress':
+        return None, Response(
+            {'error': 'Quiz session has already been submitted', 'attempt_id': session.attempt_id},
+            status=status.HTTP_409_CONFLICT
+        )
+    
+    return session, None
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated, IsStudentPermission])
+def start_quiz_session(request, quiz_id):
+    """Start an adaptive quiz attempt, or resume the one already in progress"""
+    adaptive_quiz, error_response = _get_accessible_quiz(request.user, quiz_id)
+    if error_response is not None:
+        return error_response
+    
+    session = QuizAttemptSession.objects.select_related('quiz_version').filter(
+        student=request.user,
+        adaptive_quiz=adaptive_quiz,
+        status='in_progress'
+    ).first()
+    if session is not None:
+        return Response(_session_data(session))
+    
+    started_at = timezone.now()
+    session = QuizAttemptSession.objects.create(
+        student=request.user,
+        adaptive_quiz=adaptive_quiz,
+        quiz_version=_served_version(adaptive_quiz),
+        started_at=started_at,
+        expires_at=started_at + adaptive_quiz.time_limit if adaptive_quiz.time_limit else None
+    )
+    return Response(_session_data(session), status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated, IsStudentPermission])
+def autosave_quiz_session(request, session_id):
+    """
+    Autosave the answers of an in-progress quiz session
+    
+    With a shared cache, answers are buffered (last write wins) and written to
+    the database in batches by flush_quiz_autosaves, so frequent autosaves stay
+    cheap; otherwise they are written directly.
+    """
+    session, error_response = _get_student_session(request.user, session_id)
+    if error_response is not None:
+        return error_response
+    
+    if session.is_expired():
+        return Response(
+            {'error': 'Time is up for this quiz; it will be submitted automatically'},
+            status=status.HTTP_409_CONFLICT
+        )
+    
+    serializer = QuizSessionAnswersSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    saved_at = QuizAutosaveBuffer.save(session.id, serializer.validated_data.get('answers', {}))
+    return Response({'session_id': session.id, 'saved_at': saved_at}, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated, IsStudentPermission])
+@idempotent
+def finalize_quiz_session(request, session_id):
+    """Submit a quiz session (final answers, or the latest autosave) for grading"""
+    session, error_response = _get_student_session(request.user, session_id)
+    if error_response is not None:
+        return error_response
+    
+    serializer = QuizSessionAnswersSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Past the deadline only the answers autosaved in time count
+    answers = serializer.validated_data.get('answers')
+    completed_at = None
+    if session.is_expired():
+        answers = None
+        completed_at = session.expires_at
+    
+    try:
+        with transaction.atomic():
+            result = AdaptiveQuizService.finalize_session(session, answers, completed_at)
+            attempt = AdaptiveQuizAttempt.objects.select_related(
+                'progress__adaptive_quiz__lecture_slide__topic__course'
+            ).get(id=result['attempt_id'])
+            
+            # Attendance, analytics and achievements for the completion
+            result['achievement_data'] = AdaptiveQuizService.apply_completion_side_effects(
+                request.user, [attempt]
+            )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+    
+    return Response({
+        'session_id': session.id,
+        'attempt_id': attempt.id,
+        'score': result['score'],
+        'correct_count': result['correct_count'],
+        'total_questions': result['total_questions'],
+        'completed': result['completed'],
+        'show_explanation': result['show_explanation'],
+        'unlocked_next': result['unlocked_next'],
+        'started_at': attempt.started_at,
+        'completed_at': attempt.completed_at,
+        'time_taken_seconds': attempt.time_taken.total_seconds() if attempt.time_taken else None,
+        'attendance_marked': True,
+        'achievement_data': result['achievement_data']
+    }, status=status.HTTP_201_CREATED)
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated, IsStudentPermission])
 def student_adaptive_progress(request):
@@ -733,6 +996,7 @@ def update_quiz_questions(request, quiz_id):
         # Update quiz questions
         quiz.questions_data = {'questions': questions_data}
         quiz.status = 'under_review'
+        quiz.ensure_current_version(created_by=request.user)
         quiz.save()
         
         return Response({'message': 'Quiz updated successfully'})
@@ -756,6 +1020,7 @@ def publish_quiz(request, quiz_id):
         quiz.reviewed_by = request.user
         quiz.reviewed_at = timezone.now()
         quiz.review_notes = review_notes
+        quiz.ensure_current_version(created_by=request.user)
         quiz.save()
         
         # Return comprehensive response data for frontend state management
@@ -781,7 +1046,7 @@ def publish_quiz(request, quiz_id):
 def get_quizzes_for_review(request):
     """Get ALL quizzes for lecturer - FIXED to include published quizzes"""
     # CRITICAL FIX: Get ALL quizzes, not just draft/under_review
-    quizzes = AdaptiveQuiz.objects.filter(
+    quizzes = AdaptiveQuiz.objects.with_version_summary().filter(
         lecture_slide__topic__course__lecturer=request.user,
         is_active=True  # Remove status filter to include published quizzes
     ).select_related(
@@ -842,182 +1107,16 @@ def get_quizzes_for_review(request):
 def get_student_available_quizzes(request):
     """
     Get all available quizzes for student with comprehensive access and progress information
+    (served from the per-student catalog cache when nothing relevant has changed)
     """
     student = request.user
     
     try:
-        # Get enrolled courses
-        from courses.models import CourseEnrollment
+        catalog, cache_hit = StudentCatalogCache.get_catalog(student)
         
-        enrolled_course_ids = CourseEnrollment.objects.filter(
-            student=student,
-            is_active=True
-        ).values_list('course_id', flat=True)
-        
-        if not enrolled_course_ids:
-            return Response({
-                'message': 'No enrolled courses found',
-                'quizzes': []
-            })
-        
-        # Get all published quizzes from enrolled courses
-        available_quizzes = AdaptiveQuiz.objects.filter(
-            lecture_slide__topic__course_id__in=enrolled_course_ids,
-            status='published',
-            is_active=True
-        ).select_related(
-            'lecture_slide',
-            'lecture_slide__topic',
-            'lecture_slide__topic__course'
-        ).order_by(
-            'lecture_slide__topic__course__code',
-            'lecture_slide__title',
-            'difficulty'
-        )
-        
-        # Get student's progress for all these quizzes
-        student_progress = StudentAdaptiveProgress.objects.filter(
-            student=student,
-            adaptive_quiz__in=available_quizzes
-        ).select_related('adaptive_quiz')
-        
-        # Create progress lookup dictionary
-        progress_lookup = {
-            progress.adaptive_quiz.id: progress 
-            for progress in student_progress
-        }
-        
-        # Group quizzes by slide for easier processing
-        slides_data = {}
-        
-        for quiz in available_quizzes:
-            slide_id = quiz.lecture_slide.id
-            
-            if slide_id not in slides_data:
-                slides_data[slide_id] = {
-                    'slide_info': {
-                        'slide_id': slide_id,
-                        'title': quiz.lecture_slide.title,
-                        'topic_name': quiz.lecture_slide.topic.name,
-                        'course_code': quiz.lecture_slide.topic.course.code,
-                        'course_name': quiz.lecture_slide.topic.course.name,
-                        'created_at': quiz.lecture_slide.created_at
-                    },
-                    'quizzes': []
-                }
-            
-            # Get progress for this specific quiz
-            progress = progress_lookup.get(quiz.id)
-            
-            # Determine accessibility based on adaptive learning rules
-            accessible = True
-            access_reason = "Available"
-            
-            if quiz.difficulty == 'medium':
-                # Check if easy level is completed
-                easy_quiz = AdaptiveQuiz.objects.filter(
-                    lecture_slide=quiz.lecture_slide,
-                    difficulty='easy',
-                    status='published',
-                    is_active=True
-                ).first()
-                
-                if easy_quiz:
-                    easy_progress = progress_lookup.get(easy_quiz.id)
-                    if not easy_progress or not easy_progress.completed:
-                        accessible = False
-                        access_reason = "Complete Easy level first"
-            
-            elif quiz.difficulty == 'hard':
-                # Check if medium level is completed
-                medium_quiz = AdaptiveQuiz.objects.filter(
-                    lecture_slide=quiz.lecture_slide,
-                    difficulty='medium',
-                    status='published',
-                    is_active=True
-                ).first()
-                
-                if medium_quiz:
-                    medium_progress = progress_lookup.get(medium_quiz.id)
-                    if not medium_progress or not medium_progress.completed:
-                        accessible = False
-                        access_reason = "Complete Medium level first"
-            
-            # Determine status
-            if not progress:
-                status = "not_started"
-            elif progress.completed:
-                status = "completed"
-            else:
-                status = "in_progress"
-            
-            quiz_data = {
-                'quiz_id': quiz.id,
-                'difficulty': quiz.difficulty,
-                'accessible': accessible,
-                'access_reason': access_reason,
-                'status': status,
-                'question_count': quiz.get_question_count(),
-                'progress': {
-                    'attempts_count': progress.attempts_count if progress else 0,
-                    'best_score': progress.best_score if progress else None,
-                    'latest_score': progress.latest_score if progress else None,
-                    'completed': progress.completed if progress else False,
-                    'last_attempt_at': progress.last_attempt_at if progress else None
-                }
-            }
-            
-            slides_data[slide_id]['quizzes'].append(quiz_data)
-        
-        # Convert to list format and add summary statistics
-        response_data = []
-        total_quizzes = 0
-        completed_quizzes = 0
-        accessible_quizzes = 0
-        
-        for slide_data in slides_data.values():
-            # Sort quizzes by difficulty (easy, medium, hard)
-            difficulty_order = {'easy': 1, 'medium': 2, 'hard': 3}
-            slide_data['quizzes'].sort(key=lambda x: difficulty_order.get(x['difficulty'], 4))
-            
-            # Calculate slide-level statistics
-            slide_total = len(slide_data['quizzes'])
-            slide_completed = sum(1 for q in slide_data['quizzes'] if q['status'] == 'completed')
-            slide_accessible = sum(1 for q in slide_data['quizzes'] if q['accessible'])
-            
-            slide_data['slide_info']['statistics'] = {
-                'total_quizzes': slide_total,
-                'completed_quizzes': slide_completed,
-                'accessible_quizzes': slide_accessible,
-                'completion_rate': (slide_completed / slide_total * 100) if slide_total > 0 else 0
-            }
-            
-            total_quizzes += slide_total
-            completed_quizzes += slide_completed
-            accessible_quizzes += slide_accessible
-            
-            response_data.append(slide_data)
-        
-        # Sort slides by course code and title
-        response_data.sort(key=lambda x: (
-            x['slide_info']['course_code'],
-            x['slide_info']['title']
-        ))
-        
-        # Overall statistics
-        summary_stats = {
-            'total_quizzes': total_quizzes,
-            'completed_quizzes': completed_quizzes,
-            'accessible_quizzes': accessible_quizzes,
-            'overall_completion_rate': (completed_quizzes / total_quizzes * 100) if total_quizzes > 0 else 0,
-            'total_slides': len(response_data),
-            'courses_count': len(set(slide['slide_info']['course_code'] for slide in response_data))
-        }
-        
-        return Response({
-            'summary': summary_stats,
-            'slides': response_data
-        })
+        response = Response(catalog)
+        response['X-Catalog-Cache'] = 'HIT' if cache_hit else 'MISS'
+        return response
         
     except Exception as e:
         return Response(
@@ -1026,6 +1125,13 @@ def get_student_available_quizzes(request):
         )
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, permissions.IsAdminUser])
+def student_catalog_cache_stats(request):
+    """Hit ratio of the student quiz catalog cache"""
+    return Response(StudentCatalogCache.get_stats())
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated, IsStudentPermission])
 def get_student_quiz_summary(request):
@@ -1037,7 +1143,7 @@ def get_student_quiz_summary(request):
     try:
         # Get recent quiz attempts (last 10)
         recent_attempts = AdaptiveQuizAttempt.objects.filter(
-            progress__student=student
+            student=student
         ).select_related(
             'progress__adaptive_quiz__lecture_slide__topic__course'
         ).order_by('-started_at')[:10]
@@ -1125,7 +1231,7 @@ def get_lecturer_available_quizzes(request):
             courses = courses.filter(id=course_id)
         
         # Get all quizzes from lecturer's courses
-        quizzes_query = AdaptiveQuiz.objects.filter(
+        quizzes_query = AdaptiveQuiz.objects.with_version_summary().filter(
             lecture_slide__topic__course__in=courses
         ).select_related(
             'lecture_slide',
@@ -2,7 +2,10 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.db.models import Count
 from django.contrib import messages
-from .models import StudentEngagementMetrics, DailyEngagement
+from .models import (
+    StudentEngagementMetrics, DailyEngagement, ActivityYear, CourseDailyRollup, ExportJob,
+    MetricsRecomputeJob, QuestionChoiceCounter
+)
 
 
 @admin.register(StudentEngagementMetrics)
@@ -224,6 +227,57 @@ class DailyEngagementAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related('student')
 
 
+
+@admin.register(ActivityYear)
+class ActivityYearAdmin(admin.ModelAdmin):
+    """Admin interface for the compact yearly activity calendars"""
+    
+    list_display = ('student', 'year', 'active_days', 'updated_at')
+    list_filter = ('year',)
+    search_fields = ('student__username', 'student__student_number')
+    readonly_fields = ('bitmap', 'counters', 'active_days', 'updated_at')
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('student')
+
+
+@admin.register(CourseDailyRollup)
+class CourseDailyRollupAdmin(admin.ModelAdmin):
+    """Admin interface for the per-course daily attempt rollups"""
+    
+    list_display = ('course', 'date', 'attempts', 'active_students', 'score_count', 'updated_at')
+    list_filter = ('course',)
+    date_hierarchy = 'date'
+    readonly_fields = [field.name for field in CourseDailyRollup._meta.fields]
+
+
+@admin.register(QuestionChoiceCounter)
+class QuestionChoiceCounterAdmin(admin.ModelAdmin):
+    """Admin interface for the per-question choice counters"""
+    
+    list_display = ('quiz_version', 'question_number', 'attempts', 'correct', 'choice_a', 'choice_b', 'choice_c', 'choice_d', 'unanswered', 'updated_at')
+    list_select_related = ('quiz_version__adaptive_quiz__lecture_slide',)
+    readonly_fields = [field.name for field in QuestionChoiceCounter._meta.fields]
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    """Admin interface for background analytics exports"""
+    
+    list_display = ('id', 'requested_by', 'export_type', 'format_type', 'status', 'rows_written', 'total_rows', 'created_at', 'expires_at')
+    list_filter = ('status', 'export_type', 'format_type')
+    search_fields = ('requested_by__username',)
+    readonly_fields = [field.name for field in ExportJob._meta.fields]
+
+
+@admin.register(MetricsRecomputeJob)
+class MetricsRecomputeJobAdmin(admin.ModelAdmin):
+    """Admin interface for queued engagement metric recomputes"""
+    
+    list_display = ('id', 'requested_by', 'status', 'courses_processed', 'metrics_updated', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = [field.name for field in MetricsRecomputeJob._meta.fields]
+
 # Customize admin site headers
 admin.site.site_header = 'CES Analytics Dashboard'
 admin.site.site_title = 'CES Admin'
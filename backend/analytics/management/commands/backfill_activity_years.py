@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from achievements.models import DailyActivity
+from analytics.models import ActivityYear, DailyEngagement
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the yearly activity bitmaps from DailyEngagement and DailyActivity rows'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--student', type=int, help='Only rebuild the calendar of this student')
+        parser.add_argument('--batch-size', type=int, default=500)
+    
+    def handle(self, *args, **options):
+        engagements = DailyEngagement.objects.filter(engaged=True)
+        activities = DailyActivity.objects.all()
+        if options['student']:
+            engagements = engagements.filter(student_id=options['student'])
+            activities = activities.filter(student_id=options['student'])
+        
+        # Build every calendar in memory first, keyed by (student_id, year)
+        calendars = {}
+        
+        def calendar_for(student_id, day):
+            key = (student_id, day.year)
+            if key not in calendars:
+                calendars[key] = ActivityYear(student_id=student_id, year=day.year)
+            return calendars[key]
+        
+        for student_id, day in engagements.values_list('student_id', 'date').iterator(chunk_size=options['batch_size']):
+            calendar_for(student_id, day).mark(day)
+        
+        activity_rows = activities.values_list('student_id', 'date', 'quizzes_completed')
+        for student_id, day, quizzes in activity_rows.iterator(chunk_size=options['batch_size']):
+            calendar_for(student_id, day).mark(day, quizzes)
+        
+        with transaction.atomic():
+            existing = ActivityYear.objects.all()
+            if options['student']:
+                existing = existing.filter(student_id=options['student'])
+            existing.delete()
+            ActivityYear.objects.bulk_create(calendars.values(), batch_size=options['batch_size'])
+        
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(calendars)} activity calendars'))
@@ -0,0 +1,120 @@
+import io
+import random
+import time
+from datetime import timedelta
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from ai_quiz.models import LectureSlide, AdaptiveQuiz, StudentAdaptiveProgress, AdaptiveQuizAttempt
+from analytics.services import AttemptExportService, ColumnarExportService
+from courses.models import Course, Topic
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare size, export time and pandas read time of a course export as CSV, '
+        'Parquet and Feather (synthetic data, rolled back afterwards)'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=500)
+        parser.add_argument('--attempts', type=int, default=200000)
+        parser.add_argument('--seed', type=int, default=42)
+    
+    def handle(self, *args, **options):
+        if not ColumnarExportService.is_available():
+            raise CommandError('Parquet/Feather exports need pyarrow installed')
+        
+        with transaction.atomic():
+            course = self._generate(options)
+            
+            results = []
+            csv_bytes, export_seconds = self._time(lambda: self._csv(course))
+            read_seconds = self._time(lambda: pd.read_csv(
+                io.BytesIO(csv_bytes), parse_dates=['completed_at']
+            ))[1]
+            results.append(('csv', len(csv_bytes), export_seconds, read_seconds))
+            
+            for format_type, reader in (('parquet', pd.read_parquet), ('feather', pd.read_feather)):
+                data, export_seconds = self._time(lambda: self._columnar(course, format_type))
+                read_seconds = self._time(lambda: reader(io.BytesIO(data)))[1]
+                results.append((format_type, len(data), export_seconds, read_seconds))
+            
+            self.stdout.write(f"{'format':<8} {'size (KiB)':>12} {'export (ms)':>12} {'read (ms)':>10}")
+            for format_type, size, export_seconds, read_seconds in results:
+                self.stdout.write(
+                    f'{format_type:<8} {size / 1024:>12.1f} {export_seconds * 1000:>12.1f} {read_seconds * 1000:>10.1f}'
+                )
+            
+            # Leave the database as it was
+            transaction.set_rollback(True)
+    
+    def _time(self, func):
+        started = time.perf_counter()
+        result = func()
+        return result, time.perf_counter() - started
+    
+    def _csv(self, course):
+        response = AttemptExportService.csv_response(
+            'bench.csv', AttemptExportService.COURSE_COLUMNS, AttemptExportService.course_rows(course)
+        )
+        return b''.join(response.streaming_content)
+    
+    def _columnar(self, course, format_type):
+        output = io.BytesIO()
+        ColumnarExportService.write(
+            ColumnarExportService.course_frames(course), ColumnarExportService.COURSE_TYPES, format_type, output
+        )
+        return output.getvalue()
+    
+    def _generate(self, options):
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        
+        lecturer = User.objects.create(
+            username='export_bench_lecturer', email='export_bench_lecturer@example.com', user_type='lecturer'
+        )
+        students = User.objects.bulk_create([
+            User(username=f'export_bench_{i}', email=f'export_bench_{i}@example.com', user_type='student',
+                 first_name='Student', last_name=f'Number {i}', student_number=f'EXPB{i:06d}')
+            for i in range(options['students'])
+        ])
+        course = Course.objects.create(name='Export bench', code='EXPBENCH', description='', lecturer=lecturer)
+        quizzes = []
+        for t in range(5):
+            topic = Topic.objects.create(course=course, name=f'Bench topic {t}')
+            slide = LectureSlide.objects.create(topic=topic, title=f'Bench slide {t}', uploaded_by=lecturer)
+            for difficulty in ('easy', 'medium', 'hard'):
+                quiz = AdaptiveQuiz(lecture_slide=slide, difficulty=difficulty, questions_data={'questions': []})
+                quizzes.append(quiz)
+        AdaptiveQuiz.objects.bulk_create(quizzes)
+        
+        progress_rows = StudentAdaptiveProgress.objects.bulk_create([
+            StudentAdaptiveProgress(student=student, adaptive_quiz=quiz)
+            for student in students for quiz in rng.sample(quizzes, 4)
+        ])
+        quiz_lookup = {quiz.id: quiz for quiz in quizzes}
+        
+        attempts = []
+        for _ in range(options['attempts']):
+            progress = rng.choice(progress_rows)
+            quiz = quiz_lookup[progress.adaptive_quiz_id]
+            started_at = now - timedelta(seconds=rng.randint(0, 120 * 86400))
+            attempts.append(AdaptiveQuizAttempt(
+                progress=progress,
+                student_id=progress.student_id,
+                adaptive_quiz_id=quiz.id,
+                course_id=course.id,
+                difficulty=quiz.difficulty,
+                score_percentage=round(rng.uniform(0, 100), 2),
+                started_at=started_at,
+                completed_at=started_at + timedelta(seconds=rng.randint(60, 1800))
+            ))
+        AdaptiveQuizAttempt.objects.bulk_create(attempts, batch_size=5000)
+        
+        self.stdout.write(f"{options['attempts']} attempts, {options['students']} students")
+        return course
@@ -0,0 +1,65 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+from ai_quiz.models import AdaptiveQuizAttempt
+from analytics.models import CourseDailyRollup, CourseDailyStudent
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-course daily attempt rollups from the attempts table'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, help='Only rebuild the rollups of this course')
+        parser.add_argument('--since', help='Only rebuild days from this date on (YYYY-MM-DD)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+    
+    def handle(self, *args, **options):
+        attempts = AdaptiveQuizAttempt.objects.filter(course__isnull=False).annotate(day=TruncDate('started_at'))
+        rollups = CourseDailyRollup.objects.all()
+        daily_students = CourseDailyStudent.objects.all()
+        if options['course']:
+            attempts = attempts.filter(course_id=options['course'])
+            rollups = rollups.filter(course_id=options['course'])
+            daily_students = daily_students.filter(course_id=options['course'])
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format')
+            attempts = attempts.filter(day__gte=since)
+            rollups = rollups.filter(date__gte=since)
+            daily_students = daily_students.filter(date__gte=since)
+        
+        per_difficulty = {}
+        for difficulty in CourseDailyRollup.DIFFICULTIES:
+            per_difficulty[f'{difficulty}_attempts'] = Count('id', filter=Q(difficulty=difficulty))
+            per_difficulty[f'{difficulty}_score_sum'] = Sum('score_percentage', filter=Q(difficulty=difficulty), default=0.0)
+        
+        rows = attempts.values('course_id', 'day').annotate(
+            attempts=Count('id'),
+            active_students=Count('student', distinct=True),
+            score_sum=Sum('score_percentage', default=0.0),
+            score_count=Count('score_percentage'),
+            **per_difficulty
+        ).order_by()
+        new_rollups = [
+            CourseDailyRollup(date=row.pop('day'), **row)
+            for row in rows
+        ]
+        new_students = [
+            CourseDailyStudent(course_id=course_id, date=day, student_id=student_id)
+            for course_id, day, student_id in attempts.values_list('course_id', 'day', 'student_id').distinct().order_by()
+            if student_id is not None
+        ]
+        
+        with transaction.atomic():
+            rollups.delete()
+            daily_students.delete()
+            CourseDailyRollup.objects.bulk_create(new_rollups, batch_size=options['batch_size'])
+            CourseDailyStudent.objects.bulk_create(new_students, batch_size=options['batch_size'])
+        
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(new_rollups)} course rollup days'))
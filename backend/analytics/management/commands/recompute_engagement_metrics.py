@@ -0,0 +1,53 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from analytics.services import MetricsRecomputeService
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute student engagement metrics with grouped queries per course, '
+        'directly or by working off the jobs queued through the update-metrics endpoint'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', help='Only this course (repeatable)')
+        parser.add_argument(
+            '--workers', type=int, default=settings.METRICS_RECOMPUTE_WORKERS,
+            help='Shard courses over this many processes'
+        )
+        parser.add_argument('--jobs', action='store_true', help='Run queued recompute jobs instead')
+        parser.add_argument('--loop', action='store_true', help='With --jobs, keep polling for new jobs')
+    
+    def handle(self, *args, **options):
+        if not options['jobs']:
+            course_ids = options['course'] or list(
+                Course.objects.filter(is_active=True).values_list('id', flat=True)
+            )
+            started = time.perf_counter()
+            updated = MetricsRecomputeService.recompute(course_ids, workers=options['workers'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Recomputed {updated} metrics rows in {len(course_ids)} courses '
+                f'in {time.perf_counter() - started:.2f}s'
+            ))
+            return
+        
+        while True:
+            while True:
+                job = MetricsRecomputeService.claim_next()
+                if job is None:
+                    break
+                job = MetricsRecomputeService.run(job, workers=options['workers'])
+                if job.status == 'completed':
+                    self.stdout.write(
+                        f'Recompute job {job.id}: {job.metrics_updated} rows in {job.courses_processed} courses'
+                    )
+                else:
+                    self.stdout.write(self.style.ERROR(f'Recompute job {job.id} failed: {job.error}'))
+            
+            if not options['loop']:
+                break
+            time.sleep(settings.METRICS_RECOMPUTE_POLL_SECONDS)
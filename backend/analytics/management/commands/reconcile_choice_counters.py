@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from ai_quiz.models import AdaptiveQuizVersion
+from analytics.models import QuestionChoiceCounter
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-question choice counters of quiz versions from the attempts table'
+    
+    FIELDS = ('question_number', 'attempts', 'correct', 'unanswered', *QuestionChoiceCounter.CHOICE_COLUMNS)
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--quiz', type=int, help='Only reconcile the versions of this adaptive quiz')
+        parser.add_argument('--quiz-version', type=int, help='Only reconcile this quiz version (id)')
+    
+    def handle(self, *args, **options):
+        # Versions with attempts, or with counters left over from deleted attempts
+        versions = AdaptiveQuizVersion.objects.filter(
+            Q(attempts__isnull=False) | Q(choice_counters__isnull=False)
+        ).distinct().order_by('id')
+        if options['quiz']:
+            versions = versions.filter(adaptive_quiz_id=options['quiz'])
+        if options['quiz_version']:
+            versions = versions.filter(id=options['quiz_version'])
+        
+        reconciled = drifted = 0
+        for quiz_version in versions.iterator():
+            before = self._snapshot(QuestionChoiceCounter.objects.filter(quiz_version=quiz_version))
+            after = self._snapshot(QuestionChoiceCounter.rebuild(quiz_version))
+            reconciled += 1
+            if before != after:
+                drifted += 1
+                self.stdout.write(self.style.WARNING(f'{quiz_version}: counters corrected'))
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Reconciled {reconciled} quiz versions ({drifted} had drifted)'
+        ))
+    
+    def _snapshot(self, counters):
+        return [tuple(getattr(counter, field) for field in self.FIELDS) for counter in counters]
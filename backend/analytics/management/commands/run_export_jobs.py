@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from analytics.services import ExportJobService
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued analytics export jobs and delete expired artifacts '
+        '(once, or continuously with --loop; several workers can run side by side)'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling every EXPORT_JOB_POLL_SECONDS')
+        parser.add_argument('--max-jobs', type=int, default=0, help='Stop after this many jobs (0 = no limit)')
+    
+    def handle(self, *args, **options):
+        processed = 0
+        while True:
+            expired = ExportJobService.cleanup_expired()
+            if expired:
+                self.stdout.write(f'Expired {expired} export jobs')
+            
+            while not options['max_jobs'] or processed < options['max_jobs']:
+                job = ExportJobService.claim_next()
+                if job is None:
+                    break
+                
+                job = ExportJobService.run(job)
+                processed += 1
+                if job.status == 'completed':
+                    self.stdout.write(
+                        f'Export job {job.id}: {job.rows_written} rows, {job.file_size} bytes, sha256 {job.checksum}'
+                    )
+                else:
+                    self.stdout.write(self.style.ERROR(f'Export job {job.id} failed: {job.error}'))
+            
+            if not options['loop'] or (options['max_jobs'] and processed >= options['max_jobs']):
+                break
+            time.sleep(settings.EXPORT_JOB_POLL_SECONDS)
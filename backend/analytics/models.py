@@ -1,13 +1,16 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
-from datetime import timedelta
+from datetime import date as date_cls, timedelta
+from array import array
+import calendar
+import sys
 from users.models import User
 from courses.models import Course
 
 
 class StudentEngagementMetrics(models.Model):
-    """Track student engagement and performance metrics"""
-    student = models.OneToOneField(
+    """Track student engagement and performance metrics (one row per student and course)"""
+    student = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         limit_choices_to={'user_type': 'student'},
@@ -46,67 +49,12 @@ class StudentEngagementMetrics(models.Model):
         ordering = ['-average_quiz_score']
     
     def calculate_ai_quiz_metrics(self):
-        """Calculate and update metrics based on AI quiz attempts"""
-        from ai_quiz.models import AdaptiveQuizAttempt
-    
-        # Get all AI quiz attempts for this student in this course
-        ai_attempts = AdaptiveQuizAttempt.objects.filter(
-            progress__student=self.student,
-            progress__adaptive_quiz__lecture_slide__topic__course=self.course
-        )
-    
-        if ai_attempts.exists():
-            self.total_quizzes_taken = ai_attempts.count()
-            self.total_quiz_score = sum(attempt.score_percentage for attempt in ai_attempts)
-            self.average_quiz_score = self.total_quiz_score / self.total_quizzes_taken
-        
-            # Update performance category based on AI quiz scores
-            if self.average_quiz_score < 50:
-                self.performance_category = 'danger'
-            elif self.average_quiz_score < 70:
-                self.performance_category = 'good'
-            else:
-                self.performance_category = 'excellent'
-        
-            # Update last quiz date
-            latest_attempt = ai_attempts.order_by('-started_at').first()
-            if latest_attempt:
-                self.last_quiz_date = latest_attempt.started_at.date()
-    
-        # Calculate consecutive missed AI quizzes
-        self.calculate_consecutive_ai_quiz_misses()
-    
-        self.save()
-
-    def calculate_consecutive_ai_quiz_misses(self):
-        """Calculate consecutive missed AI quiz opportunities"""
-        from ai_quiz.models import AdaptiveQuiz, AdaptiveQuizAttempt
-    
-        # Get all available AI quizzes for this course (only easy level for attendance)
-        available_quizzes = AdaptiveQuiz.objects.filter(
-            lecture_slide__topic__course=self.course,
-            difficulty='easy',
-            status='published',  # FIXED: Only check published quizzes
-            is_active=True
-        ).order_by('-created_at')[:10]  # Check last 10 available quizzes
-    
-        consecutive_misses = 0
-        for quiz in available_quizzes:
-            attempt_exists = AdaptiveQuizAttempt.objects.filter(
-                progress__student=self.student,
-                progress__adaptive_quiz=quiz
-            ).exists()
-        
-            if not attempt_exists:
-                consecutive_misses += 1
-            else:
-                break  # Stop counting when we find an attempt
-    
-        self.consecutive_missed_quizzes = consecutive_misses
-    
-        # Trigger intervention email if needed (3+ missed AI quizzes)
-        if consecutive_misses >= 3 and not self.intervention_email_sent:
-            self.send_intervention_email()
+        """Recompute this row from the AI quiz attempts (see MetricsRecomputeService)"""
+        from .services import MetricsRecomputeService
+        
+        MetricsRecomputeService.recompute_course(self.course_id, [self.student_id])
+        self.pk = type(self).objects.get(student_id=self.student_id, course_id=self.course_id).pk
+        self.refresh_from_db()
     
     def send_intervention_email(self):
         """Send intervention email to student"""
@@ -187,4 +135,447 @@ class DailyEngagement(models.Model):
         return engagement
     
     def __str__(self):
-        return f"{self.student.get_full_name()} - {self.date} ({'engaged' if self.engaged else 'not engaged'})"
\ No newline at end of file
+        return f"{self.student.get_full_name()} - {self.date} ({'engaged' if self.engaged else 'not engaged'})"
+
+
+class ActivityYear(models.Model):
+    """
+    Compact per-student activity calendar for one year
+    
+    Each day of the year is one bit in ``bitmap`` (366 bits) and has a
+    little-endian uint16 slot in ``counters`` holding the quizzes completed
+    that day, so a whole year of heatmap/streak data is a single row.
+    """
+    DAYS_IN_YEAR = 366
+    BITMAP_BYTES = (DAYS_IN_YEAR + 7) // 8
+    COUNTER_BYTES = DAYS_IN_YEAR * 2
+    MAX_COUNTER = 0xFFFF
+    
+    student = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        limit_choices_to={'user_type': 'student'},
+        related_name='activity_years'
+    )
+    year = models.PositiveSmallIntegerField()
+    bitmap = models.BinaryField(default=bytes(BITMAP_BYTES))
+    counters = models.BinaryField(default=bytes(COUNTER_BYTES))
+    active_days = models.PositiveSmallIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ('student', 'year')
+        ordering = ['-year']
+    
+    @staticmethod
+    def day_index(day):
+        """Zero-based day of year (Jan 1 -> 0, Dec 31 of a leap year -> 365)"""
+        return day.timetuple().tm_yday - 1
+    
+    def _bitmap(self):
+        return bytearray(self.bitmap or bytes(self.BITMAP_BYTES))
+    
+    def get_counts(self):
+        """Per-day quiz counters as an array of 366 unsigned shorts"""
+        counts = array('H')
+        counts.frombytes(bytes(self.counters or bytes(self.COUNTER_BYTES)))
+        if sys.byteorder == 'big':
+            counts.byteswap()
+        return counts
+    
+    def _set_counts(self, counts):
+        if sys.byteorder == 'big':
+            counts = array('H', counts)
+            counts.byteswap()
+        self.counters = counts.tobytes()
+    
+    def is_active(self, day):
+        index = self.day_index(day)
+        return bool(self._bitmap()[index >> 3] & (1 << (index & 7)))
+    
+    def get_active_indexes(self):
+        """Set of active zero-based day indexes in this year"""
+        bitmap = self._bitmap()
+        return {
+            byte_index * 8 + bit
+            for byte_index, byte in enumerate(bitmap) if byte
+            for bit in range(8) if byte & (1 << bit)
+        }
+    
+    def mark(self, day, quizzes=0):
+        """Set the day's bit and add ``quizzes`` to its counter (in memory)"""
+        index = self.day_index(day)
+        bitmap = self._bitmap()
+        if not bitmap[index >> 3] & (1 << (index & 7)):
+            bitmap[index >> 3] |= 1 << (index & 7)
+            self.active_days += 1
+        self.bitmap = bytes(bitmap)
+        
+        if quizzes:
+            counts = self.get_counts()
+            counts[index] = min(counts[index] + quizzes, self.MAX_COUNTER)
+            self._set_counts(counts)
+    
+    @classmethod
+    def record_activity(cls, student, day=None, quizzes=0):
+        """Mark a student active on ``day``, optionally counting completed quizzes"""
+        if day is None:
+            day = timezone.now().date()
+        
+        with transaction.atomic():
+            activity_year, created = cls.objects.select_for_update().get_or_create(
+                student=student,
+                year=day.year
+            )
+            activity_year.mark(day, quizzes)
+            activity_year.save(update_fields=['bitmap', 'counters', 'active_days', 'updated_at'])
+        
+        return activity_year
+    
+    @classmethod
+    def calculate_streaks(cls, student, today=None, activity_years=None):
+        """
+        Current and longest daily streak from the activity bitmaps
+        
+        Reads all of the student's yearly rows in one query (or uses the
+        preloaded ``activity_years``) so streaks running across New Year and
+        longest streaks from earlier years are counted.
+        """
+        if today is None:
+            today = timezone.now().date()
+        if activity_years is None:
+            activity_years = cls.objects.filter(student=student)
+        
+        active_dates = set()
+        for activity_year in activity_years:
+            start = date_cls(activity_year.year, 1, 1)
+            active_dates.update(start + timedelta(days=index) for index in activity_year.get_active_indexes())
+        
+        # A streak is still current if the student was active today or yesterday
+        current_streak = 0
+        day = today if today in active_dates else today - timedelta(days=1)
+        while day in active_dates:
+            current_streak += 1
+            day -= timedelta(days=1)
+        
+        longest_streak = 0
+        for day in active_dates:
+            if day - timedelta(days=1) in active_dates:
+                continue
+            length = 1
+            while day + timedelta(days=length) in active_dates:
+                length += 1
+            longest_streak = max(longest_streak, length)
+        
+        return {'current_streak': current_streak, 'longest_streak': longest_streak}
+    
+    def get_month_data(self, month):
+        """Heatmap cells for one month of this year"""
+        counts = self.get_counts()
+        active = self.get_active_indexes()
+        
+        month_data = []
+        # Stepping past the month would overflow after December 9999
+        for day_number in range(1, calendar.monthrange(self.year, month)[1] + 1):
+            day = date_cls(self.year, month, day_number)
+            index = self.day_index(day)
+            month_data.append({
+                'date': day.isoformat(),
+                'engaged': index in active,
+                'quizzes_completed': counts[index]
+            })
+        
+        return month_data
+    
+    def __str__(self):
+        return f"{self.student.get_full_name()} - {self.year} ({self.active_days} active days)"
+
+
+class CourseDailyRollup(models.Model):
+    """
+    Per-course, per-day totals of adaptive quiz attempts
+    
+    Maintained incrementally as attempts are submitted (record_attempts) and
+    rebuildable from the attempts table with rebuild_course_rollups, so trend
+    endpoints read one row per course and day instead of scanning attempts.
+    Days are the local date of started_at.
+    """
+    DIFFICULTIES = ('easy', 'medium', 'hard')
+    
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='daily_rollups')
+    date = models.DateField()
+    attempts = models.PositiveIntegerField(default=0)
+    active_students = models.PositiveIntegerField(default=0)
+    score_sum = models.FloatField(default=0)
+    score_count = models.PositiveIntegerField(default=0)
+    easy_attempts = models.PositiveIntegerField(default=0)
+    easy_score_sum = models.FloatField(default=0)
+    medium_attempts = models.PositiveIntegerField(default=0)
+    medium_score_sum = models.FloatField(default=0)
+    hard_attempts = models.PositiveIntegerField(default=0)
+    hard_score_sum = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ('course', 'date')
+        ordering = ['-date']
+    
+    @property
+    def average_score(self):
+        return self.score_sum / self.score_count if self.score_count else None
+    
+    @classmethod
+    def record_attempts(cls, attempts):
+        """Add submitted attempts to their course/day rollups"""
+        totals = {}
+        students = {}
+        for attempt in attempts:
+            key = (attempt.course_id, timezone.localdate(attempt.started_at))
+            row = totals.setdefault(key, {'attempts': 0, 'score_sum': 0.0})
+            row['attempts'] += 1
+            row['score_sum'] += attempt.score_percentage
+            if attempt.difficulty in cls.DIFFICULTIES:
+                row[f'{attempt.difficulty}_attempts'] = row.get(f'{attempt.difficulty}_attempts', 0) + 1
+                row[f'{attempt.difficulty}_score_sum'] = (
+                    row.get(f'{attempt.difficulty}_score_sum', 0.0) + attempt.score_percentage
+                )
+            students.setdefault(key, set()).add(attempt.student_id)
+        
+        for (course_id, day), row in totals.items():
+            # Only students not yet seen in this course today raise the distinct count
+            new_students = 0
+            for student_id in students[(course_id, day)]:
+                _, created = CourseDailyStudent.objects.get_or_create(
+                    course_id=course_id, date=day, student_id=student_id
+                )
+                new_students += created
+            
+            rollup, _ = cls.objects.get_or_create(course_id=course_id, date=day)
+            updates = {field: models.F(field) + value for field, value in row.items()}
+            cls.objects.filter(pk=rollup.pk).update(
+                score_count=models.F('score_count') + row['attempts'],
+                active_students=models.F('active_students') + new_students,
+                updated_at=timezone.now(),
+                **updates
+            )
+    
+    def __str__(self):
+        return f"{self.course.code} - {self.date} ({self.attempts} attempts)"
+
+
+class CourseDailyStudent(models.Model):
+    """Students active in a course on a day (backs CourseDailyRollup.active_students)"""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='daily_students')
+    date = models.DateField()
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    
+    class Meta:
+        unique_together = ('course', 'date', 'student')
+
+
+class QuestionChoiceCounter(models.Model):
+    """
+    Per-question answer tallies of one quiz version
+    
+    Incremented in the same transaction that records attempts (record_attempts),
+    so the statistics endpoint reads one row per question instead of scanning
+    attempts. reconcile_choice_counters rebuilds them from the attempts table.
+    """
+    CHOICE_COLUMNS = ('choice_a', 'choice_b', 'choice_c', 'choice_d')
+    
+    quiz_version = models.ForeignKey(
+        'ai_quiz.AdaptiveQuizVersion',
+        on_delete=models.CASCADE,
+        related_name='choice_counters'
+    )
+    question_number = models.PositiveIntegerField()
+    attempts = models.PositiveIntegerField(default=0)
+    choice_a = models.PositiveIntegerField(default=0)
+    choice_b = models.PositiveIntegerField(default=0)
+    choice_c = models.PositiveIntegerField(default=0)
+    choice_d = models.PositiveIntegerField(default=0)
+    unanswered = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ('quiz_version', 'question_number')
+        ordering = ['quiz_version', 'question_number']
+    
+    @classmethod
+    def tally(cls, matrix, answer_key):
+        """Per-question counts {column: array} of an (attempts x questions) answer matrix"""
+        import numpy as np
+        from analytics.services import QuizStatisticsService
+        
+        choices = QuizStatisticsService.choice_counts(matrix)
+        key = np.frombuffer(answer_key.encode('ascii'), dtype=np.uint8)
+        counts = {column: choices[:, i] for i, column in enumerate(cls.CHOICE_COLUMNS)}
+        counts['unanswered'] = len(matrix) - choices.sum(axis=1)
+        counts['correct'] = (matrix == key).sum(axis=0)
+        return counts
+    
+    @classmethod
+    def record_attempts(cls, attempts):
+        """Add encoded attempts to their version's counters, one UPDATE per version"""
+        from ai_quiz.services import QuizGradingService
+        
+        by_version = {}
+        for attempt in attempts:
+            if attempt.quiz_version_id is not None and attempt.answers_encoded is not None:
+                by_version.setdefault(attempt.quiz_version_id, (attempt.quiz_version, []))[1].append(
+                    attempt.answers_encoded
+                )
+        
+        for quiz_version, encoded in by_version.values():
+            answer_key = quiz_version.answer_key
+            counts = cls.tally(QuizGradingService.answers_matrix(encoded, len(answer_key)), answer_key)
+            
+            updates = {}
+            for column, increments in counts.items():
+                whens = [
+                    models.When(question_number=i, then=int(increment))
+                    for i, increment in enumerate(increments) if increment
+                ]
+                if whens:
+                    updates[column] = models.F(column) + models.Case(
+                        *whens, default=0, output_field=models.PositiveIntegerField()
+                    )
+            
+            rows = cls.objects.filter(quiz_version_id=quiz_version.id)
+            changes = dict(attempts=models.F('attempts') + len(encoded), updated_at=timezone.now(), **updates)
+            if not rows.update(**changes):
+                # First counters of this version, which may already have (archived) attempts:
+                # seed them from the attempts table, these attempts included
+                try:
+                    cls.rebuild(quiz_version)
+                except IntegrityError:
+                    # A concurrent submission seeded them first, without our attempts
+                    rows.update(**changes)
+    
+    @classmethod
+    def rebuild(cls, quiz_version):
+        """Recount a version from its attempts in place; returns its rows"""
+        from ai_quiz.models import AdaptiveQuizAttempt
+        from analytics.services import QuizStatisticsService
+        
+        answer_key = quiz_version.answer_key
+        with transaction.atomic():
+            # Submissions increment after inserting their attempt; holding the rows
+            # makes them wait and add on top of the recount instead of being lost
+            existing = {
+                counter.question_number: counter
+                for counter in cls.objects.select_for_update().filter(quiz_version=quiz_version)
+            }
+            _, matrix = QuizStatisticsService.load_quiz(
+                AdaptiveQuizAttempt.objects.filter(quiz_version=quiz_version), len(answer_key)
+            )
+            counts = cls.tally(matrix, answer_key)
+            
+            now = timezone.now()
+            rows = []
+            for i in range(len(answer_key) if len(matrix) else 0):
+                counter = existing.pop(i, None) or cls(quiz_version=quiz_version, question_number=i)
+                counter.attempts = len(matrix)
+                counter.updated_at = now
+                for column, values in counts.items():
+                    setattr(counter, column, int(values[i]))
+                rows.append(counter)
+            
+            fields = ['attempts', 'unanswered', 'correct', 'updated_at', *cls.CHOICE_COLUMNS]
+            cls.objects.bulk_update([row for row in rows if row.pk], fields)
+            cls.objects.bulk_create([row for row in rows if not row.pk])
+            cls.objects.filter(pk__in=[counter.pk for counter in existing.values()]).delete()
+        return rows
+    
+    def __str__(self):
+        return f"{self.quiz_version} Q{self.question_number} ({self.attempts} attempts)"
+
+
+class ExportJob(models.Model):
+    """
+    An analytics export produced in the background (run_export_jobs)
+    
+    The artifact is written compressed under MEDIA_ROOT/exports/ with its
+    SHA-256 checksum, and deleted once the job expires. Identical requests
+    from the same user within EXPORT_JOB_REUSE_SECONDS get the same job.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+        ('expired', 'Expired'),
+    ]
+    
+    requested_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='export_jobs')
+    export_type = models.CharField(max_length=20)
+    format_type = models.CharField(max_length=10)
+    params_hash = models.CharField(max_length=64, help_text='Fingerprint of user, type and format for reuse')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    rows_written = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to='exports/', blank=True)
+    file_size = models.PositiveBigIntegerField(null=True, blank=True)
+    checksum = models.CharField(max_length=64, blank=True, help_text='SHA-256 of the file')
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['requested_by', 'params_hash', 'created_at']),
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    @property
+    def progress(self):
+        """Percentage of rows written (None until the total is known)"""
+        if self.status == 'completed':
+            return 100
+        if not self.total_rows:
+            return None if self.total_rows is None else 0
+        return min(100, round(self.rows_written * 100 / self.total_rows))
+    
+    def __str__(self):
+        return f"{self.export_type} export ({self.format_type}) for {self.requested_by} - {self.status}"
+
+
+class MetricsRecomputeJob(models.Model):
+    """
+    A queued recompute of StudentEngagementMetrics (recompute_engagement_metrics --jobs)
+    
+    ``course_ids`` is the list of courses to recompute, or null for every
+    active course.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    requested_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='metrics_recompute_jobs'
+    )
+    course_ids = models.JSONField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    courses_processed = models.PositiveIntegerField(default=0)
+    metrics_updated = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+    
+    def __str__(self):
+        scope = f"{len(self.course_ids)} courses" if self.course_ids is not None else 'all courses'
+        return f"Metrics recompute ({scope}) - {self.status}"
@@ -0,0 +1,34 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+
+class ExportFormatRenderer(BaseRenderer):
+    """
+    Lets ?format=<export format> through DRF content negotiation
+    
+    The export views build the file response themselves; only error
+    responses are rendered here, as JSON.
+    """
+    charset = 'utf-8'
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, cls=DjangoJSONEncoder).encode(self.charset)
+
+
+class CSVRenderer(ExportFormatRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class ParquetRenderer(ExportFormatRenderer):
+    media_type = 'application/vnd.apache.parquet'
+    format = 'parquet'
+
+
+class FeatherRenderer(ExportFormatRenderer):
+    media_type = 'application/vnd.apache.arrow.file'
+    format = 'feather'
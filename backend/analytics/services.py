@@ -0,0 +1,874 @@
+import csv
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Avg, Count, DateField, Max, Q, Sum
+from django.db.models.functions import Trunc
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+
+class TimeBucketService:
+    """Bucketed time series (per day/week/month) computed in one GROUP BY query"""
+    
+    BUCKETS = ('day', 'week', 'month')
+    
+    @staticmethod
+    def bucket_start(day, bucket):
+        """First day of the bucket containing ``day`` (weeks start on Monday)"""
+        if bucket == 'week':
+            return day - timedelta(days=day.weekday())
+        if bucket == 'month':
+            return day.replace(day=1)
+        return day
+    
+    @classmethod
+    def bucket_dates(cls, start, end, bucket):
+        """Every bucket start from the bucket of ``start`` through the bucket of ``end``"""
+        current = cls.bucket_start(start, bucket)
+        while current <= end:
+            yield current
+            if bucket == 'day':
+                current += timedelta(days=1)
+            elif bucket == 'week':
+                current += timedelta(weeks=1)
+            else:
+                current = (current + timedelta(days=32)).replace(day=1)
+    
+    @classmethod
+    def series(cls, queryset, date_field, start, end, bucket='day', group_by=None, filters=None, **aggregates):
+        """
+        Aggregate ``queryset`` per time bucket between ``start`` and ``end`` (inclusive dates)
+        
+        ``aggregates`` are named Count/Sum/Avg/... expressions (``distinct`` works as
+        usual), ``filters`` any extra lookups (course, topic, quiz, difficulty...).
+        Buckets without rows are filled in: Count and Sum with 0, anything else
+        with None. The first and last buckets only cover the days inside the range.
+        
+        Returns a list of ``{'bucket': date, <aggregate>: value}`` or, with
+        ``group_by``, a dict of such lists keyed by the group value.
+        """
+        if bucket not in cls.BUCKETS:
+            raise ValueError(f'bucket must be one of {", ".join(cls.BUCKETS)}')
+        if isinstance(start, datetime):
+            start = timezone.localdate(start)
+        if isinstance(end, datetime):
+            end = timezone.localdate(end)
+        
+        if queryset.model._meta.get_field(date_field).get_internal_type() == 'DateField':
+            range_filter = {f'{date_field}__gte': start, f'{date_field}__lte': end}
+        else:
+            range_filter = {f'{date_field}__date__gte': start, f'{date_field}__date__lte': end}
+        
+        queryset = queryset.filter(**range_filter, **(filters or {}))
+        group_fields = [group_by] if group_by else []
+        rows = queryset.annotate(
+            bucket=Trunc(date_field, bucket, output_field=DateField())
+        ).values('bucket', *group_fields).annotate(**aggregates).order_by()
+        
+        found = {}
+        for row in rows:
+            found.setdefault(row[group_by] if group_by else None, {})[row['bucket']] = row
+        
+        empty = {
+            name: 0 if isinstance(expression, (Count, Sum)) else None
+            for name, expression in aggregates.items()
+        }
+        buckets = list(cls.bucket_dates(start, end, bucket))
+        
+        def fill(rows_by_bucket):
+            filled = []
+            for bucket_date in buckets:
+                row = rows_by_bucket.get(bucket_date)
+                values = {name: row[name] if row else value for name, value in empty.items()}
+                # Sum over no rows is NULL; the series reports 0 like an empty bucket
+                for name, value in values.items():
+                    if value is None and empty[name] == 0:
+                        values[name] = 0
+                filled.append({'bucket': bucket_date, **values})
+            return filled
+        
+        if group_by:
+            return {group: fill(rows_by_bucket) for group, rows_by_bucket in found.items()}
+        return fill(found.get(None, {}))
+
+
+class QuizStatisticsService:
+    """
+    Vectorized attempt statistics
+    
+    Scores (and, for single-quiz reports, encoded answers) are read in one
+    values_list() query into NumPy arrays; bands, percentiles, histograms,
+    per-group summaries and choice distributions are then array operations
+    instead of Python loops over attempts.
+    """
+    
+    CHOICES = ('A', 'B', 'C', 'D')
+    # Lower edges of average/good/excellent; anything below 40 is poor
+    BAND_EDGES = (40, 60, 80)
+    BAND_NAMES = ('poor', 'average', 'good', 'excellent')
+    PERCENTILES = (10, 25, 50, 75, 90)
+    HISTOGRAM_BINS = 10
+    
+    @staticmethod
+    def load_scores(queryset):
+        """Score percentages of ``queryset`` as a float array"""
+        return np.fromiter(
+            queryset.order_by().values_list('score_percentage', flat=True), dtype=np.float64
+        )
+    
+    @classmethod
+    def load_quiz(cls, queryset, question_count):
+        """
+        Scores and a (attempts x questions) uint8 answer matrix in one query
+        
+        Legacy JSON answers and archived answers are encoded on the fly; an
+        archive file is read at most once.
+        """
+        from ai_quiz.models import AttemptAnswerArchive
+        from ai_quiz.services import QuizGradingService
+        
+        rows = list(queryset.order_by().values_list(
+            'id', 'score_percentage', 'answers_encoded', 'answers_data', 'answers_archive_id'
+        ))
+        archives = AttemptAnswerArchive.objects.in_bulk(
+            {row[4] for row in rows if row[4] is not None}
+        )
+        
+        scores = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+        encoded = []
+        for attempt_id, _, answers_encoded, answers_data, archive_id in rows:
+            if archive_id is not None:
+                answers_encoded = None
+                answers_data = archives[archive_id].get_answers(attempt_id)
+            if answers_encoded is None:
+                answers_encoded = QuizGradingService.encode_answers(
+                    answers_data if isinstance(answers_data, dict) else {}, question_count
+                )
+            encoded.append(answers_encoded)
+        return scores, QuizGradingService.answers_matrix(encoded, question_count)
+    
+    @classmethod
+    def choice_counts(cls, matrix):
+        """(questions x choices) selection counts for an answer matrix"""
+        codes = np.frombuffer(''.join(cls.CHOICES).encode('ascii'), dtype=np.uint8)
+        return (matrix[:, :, np.newaxis] == codes).sum(axis=0)
+    
+    @classmethod
+    def choice_distribution(cls, adaptive_quiz, attempts):
+        """
+        Per-question choice and correct counts of a quiz
+        
+        Read from the current version's QuestionChoiceCounter rows. A version
+        without counters yet (just edited, or attempts from before the
+        counters) is counted from its own attempts, so answers to older
+        versions never show up under the current questions. Only quizzes that
+        were never versioned count all of ``attempts``. Returns a dict with
+        ``questions``, ``selections`` (questions x choices), ``correct``,
+        ``attempts`` and ``quiz_version`` (None when unversioned).
+        """
+        from ai_quiz.services import QuizGradingService
+        from .models import QuestionChoiceCounter
+        
+        quiz_version = adaptive_quiz.current_version if adaptive_quiz.current_version_id else None
+        if quiz_version is not None:
+            counters = list(QuestionChoiceCounter.objects.filter(
+                quiz_version=quiz_version
+            ).order_by('question_number').values_list('attempts', 'correct', *QuestionChoiceCounter.CHOICE_COLUMNS))
+            if counters:
+                counts = np.array(counters, dtype=np.int64)
+                return {
+                    'questions': quiz_version.get_questions(),
+                    'selections': counts[:, 2:],
+                    'correct': counts[:, 1],
+                    'attempts': int(counts[0, 0]),
+                    'quiz_version': quiz_version.version_number,
+                }
+            
+            questions = quiz_version.get_questions()
+            answer_key = quiz_version.answer_key
+            attempts = attempts.filter(quiz_version=quiz_version)
+        else:
+            questions = adaptive_quiz.get_questions().get('questions', [])
+            answer_key = QuizGradingService.build_answer_key(questions)
+        
+        _, matrix = cls.load_quiz(attempts, len(questions))
+        return {
+            'questions': questions,
+            'selections': cls.choice_counts(matrix),
+            'correct': (matrix == np.frombuffer(answer_key.encode('ascii'), dtype=np.uint8)).sum(axis=0),
+            'attempts': len(matrix),
+            'quiz_version': quiz_version.version_number if quiz_version is not None else None,
+        }
+    
+    @classmethod
+    def summarize(cls, scores):
+        """Count, mean, median, spread, percentiles, bands and histogram of a score array"""
+        if not len(scores):
+            return {'count': 0}
+        
+        bands = np.bincount(np.digitize(scores, cls.BAND_EDGES), minlength=len(cls.BAND_NAMES))
+        counts, edges = np.histogram(
+            np.clip(scores, 0, 100), bins=cls.HISTOGRAM_BINS, range=(0, 100)
+        )
+        return {
+            'count': int(len(scores)),
+            'mean': float(scores.mean()),
+            'median': float(np.median(scores)),
+            'std': float(scores.std()),
+            'min': float(scores.min()),
+            'max': float(scores.max()),
+            'percentiles': {
+                f'p{p}': float(value)
+                for p, value in zip(cls.PERCENTILES, np.percentile(scores, cls.PERCENTILES))
+            },
+            'bands': dict(zip(cls.BAND_NAMES, bands.tolist())),
+            'histogram': [
+                {'min': float(low), 'max': float(high), 'count': int(count)}
+                for low, high, count in zip(edges[:-1], edges[1:], counts)
+            ],
+        }
+    
+    @staticmethod
+    def group_summary(queryset, group_field):
+        """
+        Per-group attempt count, mean/min/max score and unique students in one query
+        
+        Returns ``{group value: {'count', 'mean', 'min', 'max', 'unique_students'}}``
+        for the groups that have attempts.
+        """
+        rows = list(queryset.filter(**{f'{group_field}__isnull': False}).order_by().values_list(
+            group_field, 'score_percentage', 'student_id'
+        ))
+        if not rows:
+            return {}
+        
+        groups, scores, students = (np.asarray(column) for column in zip(*rows))
+        scores = scores.astype(np.float64)
+        keys, inverse = np.unique(groups, return_inverse=True)
+        
+        counts = np.bincount(inverse)
+        sums = np.bincount(inverse, weights=scores)
+        order = np.argsort(inverse, kind='stable')
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        minimums = np.minimum.reduceat(scores[order], starts)
+        maximums = np.maximum.reduceat(scores[order], starts)
+        pairs = np.unique(np.column_stack((inverse, students.astype(np.int64))), axis=0)
+        unique_students = np.bincount(pairs[:, 0], minlength=len(keys))
+        
+        return {
+            key.item(): {
+                'count': int(counts[i]),
+                'mean': float(sums[i] / counts[i]),
+                'min': float(minimums[i]),
+                'max': float(maximums[i]),
+                'unique_students': int(unique_students[i]),
+            }
+            for i, key in enumerate(keys)
+        }
+
+
+class _Echo:
+    """File-like object whose write() hands the line back instead of storing it"""
+    
+    def write(self, value):
+        return value
+
+
+class AttemptExportService:
+    """
+    Row generators for attempt exports
+    
+    Each export is a single values_list() projection over the joins it needs,
+    read with .iterator() so rows are fetched in chunks (server-side cursor on
+    PostgreSQL) and never all held in memory.
+    """
+    
+    COURSE_COLUMNS = ['student_name', 'student_number', 'topic_name', 'quiz_title', 'difficulty', 'score_percentage', 'completed_at']
+    QUIZ_COLUMNS = ['student_name', 'student_number', 'score_percentage', 'difficulty', 'started_at', 'completed_at', 'time_taken']
+    
+    COURSE_FIELDS = (
+        'student__first_name', 'student__last_name', 'student__student_number',
+        'adaptive_quiz__lecture_slide__topic__name', 'adaptive_quiz__lecture_slide__title',
+        'difficulty', 'score_percentage', 'completed_at'
+    )
+    QUIZ_FIELDS = (
+        'student__first_name', 'student__last_name', 'student__student_number',
+        'score_percentage', 'difficulty', 'started_at', 'completed_at'
+    )
+    
+    @staticmethod
+    def full_name(first_name, last_name):
+        """Same as User.get_full_name() without loading the user"""
+        return f"{first_name or ''} {last_name or ''}".strip()
+    
+    @classmethod
+    def course_values(cls, course):
+        from ai_quiz.models import AdaptiveQuizAttempt
+        return AdaptiveQuizAttempt.objects.filter(course=course).order_by('id').values_list(*cls.COURSE_FIELDS)
+    
+    @classmethod
+    def quiz_values(cls, adaptive_quiz):
+        from ai_quiz.models import AdaptiveQuizAttempt
+        return AdaptiveQuizAttempt.objects.filter(adaptive_quiz=adaptive_quiz).order_by('id').values_list(*cls.QUIZ_FIELDS)
+    
+    @classmethod
+    def course_rows(cls, course):
+        rows = cls.course_values(course).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+        for first_name, last_name, *rest in rows:
+            yield (cls.full_name(first_name, last_name), *rest)
+    
+    @classmethod
+    def quiz_rows(cls, adaptive_quiz):
+        rows = cls.quiz_values(adaptive_quiz).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+        for first_name, last_name, student_number, score, difficulty, started_at, completed_at in rows:
+            duration = completed_at - started_at if completed_at and started_at else None
+            yield (
+                cls.full_name(first_name, last_name), student_number, score, difficulty,
+                started_at, completed_at, str(duration) if duration else None
+            )
+    
+    @staticmethod
+    def course_summary(courses):
+        """One summary row (students, attempts, average score, quizzes) per course"""
+        from ai_quiz.models import AdaptiveQuiz, AdaptiveQuizAttempt
+        
+        data = []
+        for course in courses:
+            enrollments = course.enrollments.filter(is_active=True)
+            attempts = AdaptiveQuizAttempt.objects.filter(
+                course=course
+            )
+            
+            data.append({
+                'course_code': course.code,
+                'course_name': course.name,
+                'total_students': enrollments.count(),
+                'total_attempts': attempts.count(),
+                'average_score': attempts.aggregate(avg=Avg('score_percentage'))['avg'] or 0,
+                'active_ai_quizzes': AdaptiveQuiz.objects.filter(
+                    lecture_slide__topic__course=course, is_active=True
+                ).count()
+            })
+        return data
+    
+    @staticmethod
+    def csv_response(filename, columns, rows):
+        """Stream rows as CSV; the header goes out before the first query runs"""
+        writer = csv.writer(_Echo())
+        
+        def lines():
+            yield writer.writerow(columns)
+            for row in rows:
+                yield writer.writerow(row)
+        
+        response = StreamingHttpResponse(lines(), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class ColumnarExportService:
+    """
+    Parquet/Feather exports built with pandas and pyarrow
+    
+    Rows come from the same values_list() projections as the CSV exports and
+    are turned into typed DataFrames chunk by chunk, each chunk appended to the
+    output file, so memory stays bounded by EXPORT_CHUNK_SIZE. pyarrow is
+    imported lazily; without it these formats answer with an error.
+    """
+    
+    FORMATS = {
+        'parquet': 'application/vnd.apache.parquet',
+        'feather': 'application/vnd.apache.arrow.file',
+    }
+    
+    COURSE_TYPES = {
+        'student_name': 'string', 'student_number': 'string', 'topic_name': 'string',
+        'quiz_title': 'string', 'difficulty': 'string', 'score_percentage': 'float',
+        'completed_at': 'timestamp'
+    }
+    QUIZ_TYPES = {
+        'student_name': 'string', 'student_number': 'string', 'score_percentage': 'float',
+        'difficulty': 'string', 'started_at': 'timestamp', 'completed_at': 'timestamp',
+        'time_taken': 'duration'
+    }
+    SUMMARY_TYPES = {
+        'course_code': 'string', 'course_name': 'string', 'total_students': 'int',
+        'total_attempts': 'int', 'average_score': 'float', 'active_ai_quizzes': 'int'
+    }
+    
+    @staticmethod
+    def is_available():
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return False
+        return True
+    
+    @staticmethod
+    def schema(column_types):
+        import pyarrow as pa
+        
+        arrow_types = {
+            'string': pa.string(),
+            'float': pa.float64(),
+            'int': pa.int64(),
+            'timestamp': pa.timestamp('us', tz='UTC'),
+            'duration': pa.duration('us'),
+        }
+        return pa.schema([(name, arrow_types[kind]) for name, kind in column_types.items()])
+    
+    @staticmethod
+    def _chunks(values, chunk_size=None):
+        chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+        chunk = []
+        for row in values.iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    
+    @staticmethod
+    def _names(frame):
+        return (frame['student__first_name'].fillna('') + ' ' + frame['student__last_name'].fillna('')).str.strip()
+    
+    @classmethod
+    def course_frames(cls, course, chunk_size=None):
+        import pandas as pd
+        
+        for chunk in cls._chunks(AttemptExportService.course_values(course), chunk_size):
+            raw = pd.DataFrame.from_records(chunk, columns=AttemptExportService.COURSE_FIELDS)
+            yield pd.DataFrame({
+                'student_name': cls._names(raw),
+                'student_number': raw['student__student_number'],
+                'topic_name': raw['adaptive_quiz__lecture_slide__topic__name'],
+                'quiz_title': raw['adaptive_quiz__lecture_slide__title'],
+                'difficulty': raw['difficulty'],
+                'score_percentage': raw['score_percentage'].astype('float64'),
+                'completed_at': pd.to_datetime(raw['completed_at'], utc=True),
+            })
+    
+    @classmethod
+    def quiz_frames(cls, adaptive_quiz, chunk_size=None):
+        import pandas as pd
+        
+        for chunk in cls._chunks(AttemptExportService.quiz_values(adaptive_quiz), chunk_size):
+            raw = pd.DataFrame.from_records(chunk, columns=AttemptExportService.QUIZ_FIELDS)
+            started_at = pd.to_datetime(raw['started_at'], utc=True)
+            completed_at = pd.to_datetime(raw['completed_at'], utc=True)
+            yield pd.DataFrame({
+                'student_name': cls._names(raw),
+                'student_number': raw['student__student_number'],
+                'score_percentage': raw['score_percentage'].astype('float64'),
+                'difficulty': raw['difficulty'],
+                'started_at': started_at,
+                'completed_at': completed_at,
+                'time_taken': completed_at - started_at,
+            })
+    
+    @classmethod
+    def write(cls, frames, column_types, format_type, destination):
+        """Append every frame to ``destination`` (path or binary file) as one Parquet/Feather file"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        schema = cls.schema(column_types)
+        if format_type == 'parquet':
+            writer = pq.ParquetWriter(destination, schema, compression='snappy')
+        else:
+            # Feather v2 is the Arrow IPC file format
+            writer = pa.ipc.new_file(destination, schema, options=pa.ipc.IpcWriteOptions(compression='lz4'))
+        
+        with writer:
+            for frame in frames:
+                writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+    
+    @classmethod
+    def response(cls, filename_stem, frames, column_types, format_type):
+        """Write the export to a temporary file and send it as an attachment"""
+        output = tempfile.TemporaryFile()
+        cls.write(frames, column_types, format_type, output)
+        output.seek(0)
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename=f'{filename_stem}.{format_type}',
+            content_type=cls.FORMATS[format_type]
+        )
+
+
+class ExportJobService:
+    """Create, run and clean up background export jobs"""
+    
+    EXPORT_TYPES = ('course', 'attempts')
+    FORMATS = ('csv', 'parquet', 'feather')
+    
+    SUMMARY_COLUMNS = ['course_code', 'course_name', 'total_students', 'total_attempts', 'average_score', 'active_ai_quizzes']
+    ATTEMPT_COLUMNS = ['course_code'] + AttemptExportService.COURSE_COLUMNS
+    ATTEMPT_TYPES = {'course_code': 'string', **ColumnarExportService.COURSE_TYPES}
+    
+    @staticmethod
+    def params_hash(user, export_type, format_type):
+        payload = json.dumps([user.pk, export_type, format_type])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    @classmethod
+    def request_export(cls, user, export_type, format_type):
+        """Queue an export, or return the identical one requested recently; returns (job, created)"""
+        from .models import ExportJob
+        
+        params_hash = cls.params_hash(user, export_type, format_type)
+        recent = ExportJob.objects.filter(
+            requested_by=user,
+            params_hash=params_hash,
+            status__in=['pending', 'running', 'completed'],
+            created_at__gte=timezone.now() - timedelta(seconds=settings.EXPORT_JOB_REUSE_SECONDS)
+        ).order_by('-created_at').first()
+        if recent is not None:
+            return recent, False
+        
+        return ExportJob.objects.create(
+            requested_by=user,
+            export_type=export_type,
+            format_type=format_type,
+            params_hash=params_hash
+        ), True
+    
+    @staticmethod
+    def claim_next():
+        """Take the oldest pending job (or one whose worker went silent), skipping jobs other workers hold"""
+        from .models import ExportJob
+        
+        now = timezone.now()
+        with transaction.atomic():
+            job = ExportJob.objects.select_for_update(skip_locked=True).filter(
+                Q(status='pending') |
+                Q(status='running', updated_at__lt=now - timedelta(seconds=settings.EXPORT_JOB_STALE_SECONDS))
+            ).order_by('created_at').first()
+            if job is None:
+                return None
+            job.status = 'running'
+            job.started_at = now
+            job.rows_written = 0
+            job.save(update_fields=['status', 'started_at', 'rows_written', 'updated_at'])
+        return job
+    
+    @classmethod
+    def run(cls, job):
+        """Write the job's artifact; failures are recorded on the job instead of raised"""
+        from courses.models import Course
+        
+        courses = Course.objects.filter(lecturer=job.requested_by, is_active=True).order_by('code')
+        fd, path = tempfile.mkstemp(prefix='export_')
+        os.close(fd)
+        try:
+            cls._write(job, courses, path)
+            
+            digest = hashlib.sha256()
+            with open(path, 'rb') as artifact:
+                for block in iter(lambda: artifact.read(1024 * 1024), b''):
+                    digest.update(block)
+            
+            extension = 'csv.gz' if job.format_type == 'csv' else job.format_type
+            with open(path, 'rb') as artifact:
+                job.file.save(f'{job.export_type}_export_{job.id}.{extension}', File(artifact), save=False)
+            
+            now = timezone.now()
+            job.file_size = os.path.getsize(path)
+            job.checksum = digest.hexdigest()
+            job.status = 'completed'
+            job.finished_at = now
+            job.expires_at = now + timedelta(seconds=settings.EXPORT_JOB_TTL_SECONDS)
+            job.save()
+        except Exception as e:
+            now = timezone.now()
+            job.status = 'failed'
+            job.error = str(e)
+            job.finished_at = now
+            job.expires_at = now + timedelta(seconds=settings.EXPORT_JOB_TTL_SECONDS)
+            job.save(update_fields=['status', 'error', 'finished_at', 'expires_at', 'updated_at'])
+        finally:
+            os.remove(path)
+        return job
+    
+    @classmethod
+    def _write(cls, job, courses, path):
+        from ai_quiz.models import AdaptiveQuizAttempt
+        from .models import ExportJob
+        
+        if job.export_type == 'attempts':
+            total = AdaptiveQuizAttempt.objects.filter(course__in=courses).count()
+        else:
+            total = courses.count()
+        ExportJob.objects.filter(pk=job.pk).update(total_rows=total, updated_at=timezone.now())
+        job.total_rows = total
+        
+        written = 0
+        
+        def advance(rows):
+            # Progress also serves as the worker's heartbeat
+            nonlocal written
+            flush = written // settings.EXPORT_CHUNK_SIZE != (written + rows) // settings.EXPORT_CHUNK_SIZE
+            written += rows
+            if flush:
+                ExportJob.objects.filter(pk=job.pk).update(rows_written=written, updated_at=timezone.now())
+        
+        if job.format_type == 'csv':
+            columns, rows = cls._rows(job.export_type, courses)
+            with gzip.open(path, 'wt', newline='', encoding='utf-8') as output:
+                writer = csv.writer(output)
+                writer.writerow(columns)
+                for row in rows:
+                    writer.writerow(row)
+                    advance(1)
+        else:
+            column_types, frames = cls._frames(job.export_type, courses)
+            
+            def tracked():
+                for frame in frames:
+                    yield frame
+                    advance(len(frame))
+            
+            ColumnarExportService.write(tracked(), column_types, job.format_type, path)
+        
+        job.rows_written = written
+    
+    @classmethod
+    def _rows(cls, export_type, courses):
+        if export_type == 'course':
+            summary = AttemptExportService.course_summary(courses)
+            return cls.SUMMARY_COLUMNS, ([row[column] for column in cls.SUMMARY_COLUMNS] for row in summary)
+        
+        def rows():
+            for course in courses:
+                for row in AttemptExportService.course_rows(course):
+                    yield (course.code, *row)
+        return cls.ATTEMPT_COLUMNS, rows()
+    
+    @classmethod
+    def _frames(cls, export_type, courses):
+        import pandas as pd
+        
+        if export_type == 'course':
+            summary = AttemptExportService.course_summary(courses)
+            frame = pd.DataFrame(summary, columns=cls.SUMMARY_COLUMNS)
+            return ColumnarExportService.SUMMARY_TYPES, iter([frame])
+        
+        def frames():
+            for course in courses:
+                for frame in ColumnarExportService.course_frames(course):
+                    frame.insert(0, 'course_code', course.code)
+                    yield frame
+        return cls.ATTEMPT_TYPES, frames()
+    
+    @staticmethod
+    def cleanup_expired(now=None):
+        """Delete the artifacts of expired jobs; returns how many jobs expired"""
+        from .models import ExportJob
+        
+        now = now or timezone.now()
+        expired = 0
+        for job in ExportJob.objects.filter(expires_at__lte=now).exclude(status='expired'):
+            if job.file:
+                job.file.delete(save=False)
+            job.status = 'expired'
+            job.save(update_fields=['file', 'status', 'updated_at'])
+            expired += 1
+        return expired
+
+
+class MetricsRecomputeService:
+    """
+    Set-based recompute of StudentEngagementMetrics
+    
+    Each course costs a fixed handful of queries whatever its size: enrolled
+    students, one grouped aggregate over its attempts, the attempted quizzes
+    among the latest easy quizzes (for missed-quiz streaks), the existing
+    metrics rows, and one bulk_update/bulk_create.
+    """
+    
+    RECENT_QUIZZES = 10
+    UPDATE_FIELDS = [
+        'total_quizzes_taken', 'total_quiz_score', 'average_quiz_score', 'performance_category',
+        'last_quiz_date', 'consecutive_missed_quizzes', 'updated_at'
+    ]
+    
+    @staticmethod
+    def performance_category(average_score):
+        if average_score < 50:
+            return 'danger'
+        if average_score < 70:
+            return 'good'
+        return 'excellent'
+    
+    @classmethod
+    def recompute_course(cls, course_id, student_ids=None):
+        """
+        Recompute the metrics of one course; returns rows written
+        
+        Covers every actively enrolled student, or only ``student_ids`` (used
+        after a submission to refresh just the submitting student).
+        """
+        from ai_quiz.models import AdaptiveQuiz, AdaptiveQuizAttempt
+        from courses.models import CourseEnrollment
+        from .models import StudentEngagementMetrics
+        
+        if student_ids is None:
+            student_ids = CourseEnrollment.objects.filter(
+                course_id=course_id, is_active=True, student__user_type='student'
+            ).values_list('student_id', flat=True)
+        student_ids = set(student_ids)
+        if not student_ids:
+            return 0
+        
+        attempts = AdaptiveQuizAttempt.objects.filter(course_id=course_id, student_id__in=student_ids)
+        stats = {
+            row['student_id']: row
+            for row in attempts.values('student_id').annotate(
+                count=Count('id'), total=Sum('score_percentage'), latest=Max('started_at')
+            ).order_by()
+        }
+        
+        # Missed-quiz streaks look at the latest published easy quizzes
+        recent_quizzes = list(AdaptiveQuiz.objects.filter(
+            lecture_slide__topic__course_id=course_id,
+            difficulty='easy',
+            status='published',
+            is_active=True
+        ).order_by('-created_at').values_list('id', flat=True)[:cls.RECENT_QUIZZES])
+        attempted = set(attempts.filter(adaptive_quiz_id__in=recent_quizzes).values_list(
+            'student_id', 'adaptive_quiz_id'
+        ).distinct().order_by())
+        
+        existing = {
+            metrics.student_id: metrics
+            for metrics in StudentEngagementMetrics.objects.filter(course_id=course_id, student_id__in=student_ids)
+        }
+        
+        now = timezone.now()
+        to_update, to_create, needs_intervention = [], [], []
+        for student_id in student_ids:
+            metrics = existing.get(student_id)
+            if metrics is None:
+                metrics = StudentEngagementMetrics(student_id=student_id, course_id=course_id)
+            
+            row = stats.get(student_id)
+            if row:
+                metrics.total_quizzes_taken = row['count']
+                metrics.total_quiz_score = row['total']
+                metrics.average_quiz_score = row['total'] / row['count']
+                metrics.performance_category = cls.performance_category(metrics.average_quiz_score)
+                metrics.last_quiz_date = row['latest'].date()
+            else:
+                # Attempts may have been deleted since the row was written
+                metrics.total_quizzes_taken = 0
+                metrics.total_quiz_score = 0.0
+                metrics.average_quiz_score = 0.0
+                metrics.performance_category = 'good'
+                metrics.last_quiz_date = None
+            
+            misses = 0
+            for quiz_id in recent_quizzes:
+                if (student_id, quiz_id) in attempted:
+                    break
+                misses += 1
+            metrics.consecutive_missed_quizzes = misses
+            metrics.updated_at = now
+            
+            if misses >= 3 and not metrics.intervention_email_sent:
+                needs_intervention.append(metrics)
+            (to_update if metrics.pk else to_create).append(metrics)
+        
+        with transaction.atomic():
+            StudentEngagementMetrics.objects.bulk_update(to_update, cls.UPDATE_FIELDS, batch_size=500)
+            # Rows a submission created in the meantime are left to it
+            StudentEngagementMetrics.objects.bulk_create(to_create, batch_size=500, ignore_conflicts=True)
+        
+        # bulk_create(ignore_conflicts=True) leaves new rows without a pk, so load them back
+        created_ids = [metrics.student_id for metrics in needs_intervention if metrics.pk is None]
+        if created_ids:
+            needs_intervention = [metrics for metrics in needs_intervention if metrics.pk] + list(
+                StudentEngagementMetrics.objects.filter(
+                    course_id=course_id, student_id__in=created_ids, intervention_email_sent=False
+                )
+            )
+        for metrics in needs_intervention:
+            metrics.send_intervention_email()
+        
+        return len(to_update) + len(to_create)
+    
+    @classmethod
+    def recompute(cls, course_ids, workers=1):
+        """Recompute the given courses, optionally sharded over a process pool; returns rows written"""
+        course_ids = list(course_ids)
+        if workers <= 1 or len(course_ids) <= 1:
+            return sum(cls.recompute_course(course_id) for course_id in course_ids)
+        
+        from concurrent.futures import ProcessPoolExecutor
+        from django.db import connections
+        import multiprocessing
+        
+        # Forked workers must open their own connections, not share ours
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(course_ids)),
+            mp_context=multiprocessing.get_context('fork')
+        ) as pool:
+            return sum(pool.map(cls.recompute_course, course_ids))
+    
+    @staticmethod
+    def enqueue(user, course_ids=None):
+        """Queue a recompute; an identical job still waiting is reused. Returns (job, created)"""
+        from .models import MetricsRecomputeJob
+        
+        course_ids = sorted(course_ids) if course_ids is not None else None
+        for job in MetricsRecomputeJob.objects.filter(status='pending'):
+            if job.course_ids == course_ids:
+                return job, False
+        return MetricsRecomputeJob.objects.create(requested_by=user, course_ids=course_ids), True
+    
+    @staticmethod
+    def claim_next():
+        from .models import MetricsRecomputeJob
+        
+        with transaction.atomic():
+            job = MetricsRecomputeJob.objects.select_for_update(skip_locked=True).filter(
+                status='pending'
+            ).order_by('created_at').first()
+            if job is None:
+                return None
+            job.status = 'running'
+            job.started_at = timezone.now()
+            job.save(update_fields=['status', 'started_at', 'updated_at'])
+        return job
+    
+    @classmethod
+    def run(cls, job, workers=1):
+        from courses.models import Course
+        
+        if job.course_ids is None:
+            course_ids = list(Course.objects.filter(is_active=True).values_list('id', flat=True))
+        else:
+            course_ids = job.course_ids
+        
+        try:
+            job.metrics_updated = cls.recompute(course_ids, workers=workers)
+            job.courses_processed = len(course_ids)
+            job.status = 'completed'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+        job.finished_at = timezone.now()
+        job.save()
+        return job
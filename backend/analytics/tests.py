@@ -9,8 +9,12 @@ import json
 
 from courses.models import Course, Topic, CourseEnrollment
 from ai_quiz.models import LectureSlide, AdaptiveQuiz, StudentAdaptiveProgress, AdaptiveQuizAttempt
-from analytics.models import StudentEngagementMetrics, DailyEngagement
+from analytics.models import (
+    StudentEngagementMetrics, DailyEngagement, ActivityYear, CourseDailyRollup, QuestionChoiceCounter
+)
 from achievements.models import StudentAchievement
+from analytics.services import MetricsRecomputeService, QuizStatisticsService
+from ai_quiz.services import AdaptiveQuizService
 
 User = get_user_model()
 
@@ -144,8 +148,9 @@ class SystemManagementURLTests(AnalyticsURLTestCase):
         self.client.force_authenticate(user=self.lecturer, token=self.lecturer_token)
         response = self.client.post('/api/analytics/update-metrics/')
         
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIn('Updated metrics for', response.data['message'])
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertIn('Metrics recompute queued for', response.data['message'])
+        self.assertIn('job_id', response.data)
         print("✅ Update metrics URL works for lecturer")
         
         # Test as student (should fail)
@@ -664,6 +669,565 @@ class AnalyticsURLErrorHandlingTests(AnalyticsURLTestCase):
         print("✅ Malformed requests test PASSED")
 
 
+class ActivityYearTests(TestCase):
+    """Compact yearly activity calendar"""
+    
+    def setUp(self):
+        self.student = User.objects.create_user(
+            username='calendar_student',
+            email='calendar_student@test.com',
+            user_type='student',
+            student_number='CAL001'
+        )
+    
+    def test_record_activity_sets_bits_and_counters(self):
+        day = timezone.now().date().replace(month=3, day=1)
+        ActivityYear.record_activity(self.student, day, quizzes=2)
+        ActivityYear.record_activity(self.student, day, quizzes=1)
+        ActivityYear.record_activity(self.student, day + timedelta(days=1))
+        
+        activity_year = ActivityYear.objects.get(student=self.student, year=day.year)
+        self.assertEqual(activity_year.active_days, 2)
+        self.assertTrue(activity_year.is_active(day))
+        self.assertFalse(activity_year.is_active(day - timedelta(days=1)))
+        self.assertEqual(activity_year.get_counts()[ActivityYear.day_index(day)], 3)
+    
+    def test_streaks_span_new_year(self):
+        today = timezone.now().date().replace(month=1, day=2)
+        for offset in range(4):
+            ActivityYear.record_activity(self.student, today - timedelta(days=offset))
+        ActivityYear.record_activity(self.student, today - timedelta(days=10))
+        
+        streaks = ActivityYear.calculate_streaks(self.student, today)
+        self.assertEqual(streaks, {'current_streak': 4, 'longest_streak': 4})
+    
+    def test_longest_streak_includes_older_years(self):
+        today = timezone.now().date()
+        old_day = today.replace(year=today.year - 3, month=6, day=1)
+        for offset in range(6):
+            ActivityYear.record_activity(self.student, old_day + timedelta(days=offset))
+        ActivityYear.record_activity(self.student, today)
+        
+        streaks = ActivityYear.calculate_streaks(self.student, today)
+        self.assertEqual(streaks, {'current_streak': 1, 'longest_streak': 6})
+    
+    def test_mark_engagement_leaves_calendar_to_quiz_completion(self):
+        # The calendar is written once per submission, by the achievement processing
+        DailyEngagement.mark_engagement(self.student)
+        self.assertFalse(ActivityYear.objects.filter(student=self.student).exists())
+    
+    def test_heatmap_reads_calendar_in_one_query(self):
+        from rest_framework.test import APIClient
+        
+        today = timezone.now().date()
+        ActivityYear.record_activity(self.student, today, quizzes=2)
+        ActivityYear.record_activity(self.student, today - timedelta(days=366))
+        client = APIClient()
+        client.force_authenticate(user=self.student)
+        
+        with self.assertNumQueries(1):
+            response = client.get('/api/analytics/student/engagement-heatmap/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['active_days_in_year'], 1)
+        self.assertEqual(response.data['current_streak'], 1)
+        
+        response = client.get('/api/analytics/student/engagement-heatmap/?year=9999&month=12')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['engagement_data'][-1]['date'], '9999-12-31')
+    
+    def test_backfill_from_daily_tables(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from achievements.models import DailyActivity
+        
+        day = timezone.now().date()
+        DailyEngagement.objects.create(student=self.student, date=day, engaged=True)
+        DailyActivity.objects.create(student=self.student, date=day, quizzes_completed=5)
+        DailyActivity.objects.create(student=self.student, date=day - timedelta(days=400), quizzes_completed=1)
+        ActivityYear.objects.all().delete()
+        
+        call_command('backfill_activity_years', stdout=StringIO())
+        
+        self.assertEqual(ActivityYear.objects.filter(student=self.student).count(), 2)
+        activity_year = ActivityYear.objects.get(student=self.student, year=day.year)
+        self.assertEqual(activity_year.get_counts()[ActivityYear.day_index(day)], 5)
+
+
+
+class CourseDailyRollupTests(AnalyticsURLTestCase):
+    """Trend endpoints read the per-course daily rollups"""
+    
+    def rollup_values(self):
+        return list(CourseDailyRollup.objects.values_list(
+            'course_id', 'date', 'attempts', 'active_students', 'score_sum', 'score_count',
+            'easy_attempts', 'easy_score_sum', 'medium_attempts'
+        ))
+    
+    def test_incremental_rollups_match_rebuild(self):
+        from io import StringIO
+        from django.core.management import call_command
+        
+        CourseDailyRollup.record_attempts([self.attempt])
+        second = AdaptiveQuizAttempt.objects.create(
+            progress=self.progress,
+            answers_data={'question_0': 'B'},
+            score_percentage=45.0,
+            started_at=timezone.now() - timedelta(minutes=3)
+        )
+        CourseDailyRollup.record_attempts([second])
+        incremental = self.rollup_values()
+        self.assertEqual(incremental[0][2:6], (2, 1, 130.0, 2))
+        
+        call_command('rebuild_course_rollups', stdout=StringIO())
+        self.assertEqual(self.rollup_values(), incremental)
+    
+    def test_trend_endpoints_use_rollups(self):
+        self.attempt.started_at = timezone.now() - timedelta(days=2)
+        self.attempt.save()
+        CourseDailyRollup.record_attempts([self.attempt])
+        self.client.force_authenticate(user=self.lecturer, token=self.lecturer_token)
+        
+        response = self.client.get(f'/api/analytics/trends/engagement/?period=7&course_id={self.course.id}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        by_date = {day['date']: day for day in response.data['daily_engagement']}
+        attempt_day = by_date[self.attempt.started_at.date().isoformat()]
+        self.assertEqual((attempt_day['total_attempts'], attempt_day['active_students']), (1, 1))
+        self.assertEqual(response.data['summary']['total_attempts'], 1)
+        
+        response = self.client.get('/api/analytics/trends/performance/?period=7')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['weekly_performance'][0]['average_score'], 85.0)
+        first_day = (timezone.now() - timedelta(days=7)).date()
+        self.assertGreaterEqual(response.data['weekly_performance'][0]['week_start'], first_day.isoformat())
+        self.assertLessEqual(
+            response.data['weekly_performance'][-1]['week_end'], (first_day + timedelta(days=7)).isoformat()
+        )
+
+
+
+class TimeBucketServiceTests(AnalyticsURLTestCase):
+    """Gap-filled bucketed series from one grouped query"""
+    
+    def test_daily_series_is_gap_filled(self):
+        from django.db.models import Avg, Count
+        from analytics.services import TimeBucketService
+        
+        today = timezone.localdate()
+        AdaptiveQuizAttempt.objects.create(
+            progress=self.progress, score_percentage=65.0,
+            started_at=timezone.now() - timedelta(days=2)
+        )
+        
+        with self.assertNumQueries(1):
+            series = TimeBucketService.series(
+                AdaptiveQuizAttempt.objects.all(), 'started_at', today - timedelta(days=3), today,
+                filters={'course': self.course, 'difficulty': 'easy'},
+                attempts=Count('id'), students=Count('student', distinct=True), average=Avg('score_percentage')
+            )
+        
+        self.assertEqual([day['bucket'] for day in series], [today - timedelta(days=n) for n in (3, 2, 1, 0)])
+        self.assertEqual([day['attempts'] for day in series], [0, 1, 0, 1])
+        self.assertEqual(series[0]['average'], None)
+        self.assertEqual(series[-1]['students'], 1)
+    
+    def test_weekly_series_grouped_by_course(self):
+        from django.db.models import Count
+        from analytics.services import TimeBucketService
+        
+        today = timezone.localdate()
+        series = TimeBucketService.series(
+            AdaptiveQuizAttempt.objects.all(), 'started_at', today - timedelta(days=20), today,
+            bucket='week', group_by='course', attempts=Count('id')
+        )
+        
+        self.assertEqual(list(series), [self.course.id])
+        self.assertEqual(series[self.course.id][0]['bucket'].weekday(), 0)
+        self.assertEqual(sum(week['attempts'] for week in series[self.course.id]), 1)
+
+
+
+class StreamingExportTests(AnalyticsURLTestCase):
+    """CSV exports stream one projected query instead of loading every attempt"""
+    
+    def test_course_csv_streams_with_constant_queries(self):
+        for minutes in range(5):
+            AdaptiveQuizAttempt.objects.create(
+                progress=self.progress, score_percentage=50.0,
+                started_at=timezone.now() - timedelta(minutes=minutes)
+            )
+        self.client.force_authenticate(user=self.lecturer, token=self.lecturer_token)
+        
+        response = self.client.get(f'/api/analytics/course/{self.course.id}/export/?format=csv')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        
+        # The attempts are read by one joined query while the body is consumed
+        with self.assertNumQueries(1):
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        
+        self.assertEqual(lines[0], 'student_name,student_number,topic_name,quiz_title,difficulty,score_percentage,completed_at')
+        self.assertEqual(len(lines), 7)
+        self.assertTrue(lines[1].startswith('Student URLTester,URL001,URL Test Topic,URL Test Slide,easy,85.0,'))
+    
+    def test_quiz_csv_includes_time_taken(self):
+        self.client.force_authenticate(user=self.lecturer, token=self.lecturer_token)
+        
+        response = self.client.get(f'/api/analytics/quiz/{self.quiz.id}/export/?format=csv')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertIn(',0:05:00', lines[1])
+
+
+
+class ColumnarExportTests(AnalyticsURLTestCase):
+    """Typed Parquet/Feather exports"""
+    
+    def setUp(self):
+        super().setUp()
+        from analytics.services import ColumnarExportService
+        if not ColumnarExportService.is_available():
+            self.skipTest('pyarrow is not installed')
+        self.client.force_authenticate(user=self.lecturer, token=self.lecturer_token)
+    
+    def read(self, response, reader):
+        import io
+        return reader(io.BytesIO(b''.join(response.streaming_content)))
+    
+    def test_course_parquet_is_typed(self):
+        import pandas as pd
+        
+        response = self.client.get(f'/api/analytics/course/{self.course.id}/export/?format=parquet')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('course_URL101_ai_quiz_data.parquet', response['Content-Disposition'])
+        
+        frame = self.read(response, pd.read_parquet)
+        self.assertEqual(frame['student_name'].tolist(), ['Student URLTester'])
+        self.assertEqual(str(frame['score_percentage'].dtype), 'float64')
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(frame['completed_at']))
+    
+    def test_quiz_feather_and_summary_export(self):
+        import pandas as pd
+        
+        response = self.client.get(f'/api/analytics/quiz/{self.quiz.id}/export/?format=feather')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        frame = self.read(response, pd.read_feather)
+        self.assertEqual(frame['time_taken'].dt.total_seconds().round().tolist(), [300.0])
+        
+        response = self.client.get('/api/analytics/export/?type=course&format=parquet')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        frame = self.read(response, pd.read_parquet)
+        self.assertEqual(frame['total_attempts'].tolist(), [1])
+
+
+
+class ExportJobTests(AnalyticsURLTestCase):
+    """Background exports with reusable, checksummed artifacts"""
+    
+    def setUp(self):
+        super().setUp()
+        import tempfile
+        from django.test import override_settings
+        
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_override = override_settings(MEDIA_ROOT=media_root.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.client.force_authenticate(user=self.lecturer, token=self.lecturer_token)
+    
+    def test_async_export_is_reused_run_and_expired(self):
+        import gzip
+        import hashlib
+        import os
+        from io import StringIO
+        from django.core.management import call_command
+        from analytics.models import ExportJob
+        from analytics.services import ExportJobService
+        
+        response = self.client.get('/api/analytics/export/?type=attempts&format=csv&async=true')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job_id = response.data['job_id']
+        self.assertEqual(response.data['status'], 'pending')
+        
+        # The same request again gets the same job back
+        response = self.client.get('/api/analytics/export/?type=attempts&format=csv&async=true')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['job_id'], job_id)
+        
+        call_command('run_export_jobs', stdout=StringIO())
+        
+        response = self.client.get(f'/api/analytics/export-jobs/{job_id}/')
+        self.assertEqual((response.data['status'], response.data['progress']), ('completed', 100))
+        self.assertIsNotNone(response.data['download_url'])
+        
+        response = self.client.get(f'/api/analytics/export-jobs/{job_id}/download/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = b''.join(response.streaming_content)
+        self.assertEqual(hashlib.sha256(content).hexdigest(), response['X-Checksum-SHA256'])
+        lines = gzip.decompress(content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:2], ['course_code', 'student_name'])
+        self.assertTrue(lines[1].startswith('URL101,Student URLTester,'))
+        
+        job = ExportJob.objects.get(id=job_id)
+        path = job.file.path
+        ExportJobService.cleanup_expired(now=job.expires_at)
+        self.assertEqual(self.client.get(f'/api/analytics/export-jobs/{job_id}/download/').status_code, status.HTTP_410_GONE)
+        self.assertFalse(os.path.exists(path))
+    
+    def test_other_users_cannot_see_job(self):
+        response = self.client.get('/api/analytics/export/?type=course&format=csv&async=true')
+        self.client.force_authenticate(user=self.other_lecturer, token=self.other_lecturer_token)
+        response = self.client.get(f"/api/analytics/export-jobs/{response.data['job_id']}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+
+class MetricsRecomputeTests(AnalyticsURLTestCase):
+    """Set-based recompute of engagement metrics"""
+    
+    def test_recompute_course_metrics(self):
+        AdaptiveQuizAttempt.objects.create(
+            progress=self.progress, score_percentage=35.0,
+            started_at=timezone.now() - timedelta(days=1)
+        )
+        AdaptiveQuiz.objects.filter(id=self.quiz.id).update(status='published')
+        StudentEngagementMetrics.objects.all().delete()
+        
+        # enrollments, aggregate, recent quizzes, attempted quizzes, metrics, savepoint + insert
+        with self.assertNumQueries(8):
+            updated = MetricsRecomputeService.recompute_course(self.course.id)
+        self.assertEqual(updated, 1)
+        metrics = StudentEngagementMetrics.objects.get(student=self.student, course=self.course)
+        self.assertEqual(
+            (metrics.total_quizzes_taken, metrics.total_quiz_score, metrics.average_quiz_score),
+            (2, 120.0, 60.0)
+        )
+        self.assertEqual(metrics.performance_category, 'good')
+        self.assertEqual(metrics.last_quiz_date, self.attempt.started_at.date())
+        self.assertEqual(metrics.consecutive_missed_quizzes, 0)
+    
+    def test_calculate_ai_quiz_metrics_delegates_to_recompute(self):
+        metrics = StudentEngagementMetrics(student=self.student, course=self.course)
+        metrics.calculate_ai_quiz_metrics()
+        
+        self.assertIsNotNone(metrics.pk)
+        self.assertEqual((metrics.total_quizzes_taken, metrics.average_quiz_score), (1, 85.0))
+        self.assertEqual(metrics.performance_category, 'excellent')
+    
+    def test_students_without_attempts_are_reset(self):
+        MetricsRecomputeService.recompute_course(self.course.id)
+        AdaptiveQuizAttempt.objects.filter(student=self.student).delete()
+        
+        MetricsRecomputeService.recompute_course(self.course.id)
+        
+        metrics = StudentEngagementMetrics.objects.get(student=self.student, course=self.course)
+        self.assertEqual(
+            (metrics.total_quizzes_taken, metrics.average_quiz_score, metrics.last_quiz_date),
+            (0, 0.0, None)
+        )
+    
+    def test_new_rows_get_intervention_email(self):
+        from django.core import mail
+        
+        for number in range(3):
+            slide = LectureSlide.objects.create(topic=self.topic, title=f'Missed {number}', uploaded_by=self.lecturer)
+            AdaptiveQuiz.objects.create(
+                lecture_slide=slide, difficulty='easy', status='published', questions_data={'questions': []}
+            )
+        StudentEngagementMetrics.objects.all().delete()
+        
+        MetricsRecomputeService.recompute_course(self.course.id)
+        
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertTrue(StudentEngagementMetrics.objects.get(
+            student=self.student, course=self.course
+        ).intervention_email_sent)
+    
+    def test_endpoint_enqueues_and_command_runs_job(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from analytics.models import MetricsRecomputeJob
+        
+        StudentEngagementMetrics.objects.all().delete()
+        self.client.force_authenticate(user=self.lecturer, token=self.lecturer_token)
+        job_id = self.client.post('/api/analytics/update-metrics/').data['job_id']
+        self.assertEqual(self.client.post('/api/analytics/update-metrics/').data['job_id'], job_id)
+        self.assertFalse(StudentEngagementMetrics.objects.exists())
+        
+        call_command('recompute_engagement_metrics', jobs=True, stdout=StringIO())
+        
+        job = MetricsRecomputeJob.objects.get(id=job_id)
+        self.assertEqual((job.status, job.courses_processed, job.metrics_updated), ('completed', 1, 1))
+        self.assertEqual(StudentEngagementMetrics.objects.get(student=self.student).average_quiz_score, 85.0)
+
+
+
+class PerCourseMetricsTests(AnalyticsURLTestCase):
+    """A student has one metrics row per course, and dashboards read them"""
+    
+    def setUp(self):
+        super().setUp()
+        self.second_course = Course.objects.create(name='Second Course', code='SEC101', lecturer=self.lecturer)
+        CourseEnrollment.objects.create(student=self.student, course=self.second_course, is_active=True)
+        topic = Topic.objects.create(course=self.second_course, name='Second Topic')
+        slide = LectureSlide.objects.create(topic=topic, title='Second Slide', uploaded_by=self.lecturer)
+        quiz = AdaptiveQuiz.objects.create(lecture_slide=slide, difficulty='easy', questions_data={'questions': []})
+        progress = StudentAdaptiveProgress.objects.create(student=self.student, adaptive_quiz=quiz)
+        AdaptiveQuizAttempt.objects.create(progress=progress, score_percentage=40.0, started_at=timezone.now())
+    
+    def test_metrics_per_course_feed_dashboards(self):
+        MetricsRecomputeService.recompute(Course.objects.values_list('id', flat=True))
+        
+        rows = dict(StudentEngagementMetrics.objects.filter(student=self.student).values_list(
+            'course__code', 'performance_category'
+        ))
+        self.assertEqual(rows, {'URL101': 'excellent', 'SEC101': 'danger'})
+        
+        self.client.force_authenticate(user=self.student, token=self.student_token)
+        response = self.client.get('/api/analytics/student/dashboard/')
+        self.assertEqual(
+            {code: course['average'] for code, course in response.data['course_averages'].items()},
+            {'URL101': 85.0, 'SEC101': 40.0}
+        )
+        
+        self.client.force_authenticate(user=self.lecturer, token=self.lecturer_token)
+        response = self.client.get('/api/analytics/lecturer/dashboard/')
+        overview = {course['course_code']: course for course in response.data['course_overview']}
+        self.assertEqual(overview['SEC101']['average_score'], 40.0)
+        self.assertEqual(overview['URL101']['unique_participants'], 1)
+
+
+class QuizStatisticsServiceTests(AnalyticsURLTestCase):
+    """Statistics views read scores and answers into arrays in one query"""
+    
+    def setUp(self):
+        super().setUp()
+        for username, answer, score in (('stats_a', 'B', 40.0), ('stats_b', 'A', 100.0)):
+            student = User.objects.create_user(username=username, email=f'{username}@test.com', user_type='student')
+            progress = StudentAdaptiveProgress.objects.create(student=student, adaptive_quiz=self.quiz)
+            attempt = AdaptiveQuizAttempt(
+                progress=progress, quiz_version=self.quiz.current_version,
+                score_percentage=score, started_at=timezone.now()
+            )
+            attempt.set_answers({'question_0': answer}, 1)
+            attempt.save()
+    
+    def test_summary_and_choice_counts(self):
+        attempts = AdaptiveQuizAttempt.objects.filter(adaptive_quiz=self.quiz)
+        with self.assertNumQueries(1):
+            scores, answers = QuizStatisticsService.load_quiz(attempts, 1)
+        
+        self.assertEqual(QuizStatisticsService.choice_counts(answers).tolist(), [[2, 1, 0, 0]])
+        summary = QuizStatisticsService.summarize(scores)
+        self.assertEqual(summary['median'], 85.0)
+        self.assertAlmostEqual(summary['mean'], 75.0)
+        self.assertEqual(summary['bands'], {'poor': 0, 'average': 1, 'good': 0, 'excellent': 2})
+        self.assertEqual(sum(bucket['count'] for bucket in summary['histogram']), 3)
+        self.assertEqual([bucket['count'] for bucket in summary['histogram'][-2:]], [1, 1])
+        
+        groups = QuizStatisticsService.group_summary(attempts, 'adaptive_quiz_id')
+        self.assertEqual(groups[self.quiz.id]['min'], 40.0)
+        self.assertEqual(groups[self.quiz.id]['max'], 100.0)
+        self.assertEqual(groups[self.quiz.id]['unique_students'], 3)
+    
+    def test_statistics_views(self):
+        self.client.force_authenticate(user=self.lecturer, token=self.lecturer_token)
+        
+        response = self.client.get(f'/api/analytics/quiz/{self.quiz.id}/stats/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # No counters yet: counted from the attempts at the current version only
+        choices = response.data['question_analysis'][0]['choice_distribution']
+        self.assertEqual([choice['selection_count'] for choice in choices], [1, 1, 0, 0])
+        self.assertEqual(response.data['question_analysis_attempts'], 2)
+        self.assertEqual(response.data['median_score'], 85.0)
+        
+        response = self.client.get(f'/api/analytics/topic/{self.topic.id}/stats/')
+        self.assertEqual(response.data['total_attempts'], 3)
+        self.assertAlmostEqual(response.data['overall_average'], 75.0)
+        
+        response = self.client.post(
+            '/api/analytics/compare/quizzes/', {'quiz_ids': [self.quiz.id, 0]}, format='json'
+        )
+        self.assertEqual(len(response.data['data']), 1)
+        self.assertEqual(response.data['data'][0]['lowest_score'], 40.0)
+        
+        response = self.client.post(
+            '/api/analytics/compare/courses/', {'course_ids': [self.course.id, self.other_course.id]}, format='json'
+        )
+        self.assertEqual([course['course_code'] for course in response.data['data']], ['URL101'])
+        self.assertEqual(response.data['data'][0]['total_attempts'], 3)
+
+
+class QuestionChoiceCounterTests(AnalyticsURLTestCase):
+    """Submissions keep per-question counters that the quiz statistics read"""
+    
+    def setUp(self):
+        super().setUp()
+        self.others = [
+            User.objects.create_user(username=f'counter_{i}', email=f'counter_{i}@test.com', user_type='student')
+            for i in range(2)
+        ]
+    
+    def test_counters_follow_submissions_and_reconcile(self):
+        from django.core.management import call_command
+        from io import StringIO
+        
+        AdaptiveQuizService.process_quiz_attempt(self.others[0], self.quiz, {'question_0': 'A'})
+        AdaptiveQuizService.process_quiz_attempts_batch([
+            {'student': self.others[1], 'adaptive_quiz': self.quiz, 'answers': {'question_0': 'C'}},
+            {'student': self.others[1], 'adaptive_quiz': self.quiz, 'answers': {}},
+        ])
+        
+        counter = QuestionChoiceCounter.objects.get(quiz_version=self.quiz.current_version, question_number=0)
+        self.assertEqual(
+            (counter.attempts, counter.correct, counter.choice_a, counter.choice_c, counter.unanswered),
+            (3, 1, 1, 1, 1)
+        )
+        
+        self.client.force_authenticate(user=self.lecturer, token=self.lecturer_token)
+        response = self.client.get(f'/api/analytics/quiz/{self.quiz.id}/stats/')
+        self.assertEqual(response.data['total_attempts'], 4)
+        self.assertEqual(response.data['question_analysis_attempts'], 3)
+        question = response.data['question_analysis'][0]
+        self.assertEqual([choice['selection_count'] for choice in question['choice_distribution']], [1, 0, 1, 0])
+        self.assertEqual(question['correct_count'], 1)
+        
+        # After an edit the new version has no answers yet, old ones are not shown under it
+        questions = self.quiz.get_questions()['questions']
+        questions[0]['question'] = 'Reworded question?'
+        self.quiz.questions_data = {'questions': questions}
+        self.quiz.save()
+        response = self.client.get(f'/api/analytics/quiz/{self.quiz.id}/stats/')
+        self.assertEqual(response.data['question_analysis_version'], 2)
+        self.assertEqual(response.data['question_analysis_attempts'], 0)
+        self.assertEqual(response.data['question_analysis'][0]['question_text'], 'Reworded question?')
+        self.assertEqual(response.data['question_analysis'][0]['correct_count'], 0)
+        
+        QuestionChoiceCounter.objects.update(choice_a=50, attempts=60)
+        call_command('reconcile_choice_counters', quiz=self.quiz.id, stdout=StringIO())
+        counter.refresh_from_db()
+        self.assertEqual((counter.attempts, counter.choice_a), (3, 1))
+
+    def test_first_counters_include_earlier_attempts(self):
+        # Taken before the counters existed (e.g. before they were deployed)
+        progress = StudentAdaptiveProgress.objects.create(student=self.others[0], adaptive_quiz=self.quiz)
+        earlier = AdaptiveQuizAttempt(
+            progress=progress, quiz_version=self.quiz.current_version,
+            score_percentage=0.0, started_at=timezone.now()
+        )
+        earlier.set_answers({'question_0': 'B'}, 1)
+        earlier.save()
+        self.assertFalse(QuestionChoiceCounter.objects.exists())
+        
+        AdaptiveQuizService.process_quiz_attempt(self.others[1], self.quiz, {'question_0': 'A'})
+        
+        counter = QuestionChoiceCounter.objects.get(quiz_version=self.quiz.current_version, question_number=0)
+        self.assertEqual(
+            (counter.attempts, counter.correct, counter.choice_a, counter.choice_b),
+            (2, 1, 1, 1)
+        )
+
+
 # Test runner that executes all URL tests
 class AnalyticsURLTestSuite:
     """Complete test suite for analytics URLs"""
@@ -12,6 +12,7 @@ urlpatterns = [
     
     # Student analytics
     path('student/dashboard/', views.student_analytics_dashboard, name='student_analytics_dashboard'),
+    path('student/engagement-heatmap/', views.student_engagement_heatmap, name='student_engagement_heatmap'),
     
     # DETAILED STATISTICS ENDPOINTS
     path('quiz/<int:quiz_id>/stats/', views.quiz_statistics, name='quiz_statistics'),
@@ -23,6 +24,8 @@ urlpatterns = [
     path('export/', views.export_analytics_data, name='export_analytics_data'),
     path('quiz/<int:quiz_id>/export/', views.export_quiz_results, name='export_quiz_results'),
     path('course/<int:course_id>/export/', views.export_course_data, name='export_course_data'),
+    path('export-jobs/<int:job_id>/', views.export_job_status, name='export_job_status'),
+    path('export-jobs/<int:job_id>/download/', views.download_export_job, name='download_export_job'),
     
     # REAL-TIME ANALYTICS
     path('quiz/<int:quiz_id>/live-stats/', views.get_live_quiz_stats, name='get_live_quiz_stats'),
@@ -1,15 +1,24 @@
 from rest_framework import status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from django.db.models import Avg, Count, Max, Min, Sum, Q
 from django.utils import timezone
-from django.http import HttpResponse
+from django.http import HttpResponse, FileResponse
+from django.urls import reverse
 from datetime import datetime, timedelta
+import os
 import calendar
 import csv
-from django.http import HttpResponse
 
-from .models import StudentEngagementMetrics, DailyEngagement
+from .models import (
+    StudentEngagementMetrics, DailyEngagement, ActivityYear, CourseDailyRollup, CourseDailyStudent, ExportJob
+)
+from .renderers import CSVRenderer, ParquetRenderer, FeatherRenderer
+from .services import (
+    TimeBucketService, AttemptExportService, ColumnarExportService, ExportJobService, MetricsRecomputeService,
+    QuizStatisticsService
+)
 from .serializers import (
     StudentEngagementSerializer, StudentPerformanceDistributionSerializer,
     QuizAnalyticsSerializer, TopicAnalyticsSerializer, CourseAnalyticsSerializer,
@@ -49,35 +58,16 @@ def update_student_metrics(request):
     else:
         courses = Course.objects.filter(is_active=True)
     
-    updated_count = 0
-    
-    for course in courses:
-        # Get all enrolled students
-        enrolled_students = CourseEnrollment.objects.filter(
-            course=course, is_active=True
-        ).values_list('student', flat=True)
-        
-        for student_id in enrolled_students:
-            try:
-                student = User.objects.get(id=student_id, user_type='student')
-                metrics, created = StudentEngagementMetrics.objects.get_or_create(
-                    student=student,
-                    course=course
-                )
-                metrics.calculate_metrics()
-                updated_count += 1
-                
-                # Update daily engagement if student took AI quiz today
-                if metrics.last_quiz_date == timezone.now().date():
-                    DailyEngagement.mark_engagement(student)
-                    
-            except User.DoesNotExist:
-                continue
+    # The recompute runs in recompute_engagement_metrics --jobs, not in this request
+    course_ids = list(courses.values_list('id', flat=True)) if request.user.is_lecturer else None
+    job, created = MetricsRecomputeService.enqueue(request.user, course_ids)
     
     return Response({
-        'message': f'Updated metrics for {updated_count} student-course pairs',
-        'courses_processed': courses.count()
-    })
+        'message': f'Metrics recompute queued for {len(course_ids) if course_ids is not None else courses.count()} courses',
+        'job_id': job.id,
+        'status': job.status,
+        'courses_processed': 0
+    }, status=status.HTTP_202_ACCEPTED)
 
 
 @api_view(['GET'])
@@ -87,27 +77,33 @@ def lecturer_analytics_dashboard(request):
     lecturer = request.user
     courses = Course.objects.filter(lecturer=lecturer, is_active=True)
     
-    # Course overview data based on AI quizzes
+    # Course overview from the per-course metrics rows (kept current on submission)
+    course_totals = {
+        row['course_id']: row
+        for row in StudentEngagementMetrics.objects.filter(course__in=courses).values('course_id').annotate(
+            quizzes=Sum('total_quizzes_taken'),
+            score=Sum('total_quiz_score'),
+            participants=Count('id', filter=Q(total_quizzes_taken__gt=0))
+        ).order_by()
+    }
+    enrolled_counts = dict(
+        CourseEnrollment.objects.filter(course__in=courses, is_active=True).values('course_id').annotate(
+            total=Count('id')
+        ).order_by().values_list('course_id', 'total')
+    )
+    
     course_data = []
     for course in courses:
-        # Get AI quiz attempts for this course
-        ai_attempts = AdaptiveQuizAttempt.objects.filter(
-            progress__adaptive_quiz__lecture_slide__topic__course=course
-        )
-        
-        enrolled_count = CourseEnrollment.objects.filter(
-            course=course, is_active=True
-        ).count()
-        
+        totals = course_totals.get(course.id, {'quizzes': 0, 'score': 0, 'participants': 0})
         course_info = {
             'course_id': course.id,
             'course_code': course.code,
             'course_name': course.name,
-            'total_students': enrolled_count,
-            'total_ai_quizzes': ai_attempts.count(),
-            'average_score': ai_attempts.aggregate(avg=Avg('score_percentage'))['avg'] or 0,
-            'total_attempts': ai_attempts.count(),
-            'unique_participants': ai_attempts.values('progress__student').distinct().count()
+            'total_students': enrolled_counts.get(course.id, 0),
+            'total_ai_quizzes': totals['quizzes'] or 0,
+            'average_score': (totals['score'] / totals['quizzes']) if totals['quizzes'] else 0,
+            'total_attempts': totals['quizzes'] or 0,
+            'unique_participants': totals['participants']
         }
         course_data.append(course_info)
     
@@ -131,7 +127,7 @@ def lecturer_analytics_dashboard(request):
     # Recent performance trends (last 30 days) - AI quiz data
     thirty_days_ago = timezone.now() - timedelta(days=30)
     recent_attempts = AdaptiveQuizAttempt.objects.filter(
-        progress__adaptive_quiz__lecture_slide__topic__course__in=courses,
+        course__in=courses,
         started_at__gte=thirty_days_ago
     )
     
@@ -177,7 +173,7 @@ def lecturer_analytics_chart(request):
                 lecture_slide__topic__course__lecturer=lecturer
             )
             attempts = AdaptiveQuizAttempt.objects.filter(
-                progress__adaptive_quiz=adaptive_quiz
+                adaptive_quiz=adaptive_quiz
             )
             
             # Group by score ranges
@@ -215,7 +211,7 @@ def lecturer_analytics_chart(request):
             
             for adaptive_quiz in adaptive_quizzes:
                 attempts = AdaptiveQuizAttempt.objects.filter(
-                    progress__adaptive_quiz=adaptive_quiz
+                    adaptive_quiz=adaptive_quiz
                 )
                 avg_score = attempts.aggregate(avg=Avg('score_percentage'))['avg'] or 0
                 
@@ -237,7 +233,7 @@ def lecturer_analytics_chart(request):
             
             for topic in topics:
                 topic_attempts = AdaptiveQuizAttempt.objects.filter(
-                    progress__adaptive_quiz__lecture_slide__topic=topic
+                    adaptive_quiz__lecture_slide__topic=topic
                 )
                 avg_score = topic_attempts.aggregate(avg=Avg('score_percentage'))['avg'] or 0
                 
@@ -296,7 +292,7 @@ def student_analytics_dashboard(request):
     
     # Get all AI quiz attempts for this student
     all_attempts = AdaptiveQuizAttempt.objects.filter(
-        progress__student=student
+        student=student
     ).order_by('-started_at')
     
     if not all_attempts.exists():
@@ -314,39 +310,33 @@ def student_analytics_dashboard(request):
     )['avg'] or 0
     
     # Performance trend (last 10 attempts)
-    recent_attempts = all_attempts[:10]
+    recent_attempts = all_attempts.select_related('adaptive_quiz__lecture_slide', 'course')[:10]
     performance_trend = []
     
     for attempt in reversed(recent_attempts):
         performance_trend.append({
-            'quiz_title': attempt.progress.adaptive_quiz.lecture_slide.title,
-            'difficulty': attempt.progress.adaptive_quiz.difficulty,
+            'quiz_title': attempt.adaptive_quiz.lecture_slide.title,
+            'difficulty': attempt.difficulty,
             'score': attempt.score_percentage,
             'date': attempt.started_at.strftime('%Y-%m-%d'),
-            'course_code': attempt.progress.adaptive_quiz.lecture_slide.topic.course.code
+            'course_code': attempt.course.code
         })
     
-    # Course averages based on AI quiz attempts
+    # Course averages from the student's per-course metrics rows
     course_averages = {}
-    enrolled_courses = CourseEnrollment.objects.filter(
-        student=student, is_active=True
-    )
+    course_metrics = StudentEngagementMetrics.objects.filter(
+        student=student,
+        total_quizzes_taken__gt=0,
+        course__enrollments__student=student,
+        course__enrollments__is_active=True
+    ).select_related('course')
     
-    for enrollment in enrolled_courses:
-        course_attempts = all_attempts.filter(
-            progress__adaptive_quiz__lecture_slide__topic__course=enrollment.course
-        )
-        
-        if course_attempts.exists():
-            avg_score = course_attempts.aggregate(
-                avg=Avg('score_percentage')
-            )['avg']
-            
-            course_averages[enrollment.course.code] = {
-                'average': round(avg_score, 2),
-                'total_quizzes': course_attempts.count(),
-                'course_name': enrollment.course.name
-            }
+    for metrics in course_metrics:
+        course_averages[metrics.course.code] = {
+            'average': round(metrics.average_quiz_score, 2),
+            'total_quizzes': metrics.total_quizzes_taken,
+            'course_name': metrics.course.name
+        }
     
     dashboard_data = {
         'overall_average': round(overall_average, 2),
@@ -360,6 +350,41 @@ def student_analytics_dashboard(request):
 
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, IsStudentPermission])
+def student_engagement_heatmap(request):
+    """Calendar heatmap and streaks for a student, served from the yearly activity bitmap"""
+    student = request.user
+    today = timezone.now().date()
+    
+    try:
+        year = int(request.query_params.get('year', today.year))
+        month = int(request.query_params.get('month', today.month))
+    except ValueError:
+        return Response({'error': 'year and month must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if not 1 <= month <= 12 or not 1 <= year <= 9999:
+        return Response({'error': 'Invalid year or month'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Every yearly row in one query: the requested year plus whatever the streaks need
+    activity_years = list(ActivityYear.objects.filter(student=student))
+    activity_year = next(
+        (row for row in activity_years if row.year == year),
+        ActivityYear(student=student, year=year)
+    )
+    
+    heatmap_data = EngagementHeatmapSerializer({
+        'year': year,
+        'month': month,
+        'engagement_data': activity_year.get_month_data(month)
+    }).data
+    
+    heatmap_data['active_days_in_year'] = activity_year.active_days
+    heatmap_data.update(ActivityYear.calculate_streaks(student, today, activity_years))
+    
+    return Response(heatmap_data)
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated, IsLecturerPermission])
 def lecturer_course_options(request):
@@ -403,12 +428,12 @@ def lecturer_course_options(request):
 def quiz_statistics(request, quiz_id):
     """Detailed statistics for a specific AI quiz"""
     try:
-        adaptive_quiz = AdaptiveQuiz.objects.get(
+        adaptive_quiz = AdaptiveQuiz.objects.select_related('lecture_slide__topic__course', 'current_version').get(
             id=quiz_id, 
             lecture_slide__topic__course__lecturer=request.user
         )
         attempts = AdaptiveQuizAttempt.objects.filter(
-            progress__adaptive_quiz=adaptive_quiz
+            adaptive_quiz=adaptive_quiz
         )
         
         if not attempts.exists():
@@ -420,61 +445,57 @@ def quiz_statistics(request, quiz_id):
                 'message': 'No completed attempts yet'
             })
         
-        # Basic statistics
-        scores = [attempt.score_percentage for attempt in attempts]
+        # Scores come from one column read, choice counts from the per-question counters
+        summary = QuizStatisticsService.summarize(QuizStatisticsService.load_scores(attempts))
+        distribution = QuizStatisticsService.choice_distribution(adaptive_quiz, attempts)
+        total_attempts = summary['count']
+        counted = distribution['attempts']
         
         # Question-level analysis for AI quizzes
-        questions_data = adaptive_quiz.get_questions().get('questions', [])
         question_stats = []
-        
-        for i, question in enumerate(questions_data):
-            # Analyze answer distribution for this question
-            question_answers = []
-            for attempt in attempts:
-                answers = attempt.answers_data if attempt.answers_data else {}
-                question_key = f"question_{i}"
-                if question_key in answers:
-                    question_answers.append(answers[question_key])
-            
-            # Count choice selections
+        for i, question in enumerate(distribution['questions']):
             choice_stats = []
             options = question.get('options', {})
-            for choice_key in ['A', 'B', 'C', 'D']:
+            for c, choice_key in enumerate(QuizStatisticsService.CHOICES):
                 if choice_key in options:
-                    selection_count = question_answers.count(choice_key)
+                    selection_count = int(distribution['selections'][i, c])
                     choice_stats.append({
                         'choice_key': choice_key,
                         'choice_text': options[choice_key],
                         'is_correct': choice_key == question.get('correct_answer'),
                         'selection_count': selection_count,
-                        'selection_percentage': (selection_count / len(attempts) * 100) if attempts else 0
+                        'selection_percentage': (selection_count / counted * 100) if counted else 0
                     })
             
+            correct_count = int(distribution['correct'][i])
             question_stats.append({
                 'question_number': i,
                 'question_text': question.get('question'),
                 'difficulty': question.get('difficulty'),
+                'correct_count': correct_count,
+                'correct_percentage': (correct_count / counted * 100) if counted else 0,
                 'choice_distribution': choice_stats
             })
         
+        active_enrollments = adaptive_quiz.lecture_slide.topic.course.enrollments.filter(is_active=True).count()
         stats = {
             'quiz_id': adaptive_quiz.id,
             'quiz_title': adaptive_quiz.lecture_slide.title,
             'difficulty': adaptive_quiz.difficulty,
-            'total_attempts': attempts.count(),
-            'unique_students': attempts.values('progress__student').distinct().count(),
-            'average_score': sum(scores) / len(scores),
-            'highest_score': max(scores),
-            'lowest_score': min(scores),
-            'median_score': sorted(scores)[len(scores)//2],
-            'score_distribution': {
-                'excellent': len([s for s in scores if s >= 80]),
-                'good': len([s for s in scores if 60 <= s < 80]),
-                'average': len([s for s in scores if 40 <= s < 60]),
-                'poor': len([s for s in scores if s < 40])
-            },
+            'total_attempts': total_attempts,
+            'unique_students': attempts.values('student').distinct().count(),
+            'average_score': summary['mean'],
+            'highest_score': summary['max'],
+            'lowest_score': summary['min'],
+            'median_score': summary['median'],
+            'std_dev': summary['std'],
+            'percentiles': summary['percentiles'],
+            'score_distribution': summary['bands'],
+            'score_histogram': summary['histogram'],
             'question_analysis': question_stats,
-            'completion_rate': (attempts.count() / adaptive_quiz.lecture_slide.topic.course.enrollments.filter(is_active=True).count() * 100) if adaptive_quiz.lecture_slide.topic.course.enrollments.filter(is_active=True).exists() else 0
+            'question_analysis_version': distribution['quiz_version'],
+            'question_analysis_attempts': counted,
+            'completion_rate': (total_attempts / active_enrollments * 100) if active_enrollments else 0
         }
         
         return Response(stats)
@@ -493,29 +514,34 @@ def topic_statistics(request, topic_id):
             lecture_slide__topic=topic, is_active=True
         )
         all_attempts = AdaptiveQuizAttempt.objects.filter(
-            progress__adaptive_quiz__in=adaptive_quizzes
+            adaptive_quiz__in=adaptive_quizzes
         )
         
+        per_quiz = QuizStatisticsService.group_summary(all_attempts, 'adaptive_quiz_id')
+        active_enrollments = topic.course.enrollments.filter(is_active=True).count()
+        
         quiz_stats = []
-        for adaptive_quiz in adaptive_quizzes:
-            quiz_attempts = all_attempts.filter(progress__adaptive_quiz=adaptive_quiz)
-            if quiz_attempts.exists():
-                scores = [attempt.score_percentage for attempt in quiz_attempts]
+        for adaptive_quiz in adaptive_quizzes.select_related('lecture_slide'):
+            summary = per_quiz.get(adaptive_quiz.id)
+            if summary:
                 quiz_stats.append({
                     'quiz_id': adaptive_quiz.id,
                     'quiz_title': adaptive_quiz.lecture_slide.title,
                     'difficulty': adaptive_quiz.difficulty,
-                    'attempt_count': quiz_attempts.count(),
-                    'average_score': sum(scores) / len(scores),
-                    'completion_rate': (quiz_attempts.count() / topic.course.enrollments.filter(is_active=True).count() * 100) if topic.course.enrollments.filter(is_active=True).exists() else 0
+                    'attempt_count': summary['count'],
+                    'average_score': summary['mean'],
+                    'completion_rate': (summary['count'] / active_enrollments * 100) if active_enrollments else 0
                 })
         
+        total_attempts = sum(summary['count'] for summary in per_quiz.values())
         overall_stats = {
             'topic_id': topic.id,
             'topic_name': topic.name,
             'total_ai_quizzes': adaptive_quizzes.count(),
-            'total_attempts': all_attempts.count(),
-            'overall_average': all_attempts.aggregate(avg=Avg('score_percentage'))['avg'] or 0,
+            'total_attempts': total_attempts,
+            'overall_average': (
+                sum(summary['mean'] * summary['count'] for summary in per_quiz.values()) / total_attempts
+            ) if total_attempts else 0,
             'quiz_breakdown': quiz_stats
         }
         
@@ -539,29 +565,33 @@ def course_statistics(request, course_id):
             lecture_slide__topic__in=topics, is_active=True
         )
         all_attempts = AdaptiveQuizAttempt.objects.filter(
-            progress__adaptive_quiz__in=all_adaptive_quizzes
+            adaptive_quiz__in=all_adaptive_quizzes
         )
         
+        per_topic = QuizStatisticsService.group_summary(all_attempts, 'adaptive_quiz__lecture_slide__topic_id')
+        quiz_counts = dict(all_adaptive_quizzes.values_list('lecture_slide__topic_id').annotate(
+            count=Count('id')
+        ).order_by())
+        
         topic_breakdown = []
         for topic in topics:
-            topic_attempts = all_attempts.filter(
-                progress__adaptive_quiz__lecture_slide__topic=topic
-            )
-            
+            summary = per_topic.get(topic.id, {'count': 0, 'mean': 0})
             topic_breakdown.append({
                 'topic_id': topic.id,
                 'topic_name': topic.name,
-                'ai_quiz_count': all_adaptive_quizzes.filter(lecture_slide__topic=topic).count(),
-                'attempt_count': topic_attempts.count(),
-                'average_score': topic_attempts.aggregate(avg=Avg('score_percentage'))['avg'] or 0
+                'ai_quiz_count': quiz_counts.get(topic.id, 0),
+                'attempt_count': summary['count'],
+                'average_score': summary['mean']
             })
         
         # Student engagement analysis
         metrics = StudentEngagementMetrics.objects.filter(course=course)
+        total_enrolled = enrollments.count()
+        students_with_attempts = all_attempts.values('student').distinct().count()
         engagement_stats = {
-            'total_enrolled': enrollments.count(),
-            'students_with_attempts': all_attempts.values('progress__student').distinct().count(),
-            'engagement_rate': (all_attempts.values('progress__student').distinct().count() / enrollments.count() * 100) if enrollments.exists() else 0,
+            'total_enrolled': total_enrolled,
+            'students_with_attempts': students_with_attempts,
+            'engagement_rate': (students_with_attempts / total_enrolled * 100) if total_enrolled else 0,
             'performance_distribution': {
                 'excellent': metrics.filter(performance_category='excellent').count(),
                 'good': metrics.filter(performance_category='good').count(),
@@ -570,13 +600,16 @@ def course_statistics(request, course_id):
             'students_needing_attention': metrics.filter(consecutive_missed_quizzes__gte=3).count()
         }
         
+        overall = QuizStatisticsService.summarize(QuizStatisticsService.load_scores(all_attempts))
         course_stats = {
             'course_id': course.id,
             'course_code': course.code,
             'course_name': course.name,
             'total_ai_quizzes': all_adaptive_quizzes.count(),
-            'total_attempts': all_attempts.count(),
-            'overall_average': all_attempts.aggregate(avg=Avg('score_percentage'))['avg'] or 0,
+            'total_attempts': overall['count'],
+            'overall_average': overall.get('mean', 0),
+            'median_score': overall.get('median', 0),
+            'score_distribution': overall.get('bands', dict.fromkeys(QuizStatisticsService.BAND_NAMES, 0)),
             'topic_breakdown': topic_breakdown,
             'student_engagement': engagement_stats,
             'last_updated': timezone.now()
@@ -607,17 +640,21 @@ def student_engagement_detail(request, student_id):
         
         engagement_data = []
         
+        # Recent AI quiz activity of every course, per week, in one query
+        today = timezone.localdate()
+        recent_activity = TimeBucketService.series(
+            AdaptiveQuizAttempt.objects.filter(student=student, course__in=student_courses),
+            'started_at', today - timedelta(days=30), today,
+            bucket='week', group_by='course',
+            attempts=Count('id'),
+            average_score=Avg('score_percentage')
+        )
+        
         for course in student_courses:
             # Get metrics for this course
             try:
                 metrics = StudentEngagementMetrics.objects.get(student=student, course=course)
-                
-                # Get recent AI quiz activity
-                recent_attempts = AdaptiveQuizAttempt.objects.filter(
-                    progress__student=student,
-                    progress__adaptive_quiz__lecture_slide__topic__course=course,
-                    started_at__gte=timezone.now() - timedelta(days=30)
-                ).order_by('-started_at')
+                weekly_activity = recent_activity.get(course.id, [])
                 
                 course_engagement = {
                     'course_code': course.code,
@@ -627,7 +664,8 @@ def student_engagement_detail(request, student_id):
                     'performance_category': metrics.performance_category,
                     'consecutive_missed': metrics.consecutive_missed_quizzes,
                     'last_quiz_date': metrics.last_quiz_date,
-                    'recent_activity_count': recent_attempts.count()
+                    'recent_activity_count': sum(week['attempts'] for week in weekly_activity),
+                    'weekly_activity': weekly_activity
                 }
                 
                 engagement_data.append(course_engagement)
@@ -641,24 +679,29 @@ def student_engagement_detail(request, student_id):
                     'performance_category': 'good',
                     'consecutive_missed': 0,
                     'last_quiz_date': None,
-                    'recent_activity_count': 0
+                    'recent_activity_count': 0,
+                    'weekly_activity': []
                 })
         
         # Get engagement heatmap data for last 3 months
-        three_months_ago = timezone.now() - timedelta(days=90)
-        daily_engagements = DailyEngagement.objects.filter(
-            student=student,
-            date__gte=three_months_ago.date()
-        ).order_by('date')
+        weekly_engagement = TimeBucketService.series(
+            DailyEngagement.objects.filter(student=student), 'date', today - timedelta(days=90), today,
+            bucket='week',
+            engaged_days=Count('id', filter=Q(engaged=True)),
+            tracked_days=Count('id')
+        )
+        engaged_days = sum(week['engaged_days'] for week in weekly_engagement)
+        tracked_days = sum(week['tracked_days'] for week in weekly_engagement)
         
         engagement_summary = {
             'student_id': student.id,
             'student_name': student.get_full_name(),
             'student_number': student.student_number,
             'courses': engagement_data,
-            'recent_engagement_days': daily_engagements.filter(engaged=True).count(),
-            'total_tracked_days': daily_engagements.count(),
-            'engagement_percentage': (daily_engagements.filter(engaged=True).count() / daily_engagements.count() * 100) if daily_engagements.exists() else 0
+            'recent_engagement_days': engaged_days,
+            'total_tracked_days': tracked_days,
+            'engagement_percentage': (engaged_days / tracked_days * 100) if tracked_days else 0,
+            'weekly_engagement': weekly_engagement
         }
         
         return Response(engagement_summary)
@@ -667,8 +710,19 @@ def student_engagement_detail(request, student_id):
         return Response({'error': 'Student not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+def _columnar_export(filename_stem, frames, column_types, format_type):
+    """Parquet/Feather download, or 501 when pyarrow is not installed"""
+    if not ColumnarExportService.is_available():
+        return Response(
+            {'error': f'{format_type} export is not available on this server (pyarrow is not installed)'},
+            status=status.HTTP_501_NOT_IMPLEMENTED
+        )
+    return ColumnarExportService.response(filename_stem, frames, column_types, format_type)
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@renderer_classes([JSONRenderer, CSVRenderer, ParquetRenderer, FeatherRenderer])
 def export_analytics_data(request):
     """Export analytics data in various formats - AI quiz focused"""
     try:
@@ -686,28 +740,48 @@ def export_analytics_data(request):
         else:
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
+        # Large exports run in the background (run_export_jobs) and are downloaded later
+        if request.query_params.get('async', '').lower() in ('true', '1'):
+            # The job description is JSON whatever format the file will have
+            request.accepted_renderer = JSONRenderer()
+            request.accepted_media_type = JSONRenderer.media_type
+            
+            if export_type not in ExportJobService.EXPORT_TYPES:
+                return Response(
+                    {'error': f'type must be one of: {", ".join(ExportJobService.EXPORT_TYPES)}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if format_type not in ExportJobService.FORMATS:
+                return Response(
+                    {'error': f'format must be one of: {", ".join(ExportJobService.FORMATS)}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if format_type in ColumnarExportService.FORMATS and not ColumnarExportService.is_available():
+                return Response(
+                    {'error': f'{format_type} export is not available on this server (pyarrow is not installed)'},
+                    status=status.HTTP_501_NOT_IMPLEMENTED
+                )
+            
+            job, created = ExportJobService.request_export(request.user, export_type, format_type)
+            return Response(
+                _export_job_data(request, job),
+                status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK
+            )
+        
         data = []
         
         if export_type == 'course':
-            for course in courses:
-                enrollments = course.enrollments.filter(is_active=True)
-                attempts = AdaptiveQuizAttempt.objects.filter(
-                    progress__adaptive_quiz__lecture_slide__topic__course=course
-                )
-                
-                data.append({
-                    'course_code': course.code,
-                    'course_name': course.name,
-                    'total_students': enrollments.count(),
-                    'total_attempts': attempts.count(),
-                    'average_score': attempts.aggregate(avg=Avg('score_percentage'))['avg'] or 0,
-                    'active_ai_quizzes': AdaptiveQuiz.objects.filter(
-                        lecture_slide__topic__course=course, is_active=True
-                    ).count()
-                })
+            data = AttemptExportService.course_summary(courses)
         
         print(f"DEBUG: Data length: {len(data)}")
         
+        if format_type in ColumnarExportService.FORMATS:
+            import pandas as pd
+            frame = pd.DataFrame(data, columns=list(ColumnarExportService.SUMMARY_TYPES))
+            return _columnar_export(
+                f'{export_type}_analytics', [frame], ColumnarExportService.SUMMARY_TYPES, format_type
+            )
+        
         if format_type == 'csv':
             print("DEBUG: Creating CSV response")
             response = HttpResponse(content_type='text/csv')
@@ -741,6 +815,64 @@ def export_analytics_data(request):
         traceback.print_exc()
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+
+def _export_job_data(request, job):
+    data = {
+        'job_id': job.id,
+        'export_type': job.export_type,
+        'format': job.format_type,
+        'status': job.status,
+        'progress': job.progress,
+        'rows_written': job.rows_written,
+        'total_rows': job.total_rows,
+        'file_size': job.file_size,
+        'checksum_sha256': job.checksum or None,
+        'error': job.error or None,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at,
+        'expires_at': job.expires_at,
+        'status_url': request.build_absolute_uri(reverse('export_job_status', args=[job.id])),
+        'download_url': None
+    }
+    if job.status == 'completed':
+        data['download_url'] = request.build_absolute_uri(reverse('download_export_job', args=[job.id]))
+    return data
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def export_job_status(request, job_id):
+    """Progress of a background export"""
+    try:
+        job = ExportJob.objects.get(id=job_id, requested_by=request.user)
+    except ExportJob.DoesNotExist:
+        return Response({'error': 'Export job not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response(_export_job_data(request, job))
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def download_export_job(request, job_id):
+    """Download the artifact of a finished background export"""
+    try:
+        job = ExportJob.objects.get(id=job_id, requested_by=request.user)
+    except ExportJob.DoesNotExist:
+        return Response({'error': 'Export job not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    if job.status == 'expired':
+        return Response({'error': 'Export has expired, request it again'}, status=status.HTTP_410_GONE)
+    if job.status != 'completed':
+        return Response(
+            {'error': f'Export is not ready (status: {job.status})'},
+            status=status.HTTP_409_CONFLICT
+        )
+    
+    response = FileResponse(job.file.open('rb'), as_attachment=True, filename=os.path.basename(job.file.name))
+    response['X-Checksum-SHA256'] = job.checksum
+    return response
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def get_live_quiz_stats(request, quiz_id):
@@ -754,12 +886,12 @@ def get_live_quiz_stats(request, quiz_id):
         
         # Get current attempts (started but not completed in last 2 hours)
         active_attempts = AdaptiveQuizAttempt.objects.filter(
-            progress__adaptive_quiz=adaptive_quiz,
+            adaptive_quiz=adaptive_quiz,
             started_at__gte=timezone.now() - timedelta(hours=2)
         )
         
         completed_attempts = AdaptiveQuizAttempt.objects.filter(
-            progress__adaptive_quiz=adaptive_quiz
+            adaptive_quiz=adaptive_quiz
         )
         
         live_stats = {
@@ -780,6 +912,18 @@ def get_live_quiz_stats(request, quiz_id):
         return Response({'error': 'AI Quiz not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+def _attempt_trend_filters(request):
+    """Topic/quiz/difficulty filters for trend queries on raw attempts"""
+    filters = {}
+    if request.query_params.get('topic_id'):
+        filters['adaptive_quiz__lecture_slide__topic_id'] = request.query_params['topic_id']
+    if request.query_params.get('quiz_id'):
+        filters['adaptive_quiz_id'] = request.query_params['quiz_id']
+    if request.query_params.get('difficulty'):
+        filters['difficulty'] = request.query_params['difficulty']
+    return filters
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated, IsLecturerPermission])
 def get_engagement_trends(request):
@@ -799,28 +943,38 @@ def get_engagement_trends(request):
     if course_id:
         courses = courses.filter(id=course_id)
     
-    # Get daily engagement data based on AI quiz attempts
-    daily_data = []
-    for i in range(days):
-        date = start_date + timedelta(days=i)
-        
-        # Count AI quiz attempts for that day
-        day_attempts = AdaptiveQuizAttempt.objects.filter(
-            progress__adaptive_quiz__lecture_slide__topic__course__in=courses,
-            started_at__date=date.date()
-        ).count()
-        
-        # Count unique active students
-        active_students = AdaptiveQuizAttempt.objects.filter(
-            progress__adaptive_quiz__lecture_slide__topic__course__in=courses,
-            started_at__date=date.date()
-        ).values('progress__student').distinct().count()
-        
-        daily_data.append({
-            'date': date.date().isoformat(),
-            'total_attempts': day_attempts,
-            'active_students': active_students
-        })
+    first_day = start_date.date()
+    last_day = first_day + timedelta(days=days - 1)
+    attempt_filters = _attempt_trend_filters(request)
+    
+    if attempt_filters:
+        # Rollups are per course only; finer filters group the attempts directly
+        series = TimeBucketService.series(
+            AdaptiveQuizAttempt.objects.filter(course__in=courses), 'started_at', first_day, last_day,
+            filters=attempt_filters,
+            total_attempts=Count('id'),
+            active_students=Count('student', distinct=True)
+        )
+    else:
+        series = TimeBucketService.series(
+            CourseDailyRollup.objects.filter(course__in=courses), 'date', first_day, last_day,
+            total_attempts=Sum('attempts')
+        )
+        # Distinct across courses, so a student active in two courses counts once
+        students = TimeBucketService.series(
+            CourseDailyStudent.objects.filter(course__in=courses), 'date', first_day, last_day,
+            active_students=Count('student', distinct=True)
+        )
+        for day, student_day in zip(series, students):
+            day['active_students'] = student_day['active_students']
+    
+    daily_data = [
+        {
+            'date': day['bucket'].isoformat(),
+            'total_attempts': day['total_attempts'],
+            'active_students': day['active_students']
+        } for day in series
+    ]
     
     trend_data = {
         'period_days': days,
@@ -854,28 +1008,37 @@ def get_performance_trends(request):
     if course_id:
         courses = courses.filter(id=course_id)
     
-    # Get weekly performance averages from AI quizzes
-    weekly_data = []
+    # Weekly performance averages (calendar weeks starting on Monday, the first and last clamped to the period)
     weeks = days // 7 or 1
+    first_day = start_date.date()
+    last_day = first_day + timedelta(weeks=weeks) - timedelta(days=1)
+    attempt_filters = _attempt_trend_filters(request)
     
-    for week in range(weeks):
-        week_start = start_date + timedelta(weeks=week)
-        week_end = week_start + timedelta(days=7)
-        
-        week_attempts = AdaptiveQuizAttempt.objects.filter(
-            progress__adaptive_quiz__lecture_slide__topic__course__in=courses,
-            started_at__gte=week_start,
-            started_at__lt=week_end
+    if attempt_filters:
+        series = TimeBucketService.series(
+            AdaptiveQuizAttempt.objects.filter(course__in=courses), 'started_at', first_day, last_day,
+            bucket='week', filters=attempt_filters,
+            total_attempts=Count('id'),
+            score_sum=Sum('score_percentage'),
+            score_count=Count('score_percentage')
         )
-        
-        if week_attempts.exists():
-            avg_score = week_attempts.aggregate(avg=Avg('score_percentage'))['avg']
-            weekly_data.append({
-                'week_start': week_start.date().isoformat(),
-                'week_end': week_end.date().isoformat(),
-                'average_score': round(avg_score, 2),
-                'total_attempts': week_attempts.count()
-            })
+    else:
+        series = TimeBucketService.series(
+            CourseDailyRollup.objects.filter(course__in=courses), 'date', first_day, last_day,
+            bucket='week',
+            total_attempts=Sum('attempts'),
+            score_sum=Sum('score_sum'),
+            score_count=Sum('score_count')
+        )
+    
+    weekly_data = [
+        {
+            'week_start': max(week['bucket'], first_day).isoformat(),
+            'week_end': min(week['bucket'] + timedelta(days=7), last_day + timedelta(days=1)).isoformat(),
+            'average_score': round(week['score_sum'] / week['score_count'], 2),
+            'total_attempts': week['total_attempts']
+        } for week in series if week['score_count']
+    ]
     
     return Response({
         'period_days': days,
@@ -897,32 +1060,35 @@ def compare_quizzes(request):
     if not quiz_ids:
         return Response({'error': 'quiz_ids required'}, status=status.HTTP_400_BAD_REQUEST)
     
+    try:
+        quiz_ids = [int(item_id) for item_id in quiz_ids]
+    except (TypeError, ValueError):
+        return Response({'error': 'quiz_ids must be a list of ids'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    quizzes = AdaptiveQuiz.objects.filter(
+        id__in=quiz_ids,
+        lecture_slide__topic__course__lecturer=request.user
+    ).select_related('lecture_slide__topic__course').in_bulk()
+    per_quiz = QuizStatisticsService.group_summary(
+        AdaptiveQuizAttempt.objects.filter(adaptive_quiz__in=quizzes.values()), 'adaptive_quiz_id'
+    )
+    
     comparison_data = []
     
     for quiz_id in quiz_ids:
-        try:
-            adaptive_quiz = AdaptiveQuiz.objects.get(
-                id=quiz_id, 
-                lecture_slide__topic__course__lecturer=request.user
-            )
-            attempts = AdaptiveQuizAttempt.objects.filter(
-                progress__adaptive_quiz=adaptive_quiz
-            )
-            
-            if attempts.exists():
-                scores = [attempt.score_percentage for attempt in attempts]
-                comparison_data.append({
-                    'quiz_id': adaptive_quiz.id,
-                    'quiz_title': adaptive_quiz.lecture_slide.title,
-                    'difficulty': adaptive_quiz.difficulty,
-                    'course_code': adaptive_quiz.lecture_slide.topic.course.code,
-                    'total_attempts': attempts.count(),
-                    'average_score': sum(scores) / len(scores),
-                    'highest_score': max(scores),
-                    'lowest_score': min(scores)
-                })
-        except AdaptiveQuiz.DoesNotExist:
-            continue
+        adaptive_quiz = quizzes.get(quiz_id)
+        summary = per_quiz.get(quiz_id)
+        if adaptive_quiz and summary:
+            comparison_data.append({
+                'quiz_id': adaptive_quiz.id,
+                'quiz_title': adaptive_quiz.lecture_slide.title,
+                'difficulty': adaptive_quiz.difficulty,
+                'course_code': adaptive_quiz.lecture_slide.topic.course.code,
+                'total_attempts': summary['count'],
+                'average_score': summary['mean'],
+                'highest_score': summary['max'],
+                'lowest_score': summary['min']
+            })
     
     return Response({
         'comparison_type': 'ai_quizzes',
@@ -940,29 +1106,41 @@ def compare_topics(request):
     if not topic_ids:
         return Response({'error': 'topic_ids required'}, status=status.HTTP_400_BAD_REQUEST)
     
+    try:
+        topic_ids = [int(item_id) for item_id in topic_ids]
+    except (TypeError, ValueError):
+        return Response({'error': 'topic_ids must be a list of ids'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    topics = Topic.objects.filter(
+        id__in=topic_ids, course__lecturer=request.user
+    ).select_related('course').in_bulk()
+    adaptive_quizzes = AdaptiveQuiz.objects.filter(
+        lecture_slide__topic__in=topics.values(), is_active=True
+    )
+    quiz_counts = dict(adaptive_quizzes.values_list('lecture_slide__topic_id').annotate(
+        count=Count('id')
+    ).order_by())
+    per_topic = QuizStatisticsService.group_summary(
+        AdaptiveQuizAttempt.objects.filter(adaptive_quiz__in=adaptive_quizzes),
+        'adaptive_quiz__lecture_slide__topic_id'
+    )
+    
     comparison_data = []
     
     for topic_id in topic_ids:
-        try:
-            topic = Topic.objects.get(id=topic_id, course__lecturer=request.user)
-            adaptive_quizzes = AdaptiveQuiz.objects.filter(
-                lecture_slide__topic=topic, is_active=True
-            )
-            attempts = AdaptiveQuizAttempt.objects.filter(
-                progress__adaptive_quiz__in=adaptive_quizzes
-            )
-            
-            comparison_data.append({
-                'topic_id': topic.id,
-                'topic_name': topic.name,
-                'course_code': topic.course.code,
-                'total_ai_quizzes': adaptive_quizzes.count(),
-                'total_attempts': attempts.count(),
-                'average_score': attempts.aggregate(avg=Avg('score_percentage'))['avg'] or 0,
-                'unique_students': attempts.values('progress__student').distinct().count()
-            })
-        except Topic.DoesNotExist:
+        topic = topics.get(topic_id)
+        if topic is None:
             continue
+        summary = per_topic.get(topic.id, {'count': 0, 'mean': 0, 'unique_students': 0})
+        comparison_data.append({
+            'topic_id': topic.id,
+            'topic_name': topic.name,
+            'course_code': topic.course.code,
+            'total_ai_quizzes': quiz_counts.get(topic.id, 0),
+            'total_attempts': summary['count'],
+            'average_score': summary['mean'],
+            'unique_students': summary['unique_students']
+        })
     
     return Response({
         'comparison_type': 'topics',
@@ -980,31 +1158,44 @@ def compare_courses(request):
     if not course_ids:
         return Response({'error': 'course_ids required'}, status=status.HTTP_400_BAD_REQUEST)
     
+    try:
+        course_ids = [int(item_id) for item_id in course_ids]
+    except (TypeError, ValueError):
+        return Response({'error': 'course_ids must be a list of ids'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    courses = Course.objects.filter(id__in=course_ids, lecturer=request.user).in_bulk()
+    adaptive_quizzes = AdaptiveQuiz.objects.filter(
+        lecture_slide__topic__course__in=courses.values(), is_active=True
+    )
+    quiz_counts = dict(adaptive_quizzes.values_list('lecture_slide__topic__course_id').annotate(
+        count=Count('id')
+    ).order_by())
+    student_counts = dict(CourseEnrollment.objects.filter(
+        course__in=courses.values(), is_active=True
+    ).values_list('course_id').annotate(count=Count('id')).order_by())
+    per_course = QuizStatisticsService.group_summary(
+        AdaptiveQuizAttempt.objects.filter(adaptive_quiz__in=adaptive_quizzes),
+        'adaptive_quiz__lecture_slide__topic__course_id'
+    )
+    
     comparison_data = []
     
     for course_id in course_ids:
-        try:
-            course = Course.objects.get(id=course_id, lecturer=request.user)
-            enrollments = course.enrollments.filter(is_active=True)
-            adaptive_quizzes = AdaptiveQuiz.objects.filter(
-                lecture_slide__topic__course=course, is_active=True
-            )
-            attempts = AdaptiveQuizAttempt.objects.filter(
-                progress__adaptive_quiz__in=adaptive_quizzes
-            )
-            
-            comparison_data.append({
-                'course_id': course.id,
-                'course_code': course.code,
-                'course_name': course.name,
-                'total_students': enrollments.count(),
-                'total_ai_quizzes': adaptive_quizzes.count(),
-                'total_attempts': attempts.count(),
-                'average_score': attempts.aggregate(avg=Avg('score_percentage'))['avg'] or 0,
-                'engagement_rate': (attempts.values('progress__student').distinct().count() / enrollments.count() * 100) if enrollments.exists() else 0
-            })
-        except Course.DoesNotExist:
+        course = courses.get(course_id)
+        if course is None:
             continue
+        summary = per_course.get(course.id, {'count': 0, 'mean': 0, 'unique_students': 0})
+        total_students = student_counts.get(course.id, 0)
+        comparison_data.append({
+            'course_id': course.id,
+            'course_code': course.code,
+            'course_name': course.name,
+            'total_students': total_students,
+            'total_ai_quizzes': quiz_counts.get(course.id, 0),
+            'total_attempts': summary['count'],
+            'average_score': summary['mean'],
+            'engagement_rate': (summary['unique_students'] / total_students * 100) if total_students else 0
+        })
     
     return Response({
         'comparison_type': 'courses',
@@ -1015,6 +1206,7 @@ def compare_courses(request):
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated, IsLecturerPermission])
+@renderer_classes([JSONRenderer, CSVRenderer, ParquetRenderer, FeatherRenderer])
 def export_quiz_results(request, quiz_id):
     """Export AI quiz results"""
     format_type = request.query_params.get('format', 'json')
@@ -1024,50 +1216,35 @@ def export_quiz_results(request, quiz_id):
             id=quiz_id, 
             lecture_slide__topic__course__lecturer=request.user
         )
-        attempts = AdaptiveQuizAttempt.objects.filter(
-            progress__adaptive_quiz=adaptive_quiz
-        )
         
-        data = []
-        for attempt in attempts:
-            duration = None
-            if attempt.completed_at and attempt.started_at:
-                duration = attempt.completed_at - attempt.started_at
-            
-            data.append({
-                'student_name': attempt.progress.student.get_full_name(),
-                'student_number': attempt.progress.student.student_number,
-                'score_percentage': attempt.score_percentage,
-                'difficulty': adaptive_quiz.difficulty,
-                'started_at': attempt.started_at,
-                'completed_at': attempt.completed_at,
-                'time_taken': str(duration) if duration else None
-            })
+        if format_type in ColumnarExportService.FORMATS:
+            return _columnar_export(
+                f'ai_quiz_{quiz_id}_results',
+                ColumnarExportService.quiz_frames(adaptive_quiz),
+                ColumnarExportService.QUIZ_TYPES,
+                format_type
+            )
         
+        # Stream CSV straight from the database cursor
         if format_type == 'csv':
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = f'attachment; filename="ai_quiz_{quiz_id}_results.csv"'
-            
-            if data and len(data) > 0:
-                writer = csv.DictWriter(response, fieldnames=data[0].keys())
-                writer.writeheader()
-                writer.writerows(data)
-            else:
-                # Handle empty data case for CSV
-                fieldnames = ['student_name', 'student_number', 'score_percentage', 'difficulty', 'started_at', 'completed_at', 'time_taken']
-                writer = csv.DictWriter(response, fieldnames=fieldnames)
-                writer.writeheader()
-            
-            return response
+            return AttemptExportService.csv_response(
+                f'ai_quiz_{quiz_id}_results.csv',
+                AttemptExportService.QUIZ_COLUMNS,
+                AttemptExportService.quiz_rows(adaptive_quiz)
+            )
         
-        else:  # JSON format
-            return Response({
-                'quiz_id': adaptive_quiz.id,
-                'quiz_title': adaptive_quiz.lecture_slide.title,
-                'difficulty': adaptive_quiz.difficulty,
-                'export_date': timezone.now(),
-                'results': data
-            })
+        data = [
+            dict(zip(AttemptExportService.QUIZ_COLUMNS, row))
+            for row in AttemptExportService.quiz_rows(adaptive_quiz)
+        ]
+        
+        return Response({
+            'quiz_id': adaptive_quiz.id,
+            'quiz_title': adaptive_quiz.lecture_slide.title,
+            'difficulty': adaptive_quiz.difficulty,
+            'export_date': timezone.now(),
+            'results': data
+        })
             
     except AdaptiveQuiz.DoesNotExist:
         return Response({'error': 'AI Quiz not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -1075,6 +1252,7 @@ def export_quiz_results(request, quiz_id):
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated, IsLecturerPermission])
+@renderer_classes([JSONRenderer, CSVRenderer, ParquetRenderer, FeatherRenderer])
 def export_course_data(request, course_id):
     """Export comprehensive course data - AI quiz focused"""
     format_type = request.query_params.get('format', 'json')
@@ -1082,47 +1260,34 @@ def export_course_data(request, course_id):
     try:
         course = Course.objects.get(id=course_id, lecturer=request.user)
         
-        # Get all AI quiz attempts for this course
-        attempts = AdaptiveQuizAttempt.objects.filter(
-            progress__adaptive_quiz__lecture_slide__topic__course=course
-        )
-        
-        data = []
-        for attempt in attempts:
-            data.append({
-                'student_name': attempt.progress.student.get_full_name(),
-                'student_number': attempt.progress.student.student_number,
-                'topic_name': attempt.progress.adaptive_quiz.lecture_slide.topic.name,
-                'quiz_title': attempt.progress.adaptive_quiz.lecture_slide.title,
-                'difficulty': attempt.progress.adaptive_quiz.difficulty,
-                'score_percentage': attempt.score_percentage,
-                'completed_at': attempt.completed_at
-            })
+        if format_type in ColumnarExportService.FORMATS:
+            return _columnar_export(
+                f'course_{course.code}_ai_quiz_data',
+                ColumnarExportService.course_frames(course),
+                ColumnarExportService.COURSE_TYPES,
+                format_type
+            )
         
+        # Stream CSV straight from the database cursor
         if format_type == 'csv':
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = f'attachment; filename="course_{course.code}_ai_quiz_data.csv"'
-            
-            if data and len(data) > 0:
-                writer = csv.DictWriter(response, fieldnames=data[0].keys())
-                writer.writeheader()
-                writer.writerows(data)
-            else:
-                # Handle empty data case for CSV
-                fieldnames = ['student_name', 'student_number', 'topic_name', 'quiz_title', 'difficulty', 'score_percentage', 'completed_at']
-                writer = csv.DictWriter(response, fieldnames=fieldnames)
-                writer.writeheader()
-            
-            return response
+            return AttemptExportService.csv_response(
+                f'course_{course.code}_ai_quiz_data.csv',
+                AttemptExportService.COURSE_COLUMNS,
+                AttemptExportService.course_rows(course)
+            )
         
-        else:  # JSON format
-            return Response({
-                'course_id': course.id,
-                'course_code': course.code,
-                'course_name': course.name,
-                'export_date': timezone.now(),
-                'results': data
-            })
+        data = [
+            dict(zip(AttemptExportService.COURSE_COLUMNS, row))
+            for row in AttemptExportService.course_rows(course)
+        ]
+        
+        return Response({
+            'course_id': course.id,
+            'course_code': course.code,
+            'course_name': course.name,
+            'export_date': timezone.now(),
+            'results': data
+        })
             
     except Course.DoesNotExist:
         return Response({'error': 'Course not found'}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
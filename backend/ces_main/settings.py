@@ -157,6 +157,53 @@ CORS_ALLOW_CREDENTIALS = config('CORS_ALLOW_CREDENTIALS', default=False, cast=bo
 SESSION_COOKIE_AGE = config('SESSION_COOKIE_AGE', default=86400, cast=int)
 SESSION_SAVE_EVERY_REQUEST = config('SESSION_SAVE_EVERY_REQUEST', default=True, cast=bool)
 
+# Leaderboards are materialized and rebuilt when older than this (or by refresh_leaderboards)
+LEADERBOARD_REFRESH_SECONDS = config('LEADERBOARD_REFRESH_SECONDS', default=300, cast=int)
+
+# Cache (shared between workers in production, e.g. Redis or Memcached)
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='ces-default'),
+    }
+}
+
+# Student quiz catalog entries are invalidated by version bumps; this only bounds memory
+STUDENT_CATALOG_CACHE_TIMEOUT = config('STUDENT_CATALOG_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Upper bound on attempts accepted by one batch quiz submission
+ADAPTIVE_QUIZ_BATCH_MAX_ATTEMPTS = config('ADAPTIVE_QUIZ_BATCH_MAX_ATTEMPTS', default=200, cast=int)
+
+# Autosaved quiz answers live in the cache until flush_quiz_autosaves writes them in batches
+# (only with a shared cache backend; with the local-memory default they are written directly)
+QUIZ_AUTOSAVE_CACHE_TIMEOUT = config('QUIZ_AUTOSAVE_CACHE_TIMEOUT', default=86400, cast=int)
+QUIZ_AUTOSAVE_FLUSH_SECONDS = config('QUIZ_AUTOSAVE_FLUSH_SECONDS', default=10, cast=int)
+
+# Timed quiz sessions are auto-submitted this long after their deadline (allows for network lag)
+QUIZ_DEADLINE_GRACE_SECONDS = config('QUIZ_DEADLINE_GRACE_SECONDS', default=30, cast=int)
+QUIZ_SESSION_SWEEP_SECONDS = config('QUIZ_SESSION_SWEEP_SECONDS', default=30, cast=int)
+
+# Responses stored for Idempotency-Key retries are kept this long (purge_idempotency_keys evicts them)
+IDEMPOTENCY_KEY_TTL_SECONDS = config('IDEMPOTENCY_KEY_TTL_SECONDS', default=86400, cast=int)
+# A request still running after this long is assumed dead and its key can be retried
+IDEMPOTENCY_LOCK_SECONDS = config('IDEMPOTENCY_LOCK_SECONDS', default=300, cast=int)
+
+# Rows fetched per database round trip when streaming analytics exports
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+# Background export artifacts are deleted this long after they finish
+EXPORT_JOB_TTL_SECONDS = config('EXPORT_JOB_TTL_SECONDS', default=86400, cast=int)
+# Identical export requests from the same user within this window reuse the existing job
+EXPORT_JOB_REUSE_SECONDS = config('EXPORT_JOB_REUSE_SECONDS', default=900, cast=int)
+# How often run_export_jobs --loop looks for new jobs
+EXPORT_JOB_POLL_SECONDS = config('EXPORT_JOB_POLL_SECONDS', default=5, cast=int)
+# A running job without progress for this long is assumed to have lost its worker and is retried
+EXPORT_JOB_STALE_SECONDS = config('EXPORT_JOB_STALE_SECONDS', default=600, cast=int)
+
+# Processes recompute_engagement_metrics shards courses over (1 = run in-process)
+METRICS_RECOMPUTE_WORKERS = config('METRICS_RECOMPUTE_WORKERS', default=1, cast=int)
+# How often recompute_engagement_metrics --jobs --loop checks for queued recomputes
+METRICS_RECOMPUTE_POLL_SECONDS = config('METRICS_RECOMPUTE_POLL_SECONDS', default=10, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -133,11 +133,13 @@ class Attendance(models.Model):
     date = models.DateField(default=timezone.now)
     is_present = models.BooleanField(default=False)
     verified_by_quiz = models.BooleanField(default=False)
+    # No database-level constraint: attempts may live in a partitioned table
     ai_quiz_attempt = models.ForeignKey(
         'ai_quiz.AdaptiveQuizAttempt',
         on_delete=models.SET_NULL,
         null=True,
         blank=True,
+        db_constraint=False,
         related_name='attendance_record'
     )
     created_at = models.DateTimeField(auto_now_add=True)
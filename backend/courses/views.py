@@ -15,6 +15,7 @@ from .serializers import (
     TopicSerializer, CourseDashboardSerializer, StudentDashboardSerializer,
     AttendanceSerializer
 )
+from users.idempotency import idempotent
 
 
 class IsLecturerOrReadOnly(permissions.BasePermission):
@@ -222,6 +223,7 @@ def my_courses(request):
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
+@idempotent
 def upload_students_csv(request, course_id):
     """Upload CSV to create and enroll students"""
     if not request.user.is_lecturer:
@@ -10,6 +10,7 @@ from .serializers import (
     LiveQAMessageSerializer, SendMessageSerializer, JoinSessionSerializer
 )
 from courses.models import Course
+from users.idempotency import idempotent
 
 class IsLecturerPermission(permissions.BasePermission):
     """Permission for lecturers only"""
@@ -162,6 +163,7 @@ def join_session(request):
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
+@idempotent
 def send_message(request, session_code):
     """Send a message to Live Q&A session"""
     try:
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, StudentProfile
+from .models import User, StudentProfile, IdempotencyRecord
 
 
 class StudentProfileInline(admin.StackedInline):
@@ -81,4 +81,12 @@ class StudentProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'total_quizzes_completed', 'total_correct_answers', 'current_streak', 'longest_streak')
     list_filter = ('current_streak', 'longest_streak')
     search_fields = ('user__username', 'user__email', 'user__first_name', 'user__last_name')
-    readonly_fields = ('user',)  
\ No newline at end of file
+    readonly_fields = ('user',)  
+
+@admin.register(IdempotencyRecord)
+class IdempotencyRecordAdmin(admin.ModelAdmin):
+    """Read-only admin for stored idempotent responses"""
+    list_display = ('key', 'owner', 'scope', 'status', 'response_status', 'created_at', 'expires_at')
+    list_filter = ('status', 'response_status')
+    search_fields = ('key', 'owner', 'scope')
+    readonly_fields = [field.name for field in IdempotencyRecord._meta.fields]
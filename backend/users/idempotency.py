@@ -0,0 +1,135 @@
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyRecord
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAY_HEADER = 'Idempotent-Replayed'
+
+
+def _request_owner(request):
+    """Identify who used the key, so keys never collide between users"""
+    if request.user and request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    return f"anon:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def _request_hash(request):
+    """Fingerprint of the request payload (uploaded files by name and size)"""
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = {key: values for key, values in data.lists()}
+    files = {
+        name: [(uploaded.name, uploaded.size) for uploaded in request.FILES.getlist(name)]
+        for name in request.FILES
+    }
+    payload = json.dumps([data, files], sort_keys=True, cls=DjangoJSONEncoder, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _claim(owner, scope, key, request_hash):
+    """
+    Claim the key for this request
+    
+    Returns (record, created). An expired record (finished past its TTL, or
+    abandoned by a crashed request) is taken over as if it did not exist.
+    """
+    now = timezone.now()
+    lock_until = now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+    
+    try:
+        with transaction.atomic():
+            return IdempotencyRecord.objects.create(
+                owner=owner, scope=scope, key=key,
+                request_hash=request_hash, expires_at=lock_until
+            ), True
+    except IntegrityError:
+        pass
+    
+    taken_over = IdempotencyRecord.objects.filter(
+        owner=owner, scope=scope, key=key, expires_at__lte=now
+    ).update(
+        request_hash=request_hash, status='in_progress', response_status=None,
+        response_body=None, expires_at=lock_until
+    )
+    try:
+        record = IdempotencyRecord.objects.get(owner=owner, scope=scope, key=key)
+    except IdempotencyRecord.DoesNotExist:
+        # The request holding the key failed and released it in the meantime
+        return _claim(owner, scope, key, request_hash)
+    return record, bool(taken_over)
+
+
+def idempotent(view_func):
+    """
+    Make a POST view safe to retry with an Idempotency-Key header
+    
+    The first request with a key runs the view and stores its response; retries
+    with the same key and payload get the stored response back without running
+    the view again. Requests without the header are not affected. Apply it below
+    @api_view/@permission_classes so it runs after authentication.
+    """
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_func(request, *args, **kwargs)
+        
+        if len(key) > 255:
+            return Response(
+                {'error': f'{IDEMPOTENCY_HEADER} must be at most 255 characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        owner = _request_owner(request)
+        scope = f"{request.method} {request.path}"[:255]
+        request_hash = _request_hash(request)
+        
+        record, created = _claim(owner, scope, key, request_hash)
+        
+        if not created:
+            if record.request_hash != request_hash:
+                return Response(
+                    {'error': f'{IDEMPOTENCY_HEADER} was already used with a different request'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if record.status != 'completed':
+                return Response(
+                    {'error': 'A request with this idempotency key is still being processed'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            
+            response = Response(record.response_body, status=record.response_status)
+            response[REPLAY_HEADER] = 'true'
+            return response
+        
+        try:
+            response = view_func(request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+        
+        # Only keep final answers; server errors and non-DRF responses can be retried
+        if not isinstance(response, Response) or response.status_code >= 500:
+            record.delete()
+            return response
+        
+        record.status = 'completed'
+        record.response_status = response.status_code
+        record.response_body = response.data
+        record.expires_at = timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS)
+        record.save(update_fields=['status', 'response_status', 'response_body', 'expires_at'])
+        
+        return response
+    
+    return wrapper
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users.models import IdempotencyRecord
+
+
+class Command(BaseCommand):
+    help = 'Delete expired idempotency keys and their stored responses (run on a schedule, e.g. hourly)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+    
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            expired_ids = list(
+                IdempotencyRecord.objects.filter(
+                    expires_at__lte=timezone.now()
+                ).values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not expired_ids:
+                break
+            
+            deleted, _ = IdempotencyRecord.objects.filter(id__in=expired_ids).delete()
+            total += deleted
+        
+        self.stdout.write(self.style.SUCCESS(f'Purged {total} expired idempotency keys'))
@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
+from django.core.serializers.json import DjangoJSONEncoder
 
 
 class User(AbstractUser):
@@ -106,6 +108,69 @@ class StudentProfile(models.Model):
         return f"Profile: {self.user.get_full_name()}"
 
 
+class IdempotencyRecord(models.Model):
+    """Stored response for a POST made with an Idempotency-Key header (see users.idempotency)"""
+    STATUS_CHOICES = [
+        ('in_progress', 'In progress'),
+        ('completed', 'Completed'),
+    ]
+    
+    key = models.CharField(max_length=255)
+    owner = models.CharField(max_length=100, help_text="user:<id> or anon:<ip>")
+    scope = models.CharField(max_length=255, help_text="HTTP method and path the key was used on")
+    request_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='in_progress')
+    
+    # Stored response, replayed for retries
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        unique_together = ('owner', 'scope', 'key')
+    
+    def __str__(self):
+        return f"{self.owner} {self.scope} [{self.key}] ({self.status})"
+
+
+class TaskLease(models.Model):
+    """
+    Database lease so only one node runs a scheduled task at a time
+    
+    A holder keeps the lease by re-acquiring it before it expires; if the
+    holder dies, another node takes over once the lease has expired.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    holder = models.CharField(max_length=255, blank=True)
+    acquired_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField()
+    
+    @classmethod
+    def acquire(cls, name, holder, ttl_seconds):
+        """Acquire or renew the lease; returns True if holder now owns it"""
+        now = timezone.now()
+        cls.objects.get_or_create(name=name, defaults={'expires_at': now})
+        
+        # Single conditional UPDATE, so two nodes can never both win
+        return bool(cls.objects.filter(name=name).filter(
+            models.Q(expires_at__lte=now) | models.Q(holder=holder)
+        ).update(
+            holder=holder,
+            acquired_at=now,
+            expires_at=now + timezone.timedelta(seconds=ttl_seconds)
+        ))
+    
+    @classmethod
+    def release(cls, name, holder):
+        """Give the lease up early (no-op if holder no longer owns it)"""
+        cls.objects.filter(name=name, holder=holder).update(expires_at=timezone.now())
+    
+    def __str__(self):
+        return f"{self.name} held by {self.holder or '-'} until {self.expires_at}"
+
+
 # Auto-create StudentProfile for new students
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -1,6 +1,7 @@
+import io
 from django.test import TestCase
 from django.urls import reverse
-from rest_framework.test import APITestCase, APIClient
+from rest_framework.test import APITestCase, APIClient, APIRequestFactory, force_authenticate
 from rest_framework import status
 from django.contrib.auth import get_user_model
 from .models import User, StudentProfile
@@ -131,4 +132,65 @@ class UserModelTest(TestCase):
         
         print(f"Student created: {student.username}")
         print(f"Profile created: {hasattr(student, 'student_profile')}")
-        print("TEST PASSED: Student profile auto-creation works")
\ No newline at end of file
+        print("TEST PASSED: Student profile auto-creation works")
+
+
+class IdempotencyKeyTest(APITestCase):
+    """Retries with an Idempotency-Key replay the stored response"""
+    
+    def setUp(self):
+        from rest_framework.decorators import api_view
+        from rest_framework.response import Response
+        from .idempotency import idempotent
+        
+        self.calls = []
+        
+        @api_view(['POST'])
+        @idempotent
+        def create_view(request):
+            self.calls.append(request.data)
+            return Response({'created': len(self.calls)}, status=status.HTTP_201_CREATED)
+        
+        self.view = create_view
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create_user(
+            username='retrier', email='retrier@test.com', user_type='student', student_number='STU900'
+        )
+    
+    def post(self, data, key=None, user=None):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        request = self.factory.post('/retry/', data, format='json', **headers)
+        force_authenticate(request, user=user or self.user)
+        return self.view(request)
+    
+    def test_retry_replays_stored_response(self):
+        first = self.post({'quiz': 1}, key='abc')
+        retry = self.post({'quiz': 1}, key='abc')
+        
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data, {'created': 1})
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(len(self.calls), 1)
+        
+        # Without a key, or with another user's key space, the view runs again
+        self.post({'quiz': 1})
+        other = User.objects.create_user(
+            username='other', email='other@test.com', user_type='student', student_number='STU901'
+        )
+        self.post({'quiz': 1}, key='abc', user=other)
+        self.assertEqual(len(self.calls), 3)
+    
+    def test_key_reuse_and_expiry(self):
+        from django.core.management import call_command
+        from django.utils import timezone
+        from .models import IdempotencyRecord
+        
+        self.post({'quiz': 1}, key='abc')
+        self.assertEqual(self.post({'quiz': 2}, key='abc').status_code, 422)
+        
+        IdempotencyRecord.objects.update(expires_at=timezone.now())
+        call_command('purge_idempotency_keys', stdout=io.StringIO())
+        self.assertFalse(IdempotencyRecord.objects.exists())
+        
+        self.assertEqual(self.post({'quiz': 2}, key='abc').data, {'created': 2})